@@ -1,132 +1,46 @@
-from openai import OpenAI
-from api.config import OPENROUTER_API_KEY
-import json
-from typing import Dict, Any
-
-# Инициализация клиента OpenAI с использованием OpenRouter
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
+from api.config import (
+    ANALYSIS_MODE,
+    ANALYSIS_PROMPT_AB_SHARE,
+    ANALYSIS_PROMPT_VARIANT,
+    EXPLANATION_CACHE_SIZE,
+    EXPLANATION_CACHE_TTL,
+    EXPLANATION_MODE,
+    LOCAL_EXTRACTOR_MIN_CONFIDENCE,
+    LLM_EXPLANATION_TIMEOUT,
+    LLM_REPAIR_RETRIES,
+    LLM_STRUCTURED_OUTPUT,
+    PREFERENCES_CACHE_SIZE,
+    PREFERENCES_CACHE_TTL,
+    PREFERENCES_CACHE_STRIP_STOPWORDS,
+)
+from api.llm import chat_completion
+from api.cache import TTLCache, normalize_prompt
+from api.conversations import get_conversation_store
+from api.extractor import extract_preferences
+from api.explanations import build_template_explanation
+from api.repair import REPAIR_STATS, decode_compact_response, repair_llm_response
+from api.tracing import record_exception, traced
+# Справочные списки допустимых значений для категорий
+from api.vocabulary import (
+    ENTITY_TYPES,
+    ATMOSPHERE_TAGS,
+    PURPOSE_TAGS,
+    BUDGET_LEVELS,
+    FEATURES,
+    BEST_TIME,
+    WORKING_DAYS,
+    COMPACT_DECODE,
+    COMPACT_ENCODE,
+    COMPACT_FIELDS,
 )
+import copy
+import hashlib
+import json
+import logging
+import random
+from typing import Dict, Any, List, Optional
 
-# --- Справочные списки допустимых значений для категорий ---
-
-ENTITY_TYPES = [
-    "ресторан",
-    "кафе",
-    "бар",
-    "паб",
-    "кофейня",
-    "фудкорт",
-    "уличная еда",
-    "пекарня",
-    "кондитерская",
-    "чайный домик",
-    "клуб",
-    "гостиная",
-    "караоке",
-    "книжный магазин",
-    "арт-центр",
-    "галерея",
-    "кинотеатр",
-    "антикафе",
-    "мастерская",
-    "студия",
-    "парк",
-    "набережная",
-    "площадь",
-    "смотровая площадка",
-    "музей",
-    "памятник",
-    "скульптура",
-    "историческое здание",
-    "церковь",
-    "храм",
-    "кафедральный собор",
-    "улица",
-    "бутик",
-    "винтажный магазин",
-    "секонд-хенд",
-    "сувенирный магазин",
-    "рынок",
-    "концептуальный магазин",
-    "достопримечательность",
-    "укромное место",
-    "внутренний двор",
-]
-
-ATMOSPHERE_TAGS = [
-    "уютный",
-    "романтичный",
-    "тихий",
-    "спокойный",
-    "шумный",
-    "энергичный",
-    "домашний",
-    "элегантный",
-    "премиум",
-    "богемный",
-    "артхаусный",
-    "хипстерский",
-    "альтернативный",
-    "семейный",
-    "детский",
-    "туристический",
-    "популярный",
-    "местный",
-    "аутентичный",
-    "ностальгический",
-    "винтажный",
-    "дневной",
-    "вечерний",
-    "ночной",
-]
-
-PURPOSE_TAGS = [
-    "свидание",
-    "друзья",
-    "работа",
-    "учеба",
-    "наедине",
-    "бизнес",
-    "празднование",
-    "быстрый визит",
-    "фотосъемка",
-    "прогулки",
-    "шоппинг",
-    "осмотр достопримечательностей",
-    "обед",
-    "ужин",
-    "завтрак",
-    "поздний завтрак",
-]
-
-BUDGET_LEVELS = ["бюджетный", "средний", "дорогой"]
-
-FEATURES = [
-    "для отдыха на природе",
-    "для домашних животных",
-    "вегетарианец",
-    "веган",
-    "живая музыка",
-    "танцы",
-    "Wi-Fi",
-    "парковка",
-    "доступно",
-    "место для курения",
-    "алкоголь",
-    "детская комната",
-    "мероприятия",
-    "бесплатный вход",
-    "платный вход",
-    "бронирование",
-    "доставка",
-    "еда на вынос",
-]
-
-BEST_TIME = ["утро", "день", "вечер", "ночь"]
-
-WORKING_DAYS = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+logger = logging.getLogger(__name__)
 
 # Ожидаемая структура ответа от LLM
 EXPECTED_STRUCTURE = {
@@ -142,10 +56,38 @@ EXPECTED_STRUCTURE = {
 _system_prompts_cache = {}
 
 
+def _compact_vocabulary() -> str:
+    """
+    Справочник кодов для компактного промпта: "e: E1 ресторан, E2 кафе, ...".
+    """
+    return "\n".join(
+        f"{key}: " + ", ".join(f"{code} {value}" for code, value in COMPACT_DECODE[field].items())
+        for field, (key, _) in COMPACT_FIELDS.items()
+    )
+
+
+def _compact_example(budget_level=None, best_time="день", **lists) -> str:
+    """
+    Пример ответа на компактный промпт, закодированный из обычных значений.
+    """
+    example = {}
+    for field, (key, _) in COMPACT_FIELDS.items():
+        codes = COMPACT_ENCODE[field]
+        if field == "budget_level":
+            example[key] = codes[budget_level] if budget_level else None
+        elif field == "best_time":
+            example[key] = codes[best_time]
+        else:
+            example[key] = [codes[value] for value in lists.get(field, [])]
+    return json.dumps(example, ensure_ascii=False, separators=(",", ":"))
+
+
 def get_system_prompt(prompt_type: str = "analysis"):
     """
     Создает и кэширует system prompt для LLM.
-    prompt_type: "analysis" — анализ предпочтений, "explanation" — объяснение выбора.
+    prompt_type: "analysis" — анализ предпочтений, "analysis_compact" — то же
+    с короткими кодами категорий, "review"/"review_compact" — анализ отзыва,
+    "explanation" — объяснение выбора.
     """
     global _system_prompts_cache
 
@@ -191,9 +133,9 @@ best_time: {BEST_TIME}
 
 ПРИМЕРЫ АНАЛИЗА РАСПЛЫВЧАТЫХ ЗАПРОСОВ:
 - "хочу вкусно покушать" -> entity_types: ["ресторан", "кафе", "бар"], purpose_tags: ["ужин", "обед"]
-- "куда сходить?" -> entity_types: ["парк", "музей", "кинотеатр", "ресторан"], purpose_tags: ["прогулки", "развлечения"]
-- "ищу место для встречи" -> entity_types: ["кафе", "кофейня", "ресторан"], purpose_tags: ["друзья", "встреча"]
-- "где провести время" -> entity_types: ["парк", "кинотеатр", "торговый центр"], purpose_tags: ["отдых", "развлечения"]
+- "куда сходить?" -> entity_types: ["парк", "музей", "кинотеатр", "ресторан"], purpose_tags: ["прогулки", "друзья"]
+- "ищу место для встречи" -> entity_types: ["кафе", "кофейня", "ресторан"], purpose_tags: ["друзья", "бизнес"]
+- "где провести время" -> entity_types: ["парк", "кинотеатр", "антикафе"], purpose_tags: ["прогулки", "друзья"]
 - "хочу выпить" -> entity_types: ["бар", "паб", "кофейня"], features: ["алкоголь"]
 - "нужно поработать" -> entity_types: ["кофейня", "кафе", "книжный магазин"], purpose_tags: ["работа"], features: ["Wi-Fi"]
 - "погулять" -> entity_types: ["парк", "улица", "набережная"], purpose_tags: ["прогулки"]
@@ -205,6 +147,39 @@ best_time: {BEST_TIME}
 - "парк для прогулки" -> entity_types: ["парк"], purpose_tags: ["прогулки"]
 - "место с Wi-Fi" -> features: ["Wi-Fi"]
 """
+        elif prompt_type == "analysis_compact":
+            # Сокращённый промпт: категории — короткими кодами, примеры — только самые показательные
+            _system_prompts_cache[prompt_type] = f"""
+Определи категории мест, подходящие запросу пользователя. Верни ТОЛЬКО JSON:
+{{"e":[типы мест],"a":[атмосфера],"p":[цели],"b":бюджет или null,"f":[особенности],"t":время}}
+Используй только коды из справочника. Для расплывчатых запросов выбирай несколько вероятных кодов.
+Не упомянуто — [] (для b — null). t обязателен, b и t — один код.
+
+{_compact_vocabulary()}
+
+Примеры:
+- "хочу вкусно покушать" -> {_compact_example(entity_types=["ресторан", "кафе", "бар"], purpose_tags=["ужин", "обед"])}
+- "нужно поработать" -> {_compact_example(entity_types=["кофейня", "кафе"], purpose_tags=["работа"], features=["Wi-Fi"], best_time="день")}
+- "дорогой ресторан для ужина" -> {_compact_example(entity_types=["ресторан"], purpose_tags=["ужин"], budget_level="дорогой", best_time="вечер")}
+"""
+        elif prompt_type in ("review", "review_compact"):
+            # Промпт анализа, дополненный инструкциями для отзывов
+            base_prompt = get_system_prompt(
+                "analysis_compact" if prompt_type == "review_compact" else "analysis"
+            )
+            _system_prompts_cache[prompt_type] = (
+                base_prompt
+                + """
+
+СЕЙЧАС ТЫ АНАЛИЗИРУЕШЬ ОТЗЫВ О МЕСТЕ. Пользователь описывает свои впечатления о конкретном месте.
+Извлеки из его описания категории, которые характеризуют это место.
+
+ПРАВИЛА ДЛЯ ОТЗЫВОВ:
+1. Анализируй, каким пользователь описывает место - для чего оно подходит, какая там атмосфера
+2. Извлекай только те категории, которые явно следуют из описания
+3. Не добавляй категории, которые не упомянуты в отзыве
+"""
+            )
         elif prompt_type == "explanation":
             # Промпт для генерации объяснения пользователю
             _system_prompts_cache[
@@ -230,6 +205,33 @@ best_time: {BEST_TIME}
 - "Кофейня подходит для работы с ноутбуком благодаря Wi-Fi и тихой обстановке"
 
 ТЕПЕРЬ ОБЪЯСНИ ПОЛЬЗОВАТЕЛЮ:
+"""
+        elif prompt_type == "explanation_batch":
+            # Промпт для генерации объяснений сразу для нескольких мест
+            _system_prompts_cache[
+                prompt_type
+            ] = """
+Ты - помощник сервиса рекомендаций мест. Тебе дан запрос пользователя и список рекомендованных мест с их id.
+Для КАЖДОГО места кратко и понятно объясни пользователю, почему оно подходит под его запрос.
+
+ОБЯЗАТЕЛЬНЫЕ ПРАВИЛА:
+1. Будь кратким - 1-2 предложения на место
+2. Говори естественно, как живой человек
+3. Подчеркни 1-2 самых важных совпадения
+4. Не повторяй одни и те же формулировки для разных мест
+5. Обращайся к пользователю на "ты"
+
+ВЕРНИ ОТВЕТ ТОЛЬКО В ФОРМАТЕ JSON БЕЗ КАКИХ-ЛИБО ПОЯСНЕНИЙ:
+{
+    "explanations": [
+        {"id": <id места>, "explanation": "текст объяснения"}
+    ]
+}
+
+ПРИМЕРЫ ОБЪЯСНЕНИЙ:
+- "Это уютное кафе отлично подходит для работы - здесь тихо и есть Wi-Fi"
+- "Ресторан подойдет для романтического ужина: живая музыка и элегантная атмосфера"
+- "Парк хорош для прогулок в дневное время, здесь спокойно и красиво"
 """
     return _system_prompts_cache[prompt_type]
 
@@ -295,18 +297,229 @@ def validate_llm_response(response_data):
     return True
 
 
-# --- Кэш для истории разговоров (для поддержки контекста) ---
-_conversation_cache = {}
+# --- Структурированный ответ LLM по JSON-схеме ---
+_categories_schema = None
 
 
-async def analyze_user_preferences(user_prompt: str, conversation_id: str = None):
+def get_categories_schema() -> Dict[str, Any]:
+    """
+    Строит (и кэширует) JSON-схему ответа с категориями из справочных списков.
+    """
+    global _categories_schema
+
+    if _categories_schema is None:
+        def tag_list(values):
+            return {"type": "array", "items": {"type": "string", "enum": values}}
+
+        _categories_schema = {
+            "type": "object",
+            "properties": {
+                "entity_types": tag_list(ENTITY_TYPES),
+                "atmosphere_tags": tag_list(ATMOSPHERE_TAGS),
+                "purpose_tags": tag_list(PURPOSE_TAGS),
+                "budget_level": {
+                    "anyOf": [
+                        {"type": "string", "enum": BUDGET_LEVELS},
+                        {"type": "null"},
+                    ]
+                },
+                "features": tag_list(FEATURES),
+                "best_time": {"type": "string", "enum": BEST_TIME},
+            },
+            "required": list(EXPECTED_STRUCTURE.keys()),
+            "additionalProperties": False,
+        }
+    return _categories_schema
+
+
+_compact_categories_schema = None
+
+
+def get_compact_categories_schema() -> Dict[str, Any]:
+    """
+    JSON-схема ответа на компактный промпт: короткие ключи и коды категорий.
+    """
+    global _compact_categories_schema
+
+    if _compact_categories_schema is None:
+        properties = {}
+        for field, (key, _) in COMPACT_FIELDS.items():
+            codes = list(COMPACT_DECODE[field])
+            if field == "budget_level":
+                properties[key] = {
+                    "anyOf": [{"type": "string", "enum": codes}, {"type": "null"}]
+                }
+            elif field == "best_time":
+                properties[key] = {"type": "string", "enum": codes}
+            else:
+                properties[key] = {"type": "array", "items": {"type": "string", "enum": codes}}
+
+        _compact_categories_schema = {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+    return _compact_categories_schema
+
+
+def _categories_response_format(compact: bool = False) -> Dict[str, Any]:
+    """
+    Формат ответа для запросов категорий: строгая JSON-схема или просто JSON.
+    """
+    if not LLM_STRUCTURED_OUTPUT:
+        return {"type": "json_object"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "place_categories_compact" if compact else "place_categories",
+            "strict": True,
+            "schema": get_compact_categories_schema() if compact else get_categories_schema(),
+        },
+    }
+
+
+def choose_prompt_variant() -> str:
+    """
+    Выбирает вариант промпта анализа по ANALYSIS_PROMPT_VARIANT:
+    "full" или "compact"; в режиме "ab" — случайно, с долей компактного
+    ANALYSIS_PROMPT_AB_SHARE. Результаты вариантов сравниваются по
+    статистике api/usage.py (тип промпта "analysis" / "analysis_compact").
+    """
+    if ANALYSIS_PROMPT_VARIANT == "ab":
+        return "compact" if random.random() < ANALYSIS_PROMPT_AB_SHARE else "full"
+    return "compact" if ANALYSIS_PROMPT_VARIANT == "compact" else "full"
+
+
+async def _request_categories(
+    messages,
+    temperature: float,
+    max_tokens: int,
+    prompt_type: str = "analysis",
+    compact: bool = False,
+):
+    """
+    Запрашивает у LLM категории, исправляет и валидирует ответ.
+    compact — ответ на компактный промпт (коды расшифровываются перед исправлением).
+    Недопустимые значения исправляются (см. api/repair.py); повторный запрос
+    делается только если ответ не разобрать как JSON-объект, не более
+    LLM_REPAIR_RETRIES раз. Возвращает (категории, исправленный ответ в JSON).
+    """
+    last_error = None
+    for attempt in range(LLM_REPAIR_RETRIES + 1):
+        if attempt:
+            REPAIR_STATS["retries"] += 1
+
+        completion = await chat_completion(
+            messages=messages,
+            response_format=_categories_response_format(compact),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            prompt_type=prompt_type,
+        )
+        response_content = completion.choices[0].message.content
+
+        try:
+            response_data = json.loads(response_content)
+            if compact:
+                response_data = decode_compact_response(response_data)
+            response_data = repair_llm_response(response_data)
+            validate_llm_response(response_data)
+            return response_data, json.dumps(response_data, ensure_ascii=False)
+        except ValueError as e:
+            # json.JSONDecodeError — тоже ValueError
+            last_error = f"{e}\nОтвет: {response_content}"
+
+    REPAIR_STATS["failures"] += 1
+    raise ValueError(f"Не удалось получить корректный ответ LLM: {last_error}")
+
+
+# --- Кэш результатов анализа предпочтений (ключ — нормализованный запрос) ---
+_preferences_cache = TTLCache(
+    maxsize=PREFERENCES_CACHE_SIZE, ttl=PREFERENCES_CACHE_TTL, name="preferences"
+)
+
+
+async def _remember_conversation(conversation_id: str, user_prompt: str, response_content: str):
+    """
+    Сохраняет обмен сообщениями в истории диалога.
+    """
+    await get_conversation_store().append(
+        conversation_id,
+        [
+            {"role": "user", "content": user_prompt},
+            {"role": "assistant", "content": response_content},
+        ],
+    )
+
+
+def get_preferences_cache_stats() -> Dict[str, Any]:
+    """
+    Возвращает статистику кэша анализа предпочтений (попадания, промахи и т.д.).
+    """
+    return _preferences_cache.stats()
+
+
+def clear_preferences_cache():
+    """
+    Очищает кэш анализа предпочтений.
+    """
+    _preferences_cache.clear()
+
+
+@traced("analysis")
+async def analyze_user_preferences(
+    user_prompt: str, conversation_id: str = None, use_cache: bool = True
+):
     """
     Анализирует промпт пользователя и возвращает структурированные предпочтения.
     conversation_id — если указан, поддерживается история диалога.
+    use_cache — использовать кэш по нормализованному запросу. Кэш не применяется,
+    если у диалога уже есть история: ответ зависит от предыдущих сообщений.
+    В режиме ANALYSIS_MODE="hybrid" сначала пробуется локальный разбор запроса,
+    LLM вызывается только при низкой уверенности; в режиме "local" LLM не вызывается.
     """
     try:
+        # История диалога (последние сообщения) из общего хранилища
+        previous_messages = (
+            await get_conversation_store().get(conversation_id) if conversation_id else []
+        )
+        has_history = bool(previous_messages)
+
+        # Пробуем взять результат из кэша
+        cache_key = None
+        if use_cache and not has_history:
+            cache_key = normalize_prompt(
+                user_prompt, strip_stopwords=PREFERENCES_CACHE_STRIP_STOPWORDS
+            )
+            cached = _preferences_cache.get(cache_key)
+            if cached is not None:
+                if conversation_id:
+                    await _remember_conversation(
+                        conversation_id, user_prompt, json.dumps(cached, ensure_ascii=False)
+                    )
+                return copy.deepcopy(cached)
+
+        # Быстрый путь: локальный разбор по словарю без обращения к LLM
+        if ANALYSIS_MODE == "local" or (ANALYSIS_MODE == "hybrid" and not has_history):
+            local_preferences, confidence = extract_preferences(user_prompt)
+            if ANALYSIS_MODE == "local" or confidence >= LOCAL_EXTRACTOR_MIN_CONFIDENCE:
+                validate_llm_response(local_preferences)
+                if conversation_id:
+                    await _remember_conversation(
+                        conversation_id,
+                        user_prompt,
+                        json.dumps(local_preferences, ensure_ascii=False),
+                    )
+                return local_preferences
+
+        # Вариант промпта; в истории диалога ответы хранятся полными значениями,
+        # поэтому продолжение диалога всегда идёт с полным промптом
+        compact = not has_history and choose_prompt_variant() == "compact"
+        prompt_type = "analysis_compact" if compact else "analysis"
+
         # Получаем system prompt для анализа
-        system_prompt = get_system_prompt("analysis")
+        system_prompt = get_system_prompt(prompt_type)
 
         # Формируем сообщения для LLM
         messages = [
@@ -315,58 +528,134 @@ async def analyze_user_preferences(user_prompt: str, conversation_id: str = None
         ]
 
         # Добавляем историю диалога, если есть
-        if conversation_id and conversation_id in _conversation_cache:
-            previous_messages = _conversation_cache[conversation_id]
+        if has_history:
             messages = [messages[0]] + previous_messages + [messages[1]]
 
-        # Запрос к LLM
-        completion = client.chat.completions.create(
-            model="openai/gpt-4o",
-            messages=messages,
-            response_format={"type": "json_object"},
+        # Запрос к LLM: ответ по JSON-схеме, исправленный и провалидированный
+        response_data, response_content = await _request_categories(
+            messages,
             temperature=0.3,  # Чуть больше креативности
-            max_tokens=800,
+            max_tokens=300 if compact else 800,
+            prompt_type=prompt_type,
+            compact=compact,
         )
 
-        response_content = completion.choices[0].message.content
-
-        # Парсим JSON-ответ
-        response_data = json.loads(response_content)
-
-        # Валидируем структуру и значения
-        validate_llm_response(response_data)
+        # Кэшируем только ответы без учёта истории диалога
+        if cache_key is not None:
+            _preferences_cache.set(cache_key, copy.deepcopy(response_data))
 
         # Сохраняем историю диалога, если нужно
         if conversation_id:
-            if conversation_id not in _conversation_cache:
-                _conversation_cache[conversation_id] = []
-            _conversation_cache[conversation_id].extend(
-                [
-                    {"role": "user", "content": user_prompt},
-                    {"role": "assistant", "content": response_content},
-                ]
-            )
-            # Ограничиваем размер истории (последние 10 сообщений)
-            if len(_conversation_cache[conversation_id]) > 10:
-                _conversation_cache[conversation_id] = _conversation_cache[
-                    conversation_id
-                ][-10:]
+            await _remember_conversation(conversation_id, user_prompt, response_content)
 
-        print("УСПЕШНО ВАЛИДИРОВАНО", response_data)
+        logger.debug("Предпочтения проверены: %s", response_data)
         return response_data
 
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Неверный JSON в ответе LLM: {e}\nОтвет: {response_content}")
     except Exception as e:
         raise ValueError(f"Ошибка при анализе предпочтений: {e}")
 
 
+# --- Кэш объяснений: (нормализованный запрос, id места, версия места) ---
+_explanation_cache = TTLCache(
+    maxsize=EXPLANATION_CACHE_SIZE, ttl=EXPLANATION_CACHE_TTL, name="explanation"
+)
+
+# Поля места, от которых зависит текст объяснения
+_EXPLANATION_FIELDS = (
+    "title",
+    "entity_types",
+    "atmosphere_tags",
+    "purpose_tags",
+    "features",
+    "budget_level",
+    "best_time",
+    "overall_rating",
+)
+
+
+def get_place_version(place_data: Dict[str, Any]) -> str:
+    """
+    Возвращает короткий хэш полей места, влияющих на объяснение.
+    Меняется при любом обновлении тегов или рейтинга места.
+    """
+    payload = json.dumps(
+        [place_data.get(field) for field in _EXPLANATION_FIELDS],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _explanation_cache_key(user_prompt: str, place_data: Dict[str, Any]):
+    """
+    Ключ кэша объяснений для пары (запрос, место).
+    """
+    return (
+        normalize_prompt(user_prompt, strip_stopwords=PREFERENCES_CACHE_STRIP_STOPWORDS),
+        place_data.get("id", place_data.get("title")),
+        get_place_version(place_data),
+    )
+
+
+def get_explanation_cache_stats() -> Dict[str, Any]:
+    """
+    Возвращает статистику кэша объяснений.
+    """
+    return _explanation_cache.stats()
+
+
+def _llm_explanations_enabled() -> bool:
+    """
+    Проверяет, генерируются ли объяснения через LLM (иначе — по шаблонам).
+    """
+    return ANALYSIS_MODE != "local" and EXPLANATION_MODE == "llm"
+
+
+def _describe_place(place_data: Dict[str, Any]) -> str:
+    """
+    Формирует текстовое описание места для LLM.
+    """
+    best_time = place_data.get("best_time") or []
+    if isinstance(best_time, str):
+        best_time = [best_time]
+
+    return f"""- Название: {place_data.get('title', 'Неизвестно')}
+- Тип: {', '.join(place_data.get('entity_types', []))}
+- Атмосфера: {', '.join(place_data.get('atmosphere_tags', []))}
+- Для чего подходит: {', '.join(place_data.get('purpose_tags', []))}
+- Особенности: {', '.join(place_data.get('features', []))}
+- Бюджет: {place_data.get('budget_level') or 'не указан'}
+- Лучшее время: {', '.join(best_time)}
+- Рейтинг: {place_data.get('overall_rating', 'не указан')}"""
+
+
+def _trim_explanation(explanation: str) -> str:
+    """
+    Ограничивает длину объяснения (на всякий случай).
+    """
+    explanation = explanation.strip()
+    if len(explanation) > 200:
+        explanation = explanation[:197] + "..."
+    return explanation
+
+
+@traced("explanation")
 async def generate_explanation(user_prompt: str, place_data: Dict[str, Any]) -> str:
     """
     Генерирует краткое объяснение, почему место подходит пользователю.
     user_prompt — исходный запрос пользователя.
     place_data — данные о месте.
     """
+    # LLM для объяснений отключена — собираем объяснение по шаблону
+    if not _llm_explanations_enabled():
+        return build_template_explanation(place_data)
+
+    cache_key = _explanation_cache_key(user_prompt, place_data)
+    cached = _explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # Получаем system prompt для объяснения
         system_prompt = get_system_prompt("explanation")
@@ -376,14 +665,7 @@ async def generate_explanation(user_prompt: str, place_data: Dict[str, Any]) ->
 Запрос пользователя: "{user_prompt}"
 
 Описание места:
-- Название: {place_data.get('title', 'Неизвестно')}
-- Тип: {', '.join(place_data.get('entity_types', []))}
-- Атмосфера: {', '.join(place_data.get('atmosphere_tags', []))}
-- Для чего подходит: {', '.join(place_data.get('purpose_tags', []))}
-- Особенности: {', '.join(place_data.get('features', []))}
-- Бюджет: {place_data.get('budget_level', 'не указан')}
-- Лучшее время: {', '.join(place_data.get('best_time', []))}
-- Рейтинг: {place_data.get('overall_rating', 'не указан')}
+{_describe_place(place_data)}
 """
 
         messages = [
@@ -392,66 +674,127 @@ async def generate_explanation(user_prompt: str, place_data: Dict[str, Any]) ->
         ]
 
         # Запрос к LLM для генерации объяснения
-        completion = client.chat.completions.create(
-            model="openai/gpt-4o",
+        completion = await chat_completion(
             messages=messages,
             temperature=0.7,  # Более креативные объяснения
             max_tokens=150,  # Краткость — 1-2 предложения
+            timeout=LLM_EXPLANATION_TIMEOUT,
+            prompt_type="explanation",
         )
 
-        explanation = completion.choices[0].message.content.strip()
-
-        # Ограничиваем длину объяснения (на всякий случай)
-        if len(explanation) > 200:
-            explanation = explanation[:197] + "..."
+        explanation = _trim_explanation(completion.choices[0].message.content)
+        _explanation_cache.set(cache_key, explanation)
 
-        print(f"Сгенерировано объяснение: {explanation}")
+        logger.debug("Сгенерировано объяснение: %s", explanation)
         return explanation
 
     except Exception as e:
-        print(f"Ошибка при генерации объяснения: {e}")
-        # Возвращаем стандартное объяснение в случае ошибки
-        place_types = ", ".join(place_data.get("entity_types", []))
-        return f"Это {place_types} подходит под ваш запрос."
+        logger.warning("Ошибка при генерации объяснения: %r", e)
+        record_exception(e)
+        # В случае ошибки собираем объяснение по шаблону
+        return build_template_explanation(place_data)
 
 
-def clear_conversation_cache(conversation_id: str = None):
+@traced("explanation")
+async def generate_explanations_batch(
+    user_prompt: str, places: List[Dict[str, Any]]
+) -> List[str]:
     """
-    Очищает кэш истории разговоров.
-    Если conversation_id не указан — очищает весь кэш.
+    Генерирует объяснения сразу для нескольких мест одним запросом к LLM.
+    Места, объяснения для которых уже есть в кэше, в запрос не попадают.
+    Возвращает объяснения в том же порядке, что и places.
     """
+    explanations: List[Optional[str]] = [None] * len(places)
+    missing = []  # (позиция, ключ кэша, место)
+
+    for position, place in enumerate(places):
+        if not _llm_explanations_enabled():
+            explanations[position] = build_template_explanation(place)
+            continue
+        cache_key = _explanation_cache_key(user_prompt, place)
+        cached = _explanation_cache.get(cache_key)
+        if cached is not None:
+            explanations[position] = cached
+        else:
+            missing.append((position, cache_key, place))
+
+    if missing:
+        try:
+            # Места нумеруются по порядку — id в БД могут отсутствовать
+            places_description = "\n\n".join(
+                f"Место id={number}:\n{_describe_place(place)}"
+                for number, (_, _, place) in enumerate(missing)
+            )
+            messages = [
+                {"role": "system", "content": get_system_prompt("explanation_batch")},
+                {
+                    "role": "user",
+                    "content": f'Запрос пользователя: "{user_prompt}"\n\n{places_description}',
+                },
+            ]
+
+            completion = await chat_completion(
+                messages=messages,
+                response_format={"type": "json_object"},
+                temperature=0.7,
+                max_tokens=min(120 * len(missing) + 100, 4000),
+                timeout=LLM_EXPLANATION_TIMEOUT * 2,
+                prompt_type="explanation_batch",
+            )
+
+            response_data = json.loads(completion.choices[0].message.content)
+            for item in response_data.get("explanations", []):
+                try:
+                    number = int(item["id"])
+                    text = _trim_explanation(str(item["explanation"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if 0 <= number < len(missing) and text:
+                    position, cache_key, _ = missing[number]
+                    explanations[position] = text
+                    _explanation_cache.set(cache_key, text)
+
+        except Exception as e:
+            logger.warning("Ошибка при пакетной генерации объяснений: %r", e)
+            record_exception(e)
+
+    # Для мест без объяснения (ошибка LLM или пропуск в ответе) — шаблонное
+    return [
+        explanation if explanation is not None else build_template_explanation(place)
+        for explanation, place in zip(explanations, places)
+    ]
+
+
+async def clear_conversation_cache(conversation_id: str = None):
+    """
+    Очищает историю разговоров.
+    Если conversation_id не указан — очищает всю историю.
+    """
+    store = get_conversation_store()
     if conversation_id:
-        _conversation_cache.pop(conversation_id, None)
+        await store.delete(conversation_id)
     else:
-        _conversation_cache.clear()
+        await store.clear()
 
 
 # --- Функция для обработки отзыва пользователя о месте ---
 
 
+@traced("review_analysis")
 async def process_place_review(user_review: str) -> Dict[str, Any]:
     """
     Обрабатывает отзыв пользователя и возвращает структурированные категории для места.
     Использует тот же шаблон, что и analyze_user_preferences, но с учетом специфики отзывов.
     """
-    try:
-        # Получаем system prompt для анализа
-        system_prompt = get_system_prompt("analysis")
-
-        # Дополняем промпт инструкциями для анализа отзывов
-        review_system_prompt = (
-            system_prompt
-            + """
-
-СЕЙЧАС ТЫ АНАЛИЗИРУЕШЬ ОТЗЫВ О МЕСТЕ. Пользователь описывает свои впечатления о конкретном месте.
-Извлеки из его описания категории, которые характеризуют это место.
+    # LLM отключена — категории извлекаются локальным словарём
+    if ANALYSIS_MODE == "local":
+        return extract_preferences(user_review)[0]
 
-ПРАВИЛА ДЛЯ ОТЗЫВОВ:
-1. Анализируй, каким пользователь описывает место - для чего оно подходит, какая там атмосфера
-2. Извлекай только те категории, которые явно следуют из описания
-3. Не добавляй категории, которые не упомянуты в отзыве
-"""
-        )
+    try:
+        # System prompt для отзывов: промпт анализа с инструкциями для отзывов
+        compact = choose_prompt_variant() == "compact"
+        prompt_type = "review_compact" if compact else "review"
+        review_system_prompt = get_system_prompt(prompt_type)
 
         messages = [
             {"role": "system", "content": review_system_prompt},
@@ -459,53 +802,16 @@ async def process_place_review(user_review: str) -> Dict[str, Any]:
         ]
 
         # Запрос к LLM для анализа отзыва
-        completion = client.chat.completions.create(
-            model="openai/gpt-4o",
-            messages=messages,
-            response_format={"type": "json_object"},
+        response_data, _ = await _request_categories(
+            messages,
             temperature=0.2,  # Более консервативно для отзывов
-            max_tokens=500,
+            max_tokens=300 if compact else 500,
+            prompt_type=prompt_type,
+            compact=compact,
         )
 
-        response_content = completion.choices[0].message.content
-
-        # Парсим JSON-ответ
-        response_data = json.loads(response_content)
-
-        # Валидируем структуру и значения
-        validate_llm_response(response_data)
-
-        print("ОТЗЫВ ОБРАБОТАН", response_data)
+        logger.debug("Отзыв обработан: %s", response_data)
         return response_data
 
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Неверный JSON в ответе LLM: {e}\nОтвет: {response_content}")
     except Exception as e:
         raise ValueError(f"Ошибка при обработке отзыва: {e}")
-
-
-def merge_categories(
-    existing_categories: Dict[str, Any], new_categories: Dict[str, Any]
-) -> Dict[str, Any]:
-    """
-    Объединяет существующие категории места с новыми из отзыва пользователя.
-    Массивы объединяются по уникальным значениям, одиночные поля — по приоритету новых данных.
-    """
-    merged = {}
-
-    # Объединяем массивы (entity_types, atmosphere_tags, purpose_tags, features)
-    array_fields = ["entity_types", "atmosphere_tags", "purpose_tags", "features"]
-    for field in array_fields:
-        existing = set(existing_categories.get(field, []))
-        new = set(new_categories.get(field, []))
-        merged[field] = list(existing.union(new))
-
-    # Для best_time и budget_level: если новое значение есть — берем его, иначе оставляем старое
-    merged["best_time"] = new_categories.get("best_time") or existing_categories.get(
-        "best_time", ""
-    )
-    merged["budget_level"] = new_categories.get(
-        "budget_level"
-    ) or existing_categories.get("budget_level")
-
-    return merged
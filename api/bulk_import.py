@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import math
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.opening_hours import open_slots
+
+# --- Массовый импорт мест (NDJSON / CSV) ---
+# Файл читается построчно и потоком уходит в Postgres через COPY во временную
+# таблицу places_import — в памяти процесса никогда не лежит больше одной
+# строки файла. Затем один запрос переносит строки в places: новые места
+# добавляются, существующие (по url) обновляются. Если url встречается в
+# файле несколько раз, побеждает последняя строка. Триггер БД заполняет id
+# тегов, generated-столбцы (search_vector, geo_cell) считает сама БД, слоты
+# часов работы считаются здесь же при чтении файла.
+#
+# Обновление существующего места меняет только поля, которые есть в записи:
+#   - теги (entity_types, atmosphere_tags, purpose_tags, features)
+#     объединяются с тегами места — как при обработке отзывов, поэтому
+#     теги из отзывов импорт не стирает;
+#   - часы работы (opening_hours, working_days, is_24_7 и слоты) заменяются
+#     вместе, если в записи есть хотя бы одно из этих полей;
+#   - остальные поля заменяются, если указаны, иначе остаются прежними.
+# Новое место получает для отсутствующих полей значения по умолчанию.
+#
+# CLI: python -m api.bulk_import places.ndjson [--format csv]
+
+# Поля места, которые можно импортировать (порядок столбцов COPY)
+IMPORT_FIELDS = (
+    "title", "url", "photo", "description",
+    "entity_types", "atmosphere_tags", "purpose_tags", "features",
+    "best_time", "working_days", "budget_level", "opening_hours", "is_24_7",
+    "overall_rating", "review_count", "latitude", "longitude",
+)
+_LIST_FIELDS = ("entity_types", "atmosphere_tags", "purpose_tags", "features", "working_days")
+_TAG_FIELDS = ("entity_types", "atmosphere_tags", "purpose_tags", "features")
+# Поля часов работы: в записи есть любое из них — расписание задано целиком
+_SCHEDULE_FIELDS = ("opening_hours", "working_days", "is_24_7")
+_BUDGET_LEVELS = ("бюджетный", "средний", "дорогой")
+
+# Ограничения длины строковых столбцов places
+_MAX_LENGTHS = {"title": 255, "best_time": 20, "budget_level": 20, "opening_hours": 100}
+
+# Допустимые координаты (как у PlaceCreate): |значение| <= предел
+_COORDINATE_LIMITS = {"latitude": 90.0, "longitude": 180.0}
+
+# Записей, разбираемых в потоке за один раз: чтение и разбор файла не
+# блокируют цикл событий, COPY получает записи пачками
+_PARSE_BATCH_SIZE = 1000
+
+# Столбцы временной таблицы: номер строки файла, поля места, слоты часов работы.
+# NULL — поля нет в записи (is_24_7 IS NULL — в записи нет часов работы)
+_STAGING_COLUMNS = ("line", *IMPORT_FIELDS, "open_slots")
+
+_CREATE_STAGING = """
+    CREATE TEMP TABLE places_import (
+        line integer NOT NULL,
+        title varchar(255) NOT NULL,
+        url text NOT NULL,
+        photo text,
+        description text,
+        entity_types varchar[],
+        atmosphere_tags varchar[],
+        purpose_tags varchar[],
+        features varchar[],
+        best_time varchar(20),
+        working_days varchar[],
+        budget_level varchar(20),
+        opening_hours varchar(100),
+        is_24_7 boolean,
+        overall_rating double precision,
+        review_count integer,
+        latitude double precision,
+        longitude double precision,
+        open_slots smallint[]
+    ) ON COMMIT DROP
+"""
+
+_MERGE_COLUMNS = (*IMPORT_FIELDS, "open_slots")
+
+# Значения по умолчанию для нового места (NOT NULL-столбцы и прежние умолчания)
+_INSERT_DEFAULTS = {
+    **{field: "'{}'" for field in (*_TAG_FIELDS, "working_days")},
+    "is_24_7": "false",
+    "overall_rating": "0",
+    "review_count": "0",
+}
+
+
+def merge_assignment(column: str) -> str:
+    """
+    Новое значение столбца существующего места p по строке файла r.
+    """
+    if column in _TAG_FIELDS:
+        return f"array_union(p.{column}, coalesce(r.{column}, '{{}}'))"
+    if column in (*_SCHEDULE_FIELDS, "open_slots"):
+        return f"CASE WHEN r.is_24_7 IS NULL THEN p.{column} ELSE r.{column} END"
+    return f"coalesce(r.{column}, p.{column})"
+
+
+def insert_value(column: str) -> str:
+    """
+    Значение столбца нового места по строке файла r.
+    """
+    if column in _INSERT_DEFAULTS:
+        return f"coalesce(r.{column}, {_INSERT_DEFAULTS[column]})"
+    return f"r.{column}"
+
+
+# Существующие места обновляются (UPDATE), новые добавляются (INSERT) —
+# в одном запросе. INSERT ... ON CONFLICT здесь не подходит: отсутствующие
+# поля нового места должны получить умолчания, а у существующего — остаться
+# NULL, чтобы не затереть прежние значения. url, добавленный параллельно
+# другим запросом, пропускается (ON CONFLICT DO NOTHING).
+_MERGE = f"""
+    WITH file_rows AS (
+        SELECT DISTINCT ON (url) {", ".join(_MERGE_COLUMNS)}
+        FROM places_import
+        ORDER BY url, line DESC
+    ),
+    updated AS (
+        UPDATE places AS p SET
+            {", ".join(f"{column} = {merge_assignment(column)}" for column in _MERGE_COLUMNS if column != "url")}
+        FROM file_rows AS r
+        WHERE p.url = r.url
+        RETURNING p.id, false AS inserted
+    ),
+    inserted AS (
+        INSERT INTO places ({", ".join(_MERGE_COLUMNS)})
+        SELECT {", ".join(insert_value(column) for column in _MERGE_COLUMNS)}
+        FROM file_rows AS r
+        WHERE NOT EXISTS (SELECT 1 FROM places AS p WHERE p.url = r.url)
+        ON CONFLICT (url) DO NOTHING
+        RETURNING id, true AS inserted
+    )
+    SELECT id, inserted FROM updated
+    UNION ALL
+    SELECT id, inserted FROM inserted
+"""
+
+# Сколько ошибок разбора строк попадает в отчёт
+MAX_REPORTED_ERRORS = 20
+
+
+# --- Чтение файла ---
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Записи NDJSON: (номер строки, объект). Пустые строки пропускаются.
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line:
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f"некорректный JSON: {e}")
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Записи CSV с заголовком: (номер строки, словарь). Пустые ячейки —
+    отсутствующие значения; списки — JSON-массивом или через ";".
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {
+            field: value
+            for field, value in row.items()
+            if field is not None and value not in (None, "")
+        }
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "да")
+    return bool(value)
+
+
+def normalize_record(record: Any) -> Tuple:
+    """
+    Проверяет запись и приводит её к строке временной таблицы (без номера строки).
+    Бросает ValueError, если запись некорректна.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("запись должна быть объектом")
+    if not record.get("title") or not record.get("url"):
+        raise ValueError("title и url обязательны")
+
+    # Отсутствующее поле — None: у существующего места оно не меняется
+    has_schedule = any(record.get(field) is not None for field in _SCHEDULE_FIELDS)
+    values: Dict[str, Any] = {}
+    for field in IMPORT_FIELDS:
+        value = record.get(field)
+        if value is None:
+            pass
+        elif field in _LIST_FIELDS:
+            if isinstance(value, str):
+                value = json.loads(value) if value.startswith("[") else [
+                    item.strip() for item in value.split(";") if item.strip()
+                ]
+            if not isinstance(value, list):
+                raise ValueError(f"{field} должен быть списком")
+            value = [str(item) for item in value]
+        elif field == "is_24_7":
+            value = _to_bool(value)
+        elif field == "overall_rating":
+            value = float(value)
+            if not 0.0 <= value <= 5.0:
+                raise ValueError("overall_rating должен быть от 0 до 5")
+        elif field == "review_count":
+            value = int(value)
+        elif field in _COORDINATE_LIMITS:
+            value = float(value)
+            # NaN и бесконечность тоже отклоняются
+            limit = _COORDINATE_LIMITS[field]
+            if not (math.isfinite(value) and -limit <= value <= limit):
+                raise ValueError(f"{field} должен быть от {-limit:g} до {limit:g}")
+        else:
+            value = str(value)
+        values[field] = value
+
+    if values["budget_level"] is not None and values["budget_level"] not in _BUDGET_LEVELS:
+        raise ValueError("budget_level должен быть одним из: бюджетный, средний, дорогой")
+    if (values["latitude"] is None) != (values["longitude"] is None):
+        raise ValueError("latitude и longitude указываются вместе")
+    for field, max_length in _MAX_LENGTHS.items():
+        if values[field] is not None and len(values[field]) > max_length:
+            raise ValueError(f"{field} длиннее {max_length} символов")
+
+    # Часы работы задаются целиком: недостающие поля расписания — по умолчанию
+    slots = None
+    if has_schedule:
+        if values["working_days"] is None:
+            values["working_days"] = []
+        if values["is_24_7"] is None:
+            values["is_24_7"] = False
+        slots = open_slots(values["opening_hours"], values["working_days"], values["is_24_7"])
+    return (*(values[field] for field in IMPORT_FIELDS), slots)
+
+
+# --- Импорт ---
+
+async def import_places(lines: Iterable[str], fmt: str = "ndjson", engine=None) -> Dict[str, Any]:
+    """
+    Импортирует места из строк файла формата fmt ("ndjson" или "csv") одной
+    транзакцией. Возвращает отчёт: сколько строк прочитано, отклонено,
+    добавлено и обновлено мест, время этапов и скорость.
+    """
+    if fmt not in READERS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    if engine is None:
+        from api.database import engine
+
+    report: Dict[str, Any] = {"read": 0, "rejected": 0, "inserted": 0, "updated": 0}
+    errors: List[Dict[str, Any]] = []
+
+    def parsed() -> Iterator[Tuple]:
+        for line, record in READERS[fmt](lines):
+            report["read"] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                row = normalize_record(record)
+            except (ValueError, TypeError) as e:
+                report["rejected"] += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line, "error": str(e)})
+                continue
+            yield (line, *row)
+
+    async def records() -> AsyncIterator[Tuple]:
+        rows = parsed()
+        while batch := await asyncio.to_thread(list, itertools.islice(rows, _PARSE_BATCH_SIZE)):
+            for row in batch:
+                yield row
+
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        connection = raw.driver_connection  # asyncpg.Connection
+
+        async with connection.transaction():
+            await connection.execute(_CREATE_STAGING)
+            await connection.copy_records_to_table(
+                "places_import", records=records(), columns=list(_STAGING_COLUMNS)
+            )
+            copied = time.perf_counter()
+
+            # Результат RETURNING читается курсором — id не копятся в памяти
+            async for row in connection.cursor(_MERGE, prefetch=1000):
+                report["inserted" if row["inserted"] else "updated"] += 1
+    finished = time.perf_counter()
+
+    total = finished - started
+    report.update(
+        errors=errors,
+        copy_seconds=round(copied - started, 3),
+        merge_seconds=round(finished - copied, 3),
+        total_seconds=round(total, 3),
+        rows_per_second=round(report["read"] / total, 1) if total > 0 else None,
+    )
+    return report
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """
+    Формат файла по расширению (по умолчанию NDJSON).
+    """
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт мест из NDJSON или CSV")
+    parser.add_argument("path", help="Путь к файлу")
+    parser.add_argument("--format", choices=sorted(READERS), help="Формат (по умолчанию — по расширению)")
+    args = parser.parse_args()
+
+    async def run():
+        from api.database import engine
+
+        with open(args.path, encoding="utf-8-sig", newline="") as file:
+            report = await import_places(file, args.format or detect_format(args.path))
+        await engine.dispose()
+        return report
+
+    report = asyncio.run(run())
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from api.metrics import record_cache_lookup
+
+# --- Нормализация пользовательских запросов для ключей кэша ---
+
+# Служебные слова, которые не меняют смысл запроса.
+# Отрицания ("не", "без") намеренно не входят в список.
+STOP_WORDS = frozenset(
+    [
+        "а", "и", "или", "но", "в", "во", "на", "с", "со", "к", "ко", "у",
+        "о", "об", "от", "до", "из", "за", "по", "для", "же", "ли", "бы",
+        "то", "это", "где", "куда", "как", "что", "какой", "какое", "какие",
+        "я", "мы", "мне", "нам", "хочу", "хотим", "хотелось", "ищу", "ищем",
+        "найти", "подскажи", "подскажите", "посоветуй", "посоветуйте",
+        "можно", "нужно", "нужен", "нужна", "пожалуйста", "очень",
+    ]
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str, strip_stopwords: bool = False) -> str:
+    """
+    Приводит запрос к каноническому виду: нижний регистр, ё -> е,
+    без пунктуации и лишних пробелов. Опционально удаляет стоп-слова.
+    """
+    text = text.lower().replace("ё", "е")
+    text = _PUNCTUATION_RE.sub(" ", text)
+    words = _WHITESPACE_RE.split(text.strip())
+    if strip_stopwords:
+        meaningful = [word for word in words if word not in STOP_WORDS]
+        # Если запрос состоит только из стоп-слов, оставляем его как есть
+        words = meaningful or words
+    return " ".join(words)
+
+
+# --- Кэш с вытеснением по LRU и времени жизни (TTL) ---
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру кэш: вытесняет давно неиспользуемые записи (LRU)
+    и записи старше ttl секунд. Ведёт счётчики попаданий и промахов
+    (для кэша с именем name — также в метриках Prometheus).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу или default (с учётом TTL).
+        """
+        item = self._data.get(key)
+        if item is None:
+            self._record(False)
+            return default
+
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            # Запись устарела — удаляем и считаем промахом
+            del self._data[key]
+            self._record(False)
+            return default
+
+        self._data.move_to_end(key)
+        self._record(True)
+        return value
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name is not None:
+            record_cache_lookup(self.name, hit)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Сохраняет значение, при переполнении вытесняет самую старую запись.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Удаляет запись и возвращает её значение.
+        """
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        """
+        Очищает кэш (счётчики сохраняются).
+        """
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику работы кэша.
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
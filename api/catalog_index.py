@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from api.config import CATALOG_INDEX_REFRESH_INTERVAL
+from api.geo import GeoQuery, cell_ranges, distance_km, geo_cell
+from api.opening_hours import SLOTS_PER_WEEK, open_slots
+from api.models import Place
+from api.pagination import SortKey
+from api.projection import match_details
+from api.tags import tag_idf
+from api.text_search import TextHits
+
+logger = logging.getLogger(__name__)
+
+# --- Индекс каталога в памяти процесса ---
+# Каталог мест небольшой и целиком помещается в память. Для каждого значения
+# тега (entity_types, atmosphere_tags, purpose_tags, features, budget_level,
+# best_time) хранится битовая маска по местам (NumPy-массив bool).
+# Релевантность всех мест считается одним векторным проходом, затем
+# выбираются лучшие limit мест в том же порядке, что и в SQL-поиске:
+# релевантность, рейтинг, количество отзывов.
+# Для поиска рядом места разложены по ячейкам сетки (api/geo.py): расстояние
+# считается только для мест из ячеек, покрывающих круг поиска.
+# Часы работы хранятся упакованной битовой сеткой слотов недели (api/opening_hours.py).
+#
+# Запись через api/crud.py сразу обновляет индекс своего процесса; изменения,
+# сделанные другими воркерами, подтягиваются полной перезагрузкой раз в
+# CATALOG_INDEX_REFRESH_INTERVAL секунд (в фоне, без блокировки поиска).
+
+INDEXED_FIELDS = (
+    "entity_types",
+    "atmosphere_tags",
+    "purpose_tags",
+    "features",
+    "budget_level",
+    "best_time",
+)
+SCALAR_FIELDS = ("budget_level", "best_time")
+
+# Начальная ёмкость массивов (растёт удвоением)
+_INITIAL_CAPACITY = 1024
+
+
+class CatalogIndex:
+    """
+    Битовые маски тегов по местам и векторный подсчёт релевантности.
+    """
+
+    def __init__(self):
+        self._capacity = 0
+        self._size = 0
+        self._places: List[Optional[Dict[str, Any]]] = []
+        self._positions: Dict[int, int] = {}
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._ratings = np.zeros(0, dtype=np.float64)
+        self._review_counts = np.zeros(0, dtype=np.int64)
+        self._lats = np.zeros(0, dtype=np.float64)
+        self._lons = np.zeros(0, dtype=np.float64)
+        self._cells: Dict[int, set] = {}
+        self._open_bits = np.zeros((0, SLOTS_PER_WEEK // 8), dtype=np.uint8)
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {
+            field: {} for field in INDEXED_FIELDS
+        }
+        self.loaded_at: Optional[float] = None
+        # Записи, сделанные во время перезагрузки (применяются к новому индексу)
+        self._writes_during_load: Optional[List[Dict[str, Any]]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._load_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- Загрузка и обновление ---
+
+    def _grow(self, capacity: int):
+        """
+        Увеличивает ёмкость всех массивов до capacity.
+        """
+        def grown(array: np.ndarray) -> np.ndarray:
+            result = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            result[: len(array)] = array
+            return result
+
+        self._ids = grown(self._ids)
+        self._ratings = grown(self._ratings)
+        self._review_counts = grown(self._review_counts)
+        self._lats = grown(self._lats)
+        self._lons = grown(self._lons)
+        self._open_bits = grown(self._open_bits)
+        for bitmaps in self._bitmaps.values():
+            for value in bitmaps:
+                bitmaps[value] = grown(bitmaps[value])
+        self._places.extend([None] * (capacity - self._capacity))
+        self._capacity = capacity
+
+    def _bitmap(self, field: str, value: str) -> np.ndarray:
+        """
+        Возвращает (создавая при необходимости) маску мест со значением тега.
+        """
+        bitmaps = self._bitmaps[field]
+        bitmap = bitmaps.get(value)
+        if bitmap is None:
+            bitmap = bitmaps[value] = np.zeros(self._capacity, dtype=bool)
+        return bitmap
+
+    @staticmethod
+    def _cell(place: Dict[str, Any]) -> Optional[int]:
+        if place.get("latitude") is None or place.get("longitude") is None:
+            return None
+        return geo_cell(place["latitude"], place["longitude"])
+
+    @staticmethod
+    def _values(place: Dict[str, Any], field: str) -> List[str]:
+        value = place.get(field)
+        if field in SCALAR_FIELDS:
+            return [value] if value else []
+        return list(value or [])
+
+    def upsert(self, place: Dict[str, Any]):
+        """
+        Добавляет место в индекс или обновляет его (place — результат Place.to_dict()).
+        """
+        if self._writes_during_load is not None:
+            self._writes_during_load.append(place)
+
+        position = self._positions.get(place["id"])
+        if position is None:
+            if self._size == self._capacity:
+                self._grow(max(_INITIAL_CAPACITY, self._capacity * 2))
+            position = self._size
+            self._size += 1
+            self._positions[place["id"]] = position
+        else:
+            # Снимаем старые теги места
+            old_place = self._places[position]
+            for field in INDEXED_FIELDS:
+                for value in self._values(old_place, field):
+                    self._bitmaps[field][value][position] = False
+            old_cell = self._cell(old_place)
+            if old_cell is not None:
+                self._cells[old_cell].discard(position)
+
+        self._places[position] = place
+        self._ids[position] = place["id"]
+        self._ratings[position] = place.get("overall_rating") or 0.0
+        self._review_counts[position] = place.get("review_count") or 0
+        for field in INDEXED_FIELDS:
+            for value in self._values(place, field):
+                self._bitmap(field, value)[position] = True
+        open_bits = np.zeros(SLOTS_PER_WEEK, dtype=bool)
+        slots = open_slots(place.get("opening_hours"), place.get("working_days"), place.get("is_24_7"))
+        if slots:
+            open_bits[slots] = True
+        self._open_bits[position] = np.packbits(open_bits)
+        cell = self._cell(place)
+        if cell is not None:
+            self._lats[position] = place["latitude"]
+            self._lons[position] = place["longitude"]
+            self._cells.setdefault(cell, set()).add(position)
+
+    def _rebuild(self, places: List[Dict[str, Any]]):
+        """
+        Строит индекс заново по полному списку мест.
+        """
+        fresh = CatalogIndex()
+        fresh._grow(max(_INITIAL_CAPACITY, len(places)))
+        for place in places:
+            fresh.upsert(place)
+
+        self._capacity, self._size = fresh._capacity, fresh._size
+        self._places, self._positions = fresh._places, fresh._positions
+        self._ids, self._ratings = fresh._ids, fresh._ratings
+        self._review_counts, self._bitmaps = fresh._review_counts, fresh._bitmaps
+        self._lats, self._lons, self._cells = fresh._lats, fresh._lons, fresh._cells
+        self._open_bits = fresh._open_bits
+        self.loaded_at = time.monotonic()
+
+    async def load(self, session_maker=None):
+        """
+        Загружает весь каталог из БД и перестраивает индекс.
+        """
+        async with self._load_lock:
+            await self._load(session_maker)
+
+    async def _load(self, session_maker=None):
+        if session_maker is None:
+            from api.database import async_session_maker as session_maker
+
+        self._writes_during_load = []
+        try:
+            async with session_maker() as session:
+                result = await session.execute(select(Place))
+                places = [place.to_dict() for place in result.scalars()]
+            writes, self._writes_during_load = self._writes_during_load, None
+            self._rebuild(places)
+            # Записи, сделанные пока шёл запрос, могли в него не попасть
+            for place in writes:
+                self.upsert(place)
+        finally:
+            self._writes_during_load = None
+        logger.info("Индекс каталога загружен: %d мест", len(places))
+
+    async def ensure_fresh(self):
+        """
+        Загружает индекс при первом обращении; если он устарел — запускает
+        перезагрузку в фоне, а поиск пока идёт по текущему индексу.
+        """
+        if self.loaded_at is None:
+            async with self._load_lock:
+                # Одновременные первые запросы ждут одну загрузку
+                if self.loaded_at is None:
+                    await self._load()
+            return
+
+        stale = time.monotonic() - self.loaded_at > CATALOG_INDEX_REFRESH_INTERVAL
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.exception("Ошибка при обновлении индекса каталога: %s", e)
+
+    # --- Поиск ---
+
+    def _field_mask(self, field: str, values: List[str]) -> np.ndarray:
+        """
+        Маска мест, у которых есть хотя бы одно из значений поля.
+        """
+        mask = np.zeros(self._size, dtype=bool)
+        bitmaps = self._bitmaps[field]
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                mask |= bitmap[: self._size]
+        return mask
+
+    def _field_matched(self, field: str, values: List[str], use_idf: bool):
+        """
+        Суммарный вес совпавших запрошенных тегов поля для каждого места и
+        суммарный вес всех запрошенных тегов; при use_idf теги взвешиваются
+        по редкости (как в SQL-поиске).
+        """
+        matched = np.zeros(self._size, dtype=np.float64)
+        total_weight = 0.0
+        bitmaps = self._bitmaps[field]
+        for value in dict.fromkeys(values):
+            bitmap = bitmaps.get(value)
+            df = int(np.count_nonzero(bitmap[: self._size])) if bitmap is not None else 0
+            weight = tag_idf(self._size, df) if use_idf else 1.0
+            total_weight += weight
+            if bitmap is not None:
+                matched += bitmap[: self._size] * weight
+        return matched, total_weight
+
+    def search(
+        self,
+        preferences: Dict[str, Any],
+        weights: Dict[str, float],
+        min_relevance: float = 0.0,
+        limit: int = 20,
+        use_idf: bool = False,
+        after: Optional[SortKey] = None,
+        text_hits: Optional[TextHits] = None,
+        text_weight: float = 0.0,
+        near: Optional[GeoQuery] = None,
+        geo_weight: float = 0.0,
+        open_slot: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Поиск с той же семантикой, что и search_places_advanced в SQL:
+        обязательное совпадение entity_types и budget_level (если указаны),
+        для массивов — вес поля, умноженный на долю совпавших тегов, для
+        одиночных полей — вес при точном совпадении; сортировка по
+        релевантности, рейтингу, количеству отзывов и id.
+        after — ключ последнего места предыдущей страницы: выдача продолжается после него.
+        text_hits — совпадения с текстом запроса (api/text_search.py): их оценка
+        с весом text_weight добавляется к релевантности, места с совпавшим
+        названием проходят обязательные фильтры.
+        near — точка и радиус: остаются только места в радиусе, близость
+        с весом geo_weight добавляется к релевантности.
+        open_slot — слот недели: остаются только места, открытые в этот момент.
+        """
+        size = self._size
+        scores = np.zeros(size, dtype=np.float64)
+        candidates = np.ones(size, dtype=bool)
+
+        for field, weight in weights.items():
+            if field not in self._bitmaps or not preferences.get(field):
+                continue
+            values = self._values(preferences, field)
+            if field in SCALAR_FIELDS:
+                scores += self._field_mask(field, values) * weight
+            else:
+                matched, total_weight = self._field_matched(field, values, use_idf)
+                scores += matched * (weight / total_weight)
+            if field in ("entity_types", "budget_level"):
+                candidates &= self._field_mask(field, values)
+
+        # Обязательные поля фильтруют, даже если их нет среди весов
+        for field in ("entity_types", "budget_level"):
+            if preferences.get(field) and field not in weights:
+                candidates &= self._field_mask(field, self._values(preferences, field))
+
+        # Совпадения с текстом запроса (найдены по индексам БД)
+        for place_id, (text_score, title_match) in (text_hits or {}).items():
+            position = self._positions.get(place_id)
+            if position is None:
+                continue
+            scores[position] += text_score * text_weight
+            if title_match:
+                candidates[position] = True
+
+        # Поиск рядом: только места из ячеек, покрывающих круг
+        distances = None
+        if near is not None:
+            nearby = self._nearby_positions(near)
+            distances = np.full(size, np.nan)
+            distances[nearby] = distance_km(
+                near.lat, near.lon, self._lats[nearby], self._lons[nearby]
+            )
+            in_radius = np.zeros(size, dtype=bool)
+            in_radius[nearby] = distances[nearby] <= near.radius_km
+            scores[in_radius] += (1 - distances[in_radius] / near.radius_km) * geo_weight
+            candidates &= in_radius
+
+        # Открыто в заданный момент: бит слота в упакованной сетке
+        if open_slot is not None:
+            byte, bit = divmod(open_slot, 8)
+            candidates &= (self._open_bits[:size, byte] >> (7 - bit) & 1).astype(bool)
+
+        candidates &= scores >= min_relevance
+        if after is not None:
+            candidates &= self._after_mask(scores, after)
+        positions = np.flatnonzero(candidates)
+        if len(positions) == 0 or limit <= 0:
+            return []
+
+        # Отсекаем заведомо не попадающих в top-K по релевантности
+        if len(positions) > limit:
+            kth = np.partition(scores[positions], len(positions) - limit)[len(positions) - limit]
+            positions = positions[scores[positions] >= kth]
+
+        order = np.lexsort(
+            (
+                self._ids[positions],
+                -self._review_counts[positions],
+                -self._ratings[positions],
+                -scores[positions],
+            )
+        )
+        top = positions[order[:limit]]
+
+        return [
+            self._result(
+                self._places[position],
+                float(scores[position]),
+                preferences,
+                float(distances[position]) if distances is not None else None,
+            )
+            for position in top
+        ]
+
+    def _nearby_positions(self, near: GeoQuery) -> np.ndarray:
+        """
+        Позиции мест из ячеек сетки, покрывающих круг поиска.
+        """
+        positions = []
+        for first, last in cell_ranges(near):
+            if last - first + 1 <= len(self._cells):
+                cells = (self._cells.get(cell) for cell in range(first, last + 1))
+            else:
+                cells = (members for cell, members in self._cells.items() if first <= cell <= last)
+            for members in cells:
+                if members:
+                    positions.extend(members)
+        return np.fromiter(positions, dtype=np.int64, count=len(positions))
+
+    def _after_mask(self, scores: np.ndarray, after: SortKey) -> np.ndarray:
+        """
+        Маска мест, идущих в порядке выдачи строго после ключа after.
+        """
+        relevance, rating, review_count, place_id = after
+        ratings = self._ratings[: self._size]
+        review_counts = self._review_counts[: self._size]
+        ids = self._ids[: self._size]
+        return (scores < relevance) | (scores == relevance) & (
+            (ratings < rating)
+            | (ratings == rating)
+            & ((review_counts < review_count) | (review_counts == review_count) & (ids > place_id))
+        )
+
+    @staticmethod
+    def _result(
+        place: Dict[str, Any],
+        relevance_score: float,
+        preferences: Dict[str, Any],
+        distance: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Копия места с релевантностью, расстоянием и деталями совпадений (как в SQL-поиске).
+        """
+        place_data = dict(place)
+        place_data["relevance_score"] = relevance_score
+        place_data["distance_km"] = distance
+        place_data["match_details"] = match_details(place, preferences)
+        return place_data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "places": len(self),
+            "capacity": self._capacity,
+            "tags": {field: len(bitmaps) for field, bitmaps in self._bitmaps.items()},
+            "geo_cells": len(self._cells),
+            "age": time.monotonic() - self.loaded_at if self.loaded_at is not None else None,
+        }
+
+
+# --- Индекс процесса ---
+_index: Optional[CatalogIndex] = None
+
+
+def get_catalog_index() -> CatalogIndex:
+    """
+    Возвращает индекс каталога текущего процесса (создаётся лениво, загружается
+    при первом поиске).
+    """
+    global _index
+
+    if _index is None:
+        _index = CatalogIndex()
+    return _index
+
+
+def index_places(places: List[Place]):
+    """
+    Обновляет индекс после записи мест в БД (если индекс уже загружен).
+    """
+    index_place_dicts([place.to_dict() for place in places])
+
+
+def index_place_dicts(places: List[Dict[str, Any]]):
+    """
+    То же для мест в виде словарей (как Place.to_dict()).
+    """
+    if _index is not None and _index.loaded_at is not None:
+        for place in places:
+            _index.upsert(place)
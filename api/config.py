@@ -11,10 +11,134 @@ DB_HOST = os.getenv("DB_HOST")      # Адрес сервера БД
 DB_PORT = os.getenv("DB_PORT")      # Порт сервера БД
 DB_NAME = os.getenv("DB_NAME")      # Имя базы данных
 
+# Профиль подключения к БД
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"                   # Выводить все SQL-запросы (отладка)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))                          # Постоянных соединений в пуле
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))                    # Дополнительных соединений при пике
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))                  # Ожидание свободного соединения (сек)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))                  # Пересоздавать соединения старше (сек)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # Проверять соединение перед выдачей
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))  # Подготовленных запросов на соединение
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))              # Порог лога медленных запросов (мс)
+
+# Реплики для чтения (те же пользователь, пароль и база, что и у основной БД)
+DB_REPLICA_HOSTS = [
+    host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()
+]  # Адреса реплик через запятую: "replica1:5432,replica2:5432"
+DB_READ_STRATEGY = os.getenv("DB_READ_STRATEGY", "round_robin").lower()      # "round_robin" или "least_busy"
+DB_REPLICA_CONNECT_TIMEOUT = float(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))  # Таймаут соединения с репликой (сек)
+DB_REPLICA_RETRY_INTERVAL = float(os.getenv("DB_REPLICA_RETRY_INTERVAL", "30"))   # Пауза после сбоя реплики (сек)
+DB_READ_YOUR_WRITES_SECONDS = float(
+    os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5")
+)  # Сколько секунд после записи клиент читает с основной БД
+
 # Ключи для внешних API
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")   # Ключ OpenRouter API
 
+# Настройки клиента LLM (OpenRouter)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")  # Адрес API
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o")                       # Модель по умолчанию
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))                        # Таймаут запроса (сек)
+LLM_EXPLANATION_TIMEOUT = float(os.getenv("LLM_EXPLANATION_TIMEOUT", "10"))  # Таймаут объяснений (сек)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))         # Таймаут соединения (сек)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))          # Размер пула HTTP-соединений
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))              # Keep-alive соединений в пуле
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))          # Одновременных запросов к LLM
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))                   # Повторов при сетевых ошибках
+LLM_STRUCTURED_OUTPUT = (
+    os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+)  # Строгая JSON-схема ответа с категориями
+LLM_REPAIR_RETRIES = int(os.getenv("LLM_REPAIR_RETRIES", "1"))             # Повторов при нечитаемом ответе
+
+# Режим анализа запросов:
+#   "hybrid" — локальный разбор по словарю, LLM только при низкой уверенности
+#   "llm"    — всегда LLM
+#   "local"  — LLM полностью отключена (нагрузочные тесты, недоступность API)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "hybrid").lower()
+LOCAL_EXTRACTOR_MIN_CONFIDENCE = float(
+    os.getenv("LOCAL_EXTRACTOR_MIN_CONFIDENCE", "0.75")
+)  # Порог уверенности локального разбора
+
+# Вариант промпта анализа:
+#   "full"    — полные списки категорий и примеры, ответ полными значениями
+#   "compact" — короткие индексные коды (E1, A3, ...), расшифровываются локально
+#   "ab"      — случайный выбор варианта на каждый запрос (для замеров)
+ANALYSIS_PROMPT_VARIANT = os.getenv("ANALYSIS_PROMPT_VARIANT", "full").lower()
+ANALYSIS_PROMPT_AB_SHARE = float(
+    os.getenv("ANALYSIS_PROMPT_AB_SHARE", "0.5")
+)  # Доля запросов с компактным промптом в режиме "ab"
+
+# Кэш результатов анализа предпочтений
+PREFERENCES_CACHE_SIZE = int(os.getenv("PREFERENCES_CACHE_SIZE", "2048"))   # Максимум записей
+PREFERENCES_CACHE_TTL = float(os.getenv("PREFERENCES_CACHE_TTL", "21600"))  # Время жизни записи (сек)
+PREFERENCES_CACHE_STRIP_STOPWORDS = (
+    os.getenv("PREFERENCES_CACHE_STRIP_STOPWORDS", "true").lower() == "true"
+)  # Удалять стоп-слова при нормализации ключа
+
+# Режим объяснений для /explain: "llm" — LLM с шаблоном как запасным вариантом,
+# "template" — только шаблоны по совпадениям (без обращения к LLM)
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "llm").lower()
+
+# Хранилище истории диалогов
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory").lower()  # "memory" или "postgres"
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "10"))       # Сообщений на диалог
+CONVERSATION_MAX_COUNT = int(os.getenv("CONVERSATION_MAX_COUNT", "10000"))          # Максимум диалогов
+CONVERSATION_MAX_CHARS = int(os.getenv("CONVERSATION_MAX_CHARS", "20000000"))      # Общий объём (символов)
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "3600"))          # Время простоя (сек)
+
+# Кэш объяснений рекомендаций
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "8192"))   # Максимум записей
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", "86400"))  # Время жизни записи (сек)
+
+# Индекс каталога в памяти процесса (поиск рекомендаций без запроса к БД)
+CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX_ENABLED", "true").lower() == "true"
+CATALOG_INDEX_REFRESH_INTERVAL = float(
+    os.getenv("CATALOG_INDEX_REFRESH_INTERVAL", "300")
+)  # Период полной перезагрузки из БД (сек) — подхватывает записи других воркеров
+
+# Ранжирование: доля совпавших тегов каждого поля, при SEARCH_IDF_WEIGHTING —
+# с весом редкости тега (редкие теги важнее частых)
+SEARCH_IDF_WEIGHTING = os.getenv("SEARCH_IDF_WEIGHTING", "false").lower() == "true"
+TAG_DICTIONARY_TTL = float(os.getenv("TAG_DICTIONARY_TTL", "300"))  # Период обновления словаря тегов (сек)
+
+# Поиск по названию и описанию мест (полнотекстовый и нечёткий)
+TEXT_SEARCH_WEIGHT = float(os.getenv("TEXT_SEARCH_WEIGHT", "3.0"))       # Вес совпадения текста в релевантности
+TEXT_SEARCH_MAX_HITS = int(os.getenv("TEXT_SEARCH_MAX_HITS", "200"))    # Максимум мест, совпавших по тексту
+
+# Поиск рядом с пользователем (lat/lon в запросе рекомендаций)
+GEO_DISTANCE_WEIGHT = float(os.getenv("GEO_DISTANCE_WEIGHT", "2.0"))      # Вес близости в релевантности
+GEO_DEFAULT_RADIUS_KM = float(os.getenv("GEO_DEFAULT_RADIUS_KM", "2.0"))  # Радиус, если не указан в запросе
+GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", "20.0"))         # Максимальный радиус поиска
+
+# Часы работы мест (фильтр "открыто сейчас")
+OPENING_HOURS_UTC_OFFSET = float(os.getenv("OPENING_HOURS_UTC_OFFSET", "3"))  # Часовой пояс мест, часов от UTC
+
+# Очередь обработки отзывов (POST /review отвечает сразу, отзыв обрабатывают воркеры)
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", "2"))                          # Воркеров в процессе (0 — не обрабатывать)
+REVIEW_MAX_ATTEMPTS = int(os.getenv("REVIEW_MAX_ATTEMPTS", "5"))                # Попыток до статуса failed
+REVIEW_RETRY_BASE_DELAY = float(os.getenv("REVIEW_RETRY_BASE_DELAY", "5"))      # Задержка первого повтора (сек)
+REVIEW_RETRY_MAX_DELAY = float(os.getenv("REVIEW_RETRY_MAX_DELAY", "300"))      # Максимальная задержка повтора (сек)
+REVIEW_POLL_INTERVAL = float(os.getenv("REVIEW_POLL_INTERVAL", "2"))            # Период опроса очереди (сек)
+REVIEW_JOB_LOCK_TIMEOUT = float(os.getenv("REVIEW_JOB_LOCK_TIMEOUT", "300"))    # Через сколько задача упавшего воркера возвращается (сек)
+
+# Прогрев воркера перед приёмом трафика (/ready)
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "4"))       # Соединений пула, открываемых заранее
+WARMUP_LLM = os.getenv("WARMUP_LLM", "true").lower() == "true"              # Открывать соединение с LLM заранее
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))      # Пауза перед повтором прогрева (сек)
+
+# Уровень логов модулей приложения (DEBUG — с ответами LLM)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Трассировка этапов запроса (заголовок Server-Timing и лог api.requests)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))             # Доля запросов в логе (ошибки 5xx — всегда)
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "true").lower() == "true"  # Отдавать заголовок Server-Timing
+
 # Формируем строку подключения к базе данных
 DATABASE_URL = (
     f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-)
\ No newline at end of file
+)
+
+# Строки подключения к репликам
+REPLICA_DATABASE_URLS = [
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{host}/{DB_NAME}' for host in DB_REPLICA_HOSTS
+]
\ No newline at end of file
@@ -0,0 +1,247 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select, text
+
+from api.config import (
+    CONVERSATION_BACKEND,
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_MAX_COUNT,
+    CONVERSATION_MAX_CHARS,
+    CONVERSATION_IDLE_TTL,
+)
+from api.models import Conversation
+
+Message = Dict[str, Any]
+
+# --- Хранилище истории диалогов ---
+# Хранит последние сообщения каждого диалога для многошаговых запросов.
+# Бэкенд выбирается через CONVERSATION_BACKEND:
+#   "memory"   — в памяти процесса, с LRU и вытеснением по простою;
+#   "postgres" — таблица conversations, общая для всех воркеров.
+
+
+def _message_size(messages: List[Message]) -> int:
+    """
+    Примерный размер сообщений в символах (для общего ограничения памяти).
+    """
+    return sum(len(str(message.get("content", ""))) for message in messages)
+
+
+class MemoryConversationBackend:
+    """
+    История диалогов в памяти процесса. Ограничена по числу диалогов и
+    общему объёму текста; давно неиспользуемые диалоги вытесняются первыми,
+    диалоги без обращений дольше idle_ttl секунд удаляются.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = CONVERSATION_MAX_MESSAGES,
+        max_count: int = CONVERSATION_MAX_COUNT,
+        max_chars: int = CONVERSATION_MAX_CHARS,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+    ):
+        self.max_messages = max_messages
+        self.max_count = max_count
+        self.max_chars = max_chars
+        self.idle_ttl = idle_ttl
+        # conversation_id -> (сообщения, размер, время последнего обращения)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_chars = 0
+        self.evictions = 0
+
+    async def get(self, conversation_id: str) -> List[Message]:
+        item = self._data.get(conversation_id)
+        if item is None:
+            return []
+        messages, size, touched_at = item
+        if time.monotonic() - touched_at > self.idle_ttl:
+            self._remove(conversation_id)
+            return []
+        self._data[conversation_id] = (messages, size, time.monotonic())
+        self._data.move_to_end(conversation_id)
+        return list(messages)
+
+    async def append(self, conversation_id: str, messages: List[Message]):
+        previous = await self.get(conversation_id)
+        self._remove(conversation_id)
+
+        history = (previous + messages)[-self.max_messages:]
+        size = _message_size(history)
+        self._data[conversation_id] = (history, size, time.monotonic())
+        self._total_chars += size
+        self._evict()
+
+    async def delete(self, conversation_id: str):
+        self._remove(conversation_id)
+
+    async def clear(self):
+        self._data.clear()
+        self._total_chars = 0
+
+    def _remove(self, conversation_id: str):
+        item = self._data.pop(conversation_id, None)
+        if item is not None:
+            self._total_chars -= item[1]
+
+    def _evict(self):
+        """
+        Удаляет простаивающие диалоги, затем самые давние — пока не уложимся в лимиты.
+        """
+        now = time.monotonic()
+        while self._data:
+            oldest_id, (_, _, touched_at) = next(iter(self._data.items()))
+            over_limit = (
+                len(self._data) > self.max_count or self._total_chars > self.max_chars
+            )
+            if not over_limit and now - touched_at <= self.idle_ttl:
+                break
+            self._remove(oldest_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "conversations": len(self._data),
+            "total_chars": self._total_chars,
+            "evictions": self.evictions,
+        }
+
+
+class PostgresConversationBackend:
+    """
+    История диалогов в таблице conversations: видна всем воркерам.
+    Сообщения дописываются и обрезаются одним запросом INSERT ... ON CONFLICT;
+    устаревшие и лишние диалоги удаляются раз в cleanup_every записей.
+    """
+
+    def __init__(
+        self,
+        session_maker,
+        max_messages: int = CONVERSATION_MAX_MESSAGES,
+        max_count: int = CONVERSATION_MAX_COUNT,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+        cleanup_every: int = 100,
+    ):
+        self.session_maker = session_maker
+        self.max_messages = max_messages
+        self.max_count = max_count
+        self.idle_ttl = idle_ttl
+        self.cleanup_every = cleanup_every
+        self._appends = 0
+
+    async def get(self, conversation_id: str) -> List[Message]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Conversation.messages).where(
+                    Conversation.id == conversation_id,
+                    Conversation.updated_at
+                    > datetime.now(timezone.utc) - timedelta(seconds=self.idle_ttl),
+                )
+            )
+            return list(result.scalar_one_or_none() or [])
+
+    async def append(self, conversation_id: str, messages: List[Message]):
+        async with self.session_maker() as session:
+            await session.execute(
+                text(
+                    """
+                    INSERT INTO conversations (id, messages, updated_at)
+                    VALUES (:id, CAST(:messages AS jsonb), now())
+                    ON CONFLICT (id) DO UPDATE SET
+                        messages = (
+                            SELECT COALESCE(jsonb_agg(elem ORDER BY ord), '[]'::jsonb)
+                            FROM (
+                                SELECT CASE
+                                    WHEN conversations.updated_at
+                                         > now() - make_interval(secs => :idle_ttl)
+                                    THEN conversations.messages
+                                    ELSE '[]'::jsonb
+                                END || EXCLUDED.messages AS merged
+                            ) AS m,
+                            jsonb_array_elements(m.merged) WITH ORDINALITY AS t(elem, ord)
+                            WHERE ord > jsonb_array_length(m.merged) - :max_messages
+                        ),
+                        updated_at = now()
+                    """
+                ),
+                {
+                    "id": conversation_id,
+                    "messages": json.dumps(messages[-self.max_messages:], ensure_ascii=False),
+                    "idle_ttl": self.idle_ttl,
+                    "max_messages": self.max_messages,
+                },
+            )
+            await session.commit()
+
+        self._appends += 1
+        if self._appends % self.cleanup_every == 0:
+            await self.cleanup()
+
+    async def delete(self, conversation_id: str):
+        async with self.session_maker() as session:
+            await session.execute(
+                delete(Conversation).where(Conversation.id == conversation_id)
+            )
+            await session.commit()
+
+    async def clear(self):
+        async with self.session_maker() as session:
+            await session.execute(delete(Conversation))
+            await session.commit()
+
+    async def cleanup(self):
+        """
+        Удаляет простаивающие диалоги и самые давние сверх max_count.
+        """
+        async with self.session_maker() as session:
+            await session.execute(
+                text(
+                    """
+                    DELETE FROM conversations
+                    WHERE updated_at < now() - make_interval(secs => :idle_ttl)
+                       OR id IN (
+                           SELECT id FROM conversations
+                           ORDER BY updated_at DESC
+                           OFFSET :max_count
+                       )
+                    """
+                ),
+                {"idle_ttl": self.idle_ttl, "max_count": self.max_count},
+            )
+            await session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "postgres", "appends": self._appends}
+
+
+# --- Выбор бэкенда ---
+_store = None
+
+
+def get_conversation_store():
+    """
+    Возвращает хранилище истории диалогов (создаётся лениво по CONVERSATION_BACKEND).
+    """
+    global _store
+
+    if _store is None:
+        if CONVERSATION_BACKEND == "postgres":
+            from api.database import async_session_maker
+
+            _store = PostgresConversationBackend(async_session_maker)
+        else:
+            _store = MemoryConversationBackend()
+    return _store
+
+
+def set_conversation_store(store: Optional[Any]):
+    """
+    Подменяет хранилище истории диалогов (например, собственным бэкендом).
+    """
+    global _store
+    _store = store
@@ -1,8 +1,24 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any, Optional
+from typing import Collection, List, Dict, Any, Optional
 from api.models import Place
-from sqlalchemy import select, and_, case
-from api.agent import process_place_review, merge_categories
+from sqlalchemy import (
+    select, and_, or_, case, func, literal, literal_column, null, true, tuple_, Integer, Float
+)
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY, insert as pg_insert
+from api.agent import process_place_review
+from api.catalog_index import get_catalog_index, index_place_dicts, index_places
+from api.config import (
+    CATALOG_INDEX_ENABLED, SEARCH_IDF_WEIGHTING, TEXT_SEARCH_WEIGHT, GEO_DISTANCE_WEIGHT
+)
+from api.geo import EARTH_RADIUS_KM, GeoQuery, cell_ranges
+from api.text_search import find_text_hits, text_hits_query
+from api.tags import TAG_ID_COLUMNS, get_tag_dictionary
+from api.pagination import SortKey
+from api.projection import match_details, place_columns, place_from_row
+from api.tracing import stage, traced
+
+# Поля-массивы, которые отзыв дополняет новыми значениями
+REVIEW_ARRAY_FIELDS = ("entity_types", "atmosphere_tags", "purpose_tags", "features")
 
 # --- Добавление одного места ---
 async def add_place(session: AsyncSession, place_data: Dict[str, Any]) -> Place:
@@ -13,6 +29,7 @@ async def add_place(session: AsyncSession, place_data: Dict[str, Any]) -> Place:
     session.add(place)           # Добавляем в сессию
     await session.commit()       # Сохраняем изменения
     await session.refresh(place) # Обновляем объект (получаем id и др.)
+    index_places([place])        # Обновляем индекс каталога
     return place
 
 # --- Пакетное добавление мест ---
@@ -26,10 +43,8 @@ async def add_places_batch(
     session.add_all(places)                           # Добавляем все в сессию
     await session.commit()                            # Сохраняем изменения
 
-    # Обновляем объекты, чтобы получить их id
-    for place in places:
-        await session.refresh(place)
-
+    # id приходят из RETURNING пакетной вставки — перечитывать места не нужно
+    index_places(places)
     return places
 
 # --- Поиск мест по предпочтениям пользователя (базовый) ---
@@ -125,15 +140,31 @@ async def search_places_by_preferences(
     return places_with_relevance
 
 # --- Продвинутый поиск мест с настраиваемыми весами и фильтрацией по релевантности ---
+@traced("search")
 async def search_places_advanced(
     session: AsyncSession,
     preferences: Dict[str, Any],
     weights: Optional[Dict[str, float]] = None,
     min_relevance: float = 0.0,
-    limit: int = 20
+    limit: int = 20,
+    after: Optional[SortKey] = None,
+    text_query: Optional[str] = None,
+    near: Optional[GeoQuery] = None,
+    open_slot: Optional[int] = None,
+    fields: Optional[Collection[str]] = None
 ) -> List[Dict[str, Any]]:
     """
     Продвинутый поиск с настраиваемыми весами и минимальной релевантностью.
+    after — ключ последнего места предыдущей страницы (см. api/pagination.py):
+    выдача продолжается строго после него.
+    text_query — исходный текст запроса: совпадение с названием и описанием
+    места добавляет к релевантности до TEXT_SEARCH_WEIGHT, а места, прямо
+    названные в запросе, попадают в выдачу даже без совпадения по типу.
+    near — точка пользователя и радиус (см. api/geo.py): в выдаче только места
+    в радиусе, близость добавляет к релевантности до GEO_DISTANCE_WEIGHT.
+    open_slot — слот недели (см. api/opening_hours.py): только места, открытые в этот момент.
+    fields — поля, нужные клиенту: тяжёлые поля (фото, описание) вне fields
+    не загружаются (см. api/projection.py).
     """
     # Веса по умолчанию, если не переданы явно
     default_weights = {
@@ -146,77 +177,169 @@ async def search_places_advanced(
     }
     final_weights = weights or default_weights
 
-    # Выражение релевантности (накапливаем сумму весов по совпадениям)
-    relevance_expr = 0.0
+    # Поиск по индексу каталога в памяти, без обращения к БД
+    if CATALOG_INDEX_ENABLED:
+        index = get_catalog_index()
+        await index.ensure_fresh()
+        text_hits = await find_text_hits(session, text_query)
+        return index.search(
+            preferences, final_weights, min_relevance, limit, SEARCH_IDF_WEIGHTING, after,
+            text_hits, TEXT_SEARCH_WEIGHT, near, GEO_DISTANCE_WEIGHT, open_slot
+        )
+
+    # Словарь тегов: строковые значения запроса -> id тегов (и их веса для IDF)
+    tag_dictionary = get_tag_dictionary()
+    await tag_dictionary.ensure_loaded(session)
+
+    # Выражение релевантности: для массивов — доля совпавших тегов поля
+    # (с весом редкости при SEARCH_IDF_WEIGHTING), для одиночных полей —
+    # точное совпадение
+    relevance_expr = literal(0.0)
+    entity_type_ids = None
     for field, weight in final_weights.items():
-        if preferences.get(field):
-            if field in ('budget_level', 'best_time'):
-                # Для budget_level и best_time — точное совпадение
-                relevance_expr += case(
-                    (getattr(Place, field) == preferences[field], weight),
-                    else_=0.0
-                )
-            else:
-                # Для массивов — overlap
-                relevance_expr += case(
-                    (getattr(Place, field).overlap(preferences[field]), weight),
-                    else_=0.0
-                )
-
-    # Базовый запрос с релевантностью
-    query = select(
-        Place,
-        relevance_expr.label('relevance_score')
-    )
+        if not preferences.get(field):
+            continue
+        if field in ('budget_level', 'best_time'):
+            relevance_expr += case(
+                (getattr(Place, field) == preferences[field], weight),
+                else_=0.0
+            )
+            continue
+
+        tag_ids, tag_weights, total_weight = tag_dictionary.weights(
+            field, preferences[field], SEARCH_IDF_WEIGHTING
+        )
+        if field == 'entity_types':
+            entity_type_ids = tag_ids
+        if not tag_ids:
+            continue
+        requested = func.unnest(
+            literal(tag_ids, PG_ARRAY(Integer)),
+            literal(tag_weights, PG_ARRAY(Float)),
+        ).table_valued('tag_id', 'weight').render_derived()
+        matched_weight = (
+            select(func.coalesce(func.sum(requested.c.weight), 0.0))
+            .where(getattr(Place, TAG_ID_COLUMNS[field]).any(requested.c.tag_id))
+            .scalar_subquery()
+        )
+        relevance_expr += matched_weight * (weight / total_weight)
 
-    # Список условий для фильтрации (WHERE)
+    # Обязательные условия (entity_types и budget_level) — по GIN-индексам
     conditions = []
-
-    # Обязательные условия (например, entity_types и budget_level)
-    required_conditions = []
     if preferences.get('entity_types'):
-        required_conditions.append(Place.entity_types.overlap(preferences['entity_types']))
+        if entity_type_ids is None:
+            entity_type_ids = tag_dictionary.weights(
+                'entity_types', preferences['entity_types'], False
+            )[0]
+        conditions.append(
+            Place.entity_type_ids.overlap(literal(entity_type_ids, PG_ARRAY(Integer)))
+        )
     if preferences.get('budget_level'):
-        required_conditions.append(Place.budget_level == preferences['budget_level'])
+        conditions.append(Place.budget_level == preferences['budget_level'])
+    candidate_filter = and_(true(), *conditions)
+
+    # Совпадения с текстом запроса (по индексам search_vector и pg_trgm)
+    hits_query = text_hits_query(text_query)
+    if hits_query is not None:
+        hits = hits_query.cte('text_hits')
+        relevance_expr += func.coalesce(hits.c.text_score, 0.0) * TEXT_SEARCH_WEIGHT
+        candidate_filter = or_(candidate_filter, hits.c.title_match.is_(True))
+
+    # Поиск рядом: кандидаты — из ячеек сетки, покрывающих круг (по B-tree индексу
+    # geo_cell), точное расстояние — только для них
+    distance_expr = null().cast(Float)
+    if near is not None:
+        distance_expr = place_distance_km(near)
+        relevance_expr += (1 - distance_expr / near.radius_km) * GEO_DISTANCE_WEIGHT
+        candidate_filter = and_(
+            candidate_filter,
+            or_(*(Place.geo_cell.between(first, last) for first, last in cell_ranges(near))),
+            distance_expr <= near.radius_km,
+        )
 
-    # Добавляем обязательные условия в общий список
-    if required_conditions:
-        conditions.extend(required_conditions)
+    # Открыто в заданный момент — по GIN-индексу open_slots
+    if open_slot is not None:
+        candidate_filter = and_(candidate_filter, Place.open_slots.contains([open_slot]))
+
+    # Релевантность считается один раз для каждого подходящего места:
+    # фильтр и сортировка используют уже посчитанное значение.
+    # В CTE — только id и ключ сортировки, без текстовых полей мест
+    scored = select(
+        Place.id,
+        func.coalesce(Place.overall_rating, 0.0).label('rating'),
+        func.coalesce(Place.review_count, 0).label('review_count'),
+        relevance_expr.label('relevance_score'),
+        distance_expr.label('distance_km'),
+    )
+    if hits_query is not None:
+        scored = scored.outerjoin(hits, hits.c.id == Place.id)
+    scored = (
+        scored.where(candidate_filter)
+        .cte('scored')
+        .prefix_with('MATERIALIZED')
+    )
 
-    # Применяем условия к запросу
-    if conditions:
-        query = query.where(and_(*conditions))
+    # Фильтруем по минимальной релевантности, сортируем по релевантности, рейтингу,
+    # количеству отзывов и id (id делает порядок однозначным для постраничной выдачи)
+    top = select(scored).where(
+        scored.c.relevance_score >= min_relevance
+    )
 
-    # Фильтруем по минимальной релевантности, сортируем по релевантности, рейтингу и количеству отзывов
-    query = query.where(
-        relevance_expr >= min_relevance
-    ).order_by(
-        relevance_expr.desc(),
-        Place.overall_rating.desc(),
-        Place.review_count.desc()
-    ).limit(limit)
+    # Следующая страница: строго после последнего места предыдущей
+    if after is not None:
+        top = top.where(
+            tuple_(-scored.c.relevance_score, -scored.c.rating, -scored.c.review_count, scored.c.id)
+            > tuple_(-after[0], -after[1], -after[2], after[3])
+        )
+
+    def sort_order(source):
+        return (
+            source.c.relevance_score.desc(),
+            source.c.rating.desc(),
+            source.c.review_count.desc(),
+            source.c.id,
+        )
+
+    top = top.order_by(*sort_order(scored)).limit(limit).subquery('top')
+
+    # Поля мест читаются только для выбранной страницы
+    query = (
+        select(*place_columns(fields), top.c.relevance_score, top.c.distance_km)
+        .join(top, top.c.id == Place.id)
+        .order_by(*sort_order(top))
+    )
 
     # Выполняем запрос
     result = await session.execute(query)
-    rows = result.all()
 
     # Формируем результат: список словарей с местом, релевантностью и деталями совпадений
     results = []
-    for place, relevance_score in rows:
-        place_data = place.to_dict()
-        place_data['relevance_score'] = float(relevance_score)
+    for row in result.mappings():
+        place_data = place_from_row(row)
+        place_data['relevance_score'] = float(row['relevance_score'])
+        distance = row['distance_km']
+        place_data['distance_km'] = float(distance) if distance is not None else None
         # Детализация совпадений по категориям
-        place_data['match_details'] = {
-            'entity_types_match': [et for et in place.entity_types if et in preferences.get('entity_types', [])],
-            'atmosphere_match': [at for at in place.atmosphere_tags if at in preferences.get('atmosphere_tags', [])],
-            'purpose_match': [pt for pt in place.purpose_tags if pt in preferences.get('purpose_tags', [])],
-            'budget_match': place.budget_level == preferences.get('budget_level'),
-            'features_match': [f for f in place.features if f in preferences.get('features', [])]
-        }
+        place_data['match_details'] = match_details(place_data, preferences)
         results.append(place_data)
 
     return results
 
+# --- Расстояние от точки до места ---
+def place_distance_km(near: GeoQuery):
+    """
+    SQL-выражение расстояния (км) от точки near до места — формула гаверсинусов,
+    как в api/geo.py.
+    """
+    half_d_lat = func.radians(Place.latitude - near.lat) * 0.5
+    half_d_lon = func.radians(Place.longitude - near.lon) * 0.5
+    a = (
+        func.power(func.sin(half_d_lat), 2)
+        + func.cos(func.radians(near.lat)) * func.cos(func.radians(Place.latitude))
+        * func.power(func.sin(half_d_lon), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
 # --- Получение места по URL ---
 async def get_place_by_url(session: AsyncSession, url: str) -> Optional[Place]:
     """
@@ -244,6 +367,7 @@ async def update_place(session: AsyncSession, place_id: int, update_data: Dict[s
 
     await session.commit()
     await session.refresh(place)
+    index_places([place])
     return place
 
 # --- Создание или обновление места на основе отзыва пользователя ---
@@ -256,54 +380,52 @@ async def create_or_update_place_from_review(
 ) -> Dict[str, Any]:
     """
     Создаёт или обновляет место на основе отзыва пользователя.
-    Объединяет категории вместо полной замены.
+    Категории объединяются, а не заменяются, — целиком в БД: один
+    INSERT ... ON CONFLICT (url) DO UPDATE по уникальному индексу url
+    (массивы — array_union, best_time и budget_level — новые, если есть).
+    Одновременные отзывы об одном месте не создают дубликатов и не теряют
+    теги друг друга.
     """
 
     # Получаем категории из отзыва пользователя (AI/LLM)
     new_categories = await process_place_review(user_review)
 
-    # Проверяем, существует ли место с таким URL
-    existing_place = await get_place_by_url(session, url)
-
-    if existing_place:
-        # Получаем существующие категории места
-        existing_categories = {
-            'entity_types': existing_place.entity_types or [],
-            'atmosphere_tags': existing_place.atmosphere_tags or [],
-            'purpose_tags': existing_place.purpose_tags or [],
-            'features': existing_place.features or [],
-            'best_time': existing_place.best_time or '',
-            'budget_level': existing_place.budget_level
-        }
-
-        # Объединяем существующие и новые категории
-        merged_categories = merge_categories(existing_categories, new_categories)
-
-        # Добавляем фото, если указано
-        if photo_path is not None:
-            merged_categories['photo'] = photo_path
-
-        # Обновляем существующее место (название не меняем)
-        updated_place = await update_place(session, existing_place.id, merged_categories)
-        return {
-            "action": "updated",
-            "place": updated_place.to_dict(),
-            "place_id": updated_place.id
-        }
-    else:
-        # Создаём новое место с названием от пользователя
-        place_data = {
-            "title": place_title,
-            "url": url,
-            "description": user_review[:200] + "..." if len(user_review) > 200 else user_review,
-            **new_categories
-        }
-        if photo_path is not None:
-            place_data['photo'] = photo_path
-
-        new_place = await add_place(session, place_data)
-        return {
-            "action": "created",
-            "place": new_place.to_dict(),
-            "place_id": new_place.id
-        }
\ No newline at end of file
+    # Новое место — с названием от пользователя
+    place_data = {
+        "title": place_title,
+        "url": url,
+        "description": user_review[:200] + "..." if len(user_review) > 200 else user_review,
+        "best_time": new_categories.get("best_time") or "",
+        "budget_level": new_categories.get("budget_level"),
+        **{field: new_categories.get(field) or [] for field in REVIEW_ARRAY_FIELDS},
+    }
+    if photo_path is not None:
+        place_data['photo'] = photo_path
+
+    # Существующее место (название и описание не меняем): массивы объединяются
+    # по уникальным значениям, best_time и budget_level — новые, если есть
+    statement = pg_insert(Place).values(**place_data)
+    excluded = statement.excluded
+    merged = {
+        field: func.array_union(getattr(Place, field), getattr(excluded, field))
+        for field in REVIEW_ARRAY_FIELDS
+    }
+    merged['best_time'] = func.coalesce(func.nullif(excluded.best_time, ''), Place.best_time)
+    merged['budget_level'] = func.coalesce(excluded.budget_level, Place.budget_level)
+    merged['photo'] = func.coalesce(excluded.photo, Place.photo)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Place.url], set_=merged
+    ).returning(*place_columns(), literal_column('xmax = 0').label('inserted'))
+
+    with stage("upsert"):
+        result = await session.execute(statement)
+        row = result.mappings().one()
+        await session.commit()
+
+        place = place_from_row(row)
+        index_place_dicts([place])
+    return {
+        "action": "created" if row['inserted'] else "updated",
+        "place": place,
+        "place_id": place['id']
+    }
@@ -1,32 +1,241 @@
 # Импорт необходимых библиотек
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from fastapi import Request, Response
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List
 
-from api.config import DATABASE_URL  # URL подключения к базе данных
+from api.config import (              # URL подключения и профиль пула
+    DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE
+)
+from api.config import (              # Реплики для чтения
+    REPLICA_DATABASE_URLS, DB_READ_STRATEGY, DB_REPLICA_CONNECT_TIMEOUT,
+    DB_REPLICA_RETRY_INTERVAL, DB_READ_YOUR_WRITES_SECONDS
+)
+from api.metrics import TimedQueuePool, instrument_engine  # Задержки запросов и ожидание пула
 from api.models import Base          # Базовый класс моделей SQLAlchemy
-
-# Создание асинхронного движка SQLAlchemy
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,      # Включить вывод SQL-запросов в консоль (для отладки)
-    future=True     # Использовать будущее поведение SQLAlchemy
+from api.migrations import (          # Изменения схемы существующей БД и её версия
+    prepare_database, run_migrations, schema_version, current_schema_version, record_schema_version
 )
 
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(url: str, **connect_args: Any) -> AsyncEngine:
+    """
+    Асинхронный движок SQLAlchemy с общим профилем пула и замером запросов.
+    """
+    created = create_async_engine(
+        url,
+        echo=DB_ECHO,                      # Вывод SQL-запросов в консоль (только для отладки)
+        future=True,                       # Использовать будущее поведение SQLAlchemy
+        poolclass=TimedQueuePool,          # Пул с замером ожидания соединения
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            # Кэш подготовленных запросов: адаптера SQLAlchemy и самого asyncpg
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            **connect_args,
+        },
+    )
+    instrument_engine(created)
+    return created
+
+
+def _session_maker(bind: AsyncEngine) -> sessionmaker:
+    return sessionmaker(
+        bind,
+        class_=AsyncSession,         # Использовать асинхронные сессии
+        expire_on_commit=False       # Не истекать объекты после коммита
+    )
+
+
+# Создание асинхронного движка основной БД (все записи)
+engine = _create_engine(DATABASE_URL)
+
 # Создание фабрики асинхронных сессий
-async_session_maker = sessionmaker(
-    engine,
-    class_=AsyncSession,         # Использовать асинхронные сессии
-    expire_on_commit=False       # Не истекать объекты после коммита
-)
+async_session_maker = _session_maker(engine)
+
+# Асинхронная инициализация базы данных: если версия схемы в БД совпадает
+# с кодом — один запрос, иначе создание таблиц и миграции.
+# Возвращает True, если схема обновлялась.
+async def init_db() -> bool:
+    version = schema_version(Base.metadata)
+    async with engine.connect() as conn:
+        if await current_schema_version(conn) == version:
+            return False
 
-# Асинхронная инициализация базы данных (создание таблиц)
-async def init_db():
     async with engine.begin() as conn:
+        await prepare_database(conn)                   # Блокировка миграций, расширения (pg_trgm)
+        if await current_schema_version(conn) == version:
+            return False                               # Схему уже обновил другой воркер
         await conn.run_sync(Base.metadata.create_all)  # Создать все таблицы
+        await run_migrations(conn)                     # Столбцы, индексы, триггеры
+        await record_schema_version(conn, version)
+    logger.info("Схема БД обновлена до версии %s", version)
+    return True
+
+
+# --- Чтение с реплик ---
+# Эндпоинты только для чтения получают сессию реплики (get_read_session),
+# записывающие — сессию основной БД (get_write_session). Реплика выбирается
+# по кругу или наименее загруженная (меньше всего выданных соединений пула);
+# реплика, к которой не удалось подключиться, пропускается
+# DB_REPLICA_RETRY_INTERVAL секунд, если доступных реплик нет — чтение идёт
+# с основной БД. После записи клиент получает cookie и следующие
+# DB_READ_YOUR_WRITES_SECONDS секунд читает с основной БД — видит свои
+# изменения, даже если реплика отстаёт.
+
+# Cookie "читать с основной БД до" (unix-время)
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+
+class Replica:
+    """
+    Реплика для чтения: движок, фабрика сессий и время, до которого она пропускается.
+    """
+
+    def __init__(self, url: str):
+        self.engine = _create_engine(url, timeout=DB_REPLICA_CONNECT_TIMEOUT)
+        self.session_maker = _session_maker(self.engine)
+        self.host = f"{self.engine.url.host}:{self.engine.url.port}"
+        self.down_until = 0.0
+        self.failures = 0
+
+    def busy(self) -> int:
+        return self.engine.sync_engine.pool.checkedout()
+
+
+class ReadRouter:
+    """
+    Выбор реплики для чтения.
+    """
+
+    def __init__(self, replicas: List[Replica], strategy: str = DB_READ_STRATEGY):
+        self.replicas = replicas
+        self.strategy = strategy
+        self._counter = itertools.count()
+        self.primary_reads = 0
+
+    def candidates(self) -> List[Replica]:
+        """
+        Доступные реплики в порядке попыток подключения.
+        """
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.down_until <= now]
+        if self.strategy == "least_busy":
+            return sorted(healthy, key=Replica.busy)
+        if not healthy:
+            return []
+        start = next(self._counter) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def mark_down(self, replica: Replica, error: Exception):
+        replica.failures += 1
+        replica.down_until = time.monotonic() + DB_REPLICA_RETRY_INTERVAL
+        logger.warning("Реплика %s недоступна, чтение с других узлов: %r", replica.host, error)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {
+                    "host": replica.host,
+                    "available": replica.down_until <= now,
+                    "checked_out": replica.busy(),
+                    "failures": replica.failures,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+read_router = ReadRouter([Replica(url) for url in REPLICA_DATABASE_URLS])
+
+
+async def _connect_read_session() -> AsyncSession:
+    """
+    Сессия первой реплики, к которой удалось подключиться, иначе — основной БД.
+    """
+    for replica in read_router.candidates():
+        session = replica.session_maker()
+        try:
+            await session.connection()
+            return session
+        except (OSError, DBAPIError, asyncio.TimeoutError) as e:
+            await session.close()
+            read_router.mark_down(replica, e)
+    read_router.primary_reads += 1
+    return async_session_maker()
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для чтения вне запроса (фоновые задачи, потоковые ответы).
+    """
+    session = await _connect_read_session()
+    async with session:
+        yield session
+
+
+def _reads_from_primary(request: Request) -> bool:
+    """
+    Клиент недавно писал в БД — читаем с основной БД.
+    """
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Получение асинхронной сессии для чтения (используется как зависимость)
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    if not read_router.replicas or _reads_from_primary(request):
+        async with async_session_maker() as session:
+            yield session
+        return
+    async with read_session() as session:
+        yield session
+
+
+def mark_primary_reads(response: Response):
+    """
+    Клиент записал в БД: следующие DB_READ_YOUR_WRITES_SECONDS секунд он
+    читает с основной БД (для записей в обход get_write_session).
+    """
+    if read_router.replicas and DB_READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(time.time() + DB_READ_YOUR_WRITES_SECONDS),
+            max_age=math.ceil(DB_READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+# Получение асинхронной сессии для записи (используется как зависимость)
+async def get_write_session(response: Response) -> AsyncGenerator[AsyncSession, None]:
+    mark_primary_reads(response)
+    async with async_session_maker() as session:
+        yield session
+
 
-# Получение асинхронной сессии для работы с БД (используется как зависимость)
+# Получение асинхронной сессии основной БД (используется как зависимость)
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
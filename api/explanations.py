@@ -0,0 +1,211 @@
+import zlib
+from typing import Any, Dict, List, Optional
+
+# --- Шаблонные объяснения рекомендаций без обращения к LLM ---
+# Объяснение собирается из совпадений (match_details), которые уже
+# посчитаны в search_places_advanced. Шаблон выбирается детерминированно
+# по id места, поэтому соседние карточки на странице звучат по-разному,
+# а одна и та же карточка — всегда одинаково.
+
+# Тип места -> (как назвать в тексте, род: "m", "f", "n")
+ENTITY_NOUNS = {
+    "ресторан": ("ресторан", "m"),
+    "кафе": ("кафе", "n"),
+    "бар": ("бар", "m"),
+    "паб": ("паб", "m"),
+    "кофейня": ("кофейня", "f"),
+    "фудкорт": ("фудкорт", "m"),
+    "уличная еда": ("точка уличной еды", "f"),
+    "пекарня": ("пекарня", "f"),
+    "кондитерская": ("кондитерская", "f"),
+    "чайный домик": ("чайный домик", "m"),
+    "клуб": ("клуб", "m"),
+    "гостиная": ("гостиная", "f"),
+    "караоке": ("караоке", "n"),
+    "книжный магазин": ("книжный магазин", "m"),
+    "арт-центр": ("арт-центр", "m"),
+    "галерея": ("галерея", "f"),
+    "кинотеатр": ("кинотеатр", "m"),
+    "антикафе": ("антикафе", "n"),
+    "мастерская": ("мастерская", "f"),
+    "студия": ("студия", "f"),
+    "парк": ("парк", "m"),
+    "набережная": ("набережная", "f"),
+    "площадь": ("площадь", "f"),
+    "смотровая площадка": ("смотровая площадка", "f"),
+    "музей": ("музей", "m"),
+    "памятник": ("памятник", "m"),
+    "скульптура": ("скульптура", "f"),
+    "историческое здание": ("историческое здание", "n"),
+    "церковь": ("церковь", "f"),
+    "храм": ("храм", "m"),
+    "кафедральный собор": ("кафедральный собор", "m"),
+    "улица": ("улица", "f"),
+    "бутик": ("бутик", "m"),
+    "винтажный магазин": ("винтажный магазин", "m"),
+    "секонд-хенд": ("секонд-хенд", "m"),
+    "сувенирный магазин": ("сувенирный магазин", "m"),
+    "рынок": ("рынок", "m"),
+    "концептуальный магазин": ("концептуальный магазин", "m"),
+    "достопримечательность": ("достопримечательность", "f"),
+    "укромное место": ("укромное место", "n"),
+    "внутренний двор": ("внутренний двор", "m"),
+}
+
+# Цель посещения -> обстоятельство цели
+PURPOSE_PHRASES = {
+    "свидание": "для свидания",
+    "друзья": "для встречи с друзьями",
+    "работа": "для работы",
+    "учеба": "для учёбы",
+    "наедине": "чтобы побыть наедине с собой",
+    "бизнес": "для деловой встречи",
+    "празднование": "для праздника",
+    "быстрый визит": "чтобы заскочить ненадолго",
+    "фотосъемка": "для фотосессии",
+    "прогулки": "для прогулки",
+    "шоппинг": "для шоппинга",
+    "осмотр достопримечательностей": "для осмотра достопримечательностей",
+    "обед": "для обеда",
+    "ужин": "для ужина",
+    "завтрак": "для завтрака",
+    "поздний завтрак": "для позднего завтрака",
+}
+
+# Особенность -> фрагмент предложения
+FEATURE_PHRASES = {
+    "для отдыха на природе": "можно отдохнуть на природе",
+    "для домашних животных": "можно прийти с питомцем",
+    "вегетарианец": "есть вегетарианское меню",
+    "веган": "есть веганские блюда",
+    "живая музыка": "играет живая музыка",
+    "танцы": "можно потанцевать",
+    "Wi-Fi": "есть Wi-Fi",
+    "парковка": "есть парковка",
+    "доступно": "есть доступная среда",
+    "место для курения": "есть место для курения",
+    "алкоголь": "подают алкоголь",
+    "детская комната": "есть детская комната",
+    "мероприятия": "регулярно проходят мероприятия",
+    "бесплатный вход": "вход бесплатный",
+    "платный вход": "вход платный",
+    "бронирование": "можно забронировать столик",
+    "доставка": "есть доставка",
+    "еда на вынос": "можно взять еду с собой",
+}
+
+# Уровень бюджета -> фрагмент предложения
+BUDGET_PHRASES = {
+    "бюджетный": "цены бюджетные",
+    "средний": "цены средние",
+    "дорогой": "премиальный уровень",
+}
+
+# Шаблоны с целью посещения: (основная фраза, чем присоединять подробности)
+_PURPOSE_TEMPLATES = [
+    ("{subject} отлично подходит {purpose}", ": здесь "),
+    ("{subject} — хороший выбор {purpose}", ", ведь здесь "),
+    ("Если ищешь место {purpose}, загляни сюда — это {subject_lower}", ", где "),
+    ("{subject} подойдёт {purpose}", ": здесь "),
+]
+
+# Шаблоны без цели посещения
+_GENERIC_TEMPLATES = [
+    ("{subject} хорошо совпадает с твоим запросом", ": здесь "),
+    ("{subject} — то, что подходит под твой запрос", ", ведь здесь "),
+    ("Загляни сюда — это {subject_lower}", ", где "),
+]
+
+# Сколько подробностей упоминать, чтобы объяснение оставалось коротким
+MAX_DETAILS = 2
+
+
+def _agree(adjective: str, gender: str) -> str:
+    """
+    Согласует прилагательное (в мужском роде) с родом существительного.
+    """
+    if gender == "m":
+        return adjective
+    stem, ending = adjective[:-2], adjective[-2:]
+    if adjective.endswith("ний"):
+        # Мягкая основа: домашний -> домашняя / домашнее
+        return stem + ("яя" if gender == "f" else "ее")
+    if ending in ("ый", "ий", "ой"):
+        return stem + ("ая" if gender == "f" else "ое")
+    return adjective
+
+
+def _capitalize(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+def _join(parts: List[str]) -> str:
+    """
+    Соединяет фрагменты через запятую и "и" перед последним.
+    """
+    if len(parts) <= 1:
+        return "".join(parts)
+    return ", ".join(parts[:-1]) + " и " + parts[-1]
+
+
+def _pick(matched: List[str], own: List[str], limit: int) -> List[str]:
+    """
+    Берёт совпавшие с запросом значения, а если их нет — собственные теги места.
+    """
+    return list(matched or own or [])[:limit]
+
+
+def build_template_explanation(
+    place_data: Dict[str, Any], match_details: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Строит объяснение на русском языке по совпадениям места с запросом.
+    match_details — результат search_places_advanced; если не передан,
+    берётся из place_data, а при его отсутствии используются теги места.
+    """
+    match_details = match_details or place_data.get("match_details") or {}
+    variant = zlib.crc32(str(place_data.get("id", place_data.get("title", ""))).encode("utf-8"))
+
+    # Подлежащее: "уютное и тихое кафе"
+    entity_types = _pick(
+        match_details.get("entity_types_match"), place_data.get("entity_types"), 1
+    )
+    noun, gender = ENTITY_NOUNS.get(entity_types[0], (entity_types[0], "n")) if entity_types else ("место", "n")
+    adjectives = [
+        _agree(tag, gender)
+        for tag in _pick(
+            match_details.get("atmosphere_match"), place_data.get("atmosphere_tags"), 2
+        )
+        if tag[-2:] in ("ый", "ий", "ой")
+    ]
+    subject = f"{' и '.join(adjectives)} {noun}" if adjectives else noun
+
+    # Цель посещения: "для работы и для учёбы"
+    purposes = [
+        PURPOSE_PHRASES[tag]
+        for tag in _pick(match_details.get("purpose_match"), place_data.get("purpose_tags"), 2)
+        if tag in PURPOSE_PHRASES
+    ]
+
+    # Подробности: особенности и бюджет
+    details = [
+        FEATURE_PHRASES[tag]
+        for tag in _pick(match_details.get("features_match"), place_data.get("features"), MAX_DETAILS)
+        if tag in FEATURE_PHRASES
+    ]
+    budget_level = place_data.get("budget_level")
+    if len(details) < MAX_DETAILS and budget_level in BUDGET_PHRASES and (
+        match_details.get("budget_match") or not match_details
+    ):
+        details.append(BUDGET_PHRASES[budget_level])
+
+    templates = _PURPOSE_TEMPLATES if purposes else _GENERIC_TEMPLATES
+    template, details_prefix = templates[variant % len(templates)]
+    sentence = template.format(
+        subject=_capitalize(subject),
+        subject_lower=subject,
+        purpose=" и ".join(purposes),
+    )
+    if details:
+        sentence += details_prefix + _join(details)
+    return sentence + "."
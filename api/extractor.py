@@ -0,0 +1,379 @@
+from typing import Any, Dict, List, Tuple
+
+from api.cache import STOP_WORDS, normalize_prompt
+
+# --- Локальный извлекатель предпочтений без обращения к LLM ---
+# Запрос разбивается на слова, каждое слово сопоставляется с основами
+# из словаря ниже. Основа совпадает, если слово начинается с неё и
+# окончание не длиннее MAX_SUFFIX_LEN символов ("кафе" -> "кафешка").
+# Основы из STEM_ENDINGS совпадают только со своими окончаниями: так
+# "дорог" (дорогой) не совпадает с "дороги", а "друз" — совпадает с "друзьями".
+# Составные основы ("книжн магаз") должны идти подряд.
+
+MAX_SUFFIX_LEN = 3
+
+# Окончания прилагательных (и наречия на -о: "дорого", "недорого")
+ADJECTIVE_ENDINGS = frozenset([
+    "ой", "ый", "ий", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ого", "его", "ому", "ему", "ую", "юю", "ом", "ем",
+    "ых", "их", "ым", "им", "ыми", "ими", "о",
+])
+
+# Основа -> допустимые окончания (вместо правила MAX_SUFFIX_LEN)
+STEM_ENDINGS: Dict[str, frozenset] = {
+    # "дорога", "дороги", "у дороги" — не бюджет
+    "дорог": ADJECTIVE_ENDINGS,
+    "недорог": ADJECTIVE_ENDINGS,
+    "друз": frozenset(["ья", "ей", "ьям", "ьями", "ьях"]),
+}
+
+# Слова-отрицания: совпадение после них не засчитывается
+NEGATIONS = frozenset(["не", "без", "кроме", "нет"])
+
+# Словарь: основа (или несколько основ через пробел) -> категории.
+# Значения берутся только из допустимых списков в api/agent.py.
+LEXICON: List[Tuple[str, Dict[str, Any]]] = [
+    # Типы мест
+    ("ресторан", {"entity_types": ["ресторан"]}),
+    ("кафе", {"entity_types": ["кафе"]}),
+    ("кафешк", {"entity_types": ["кафе"]}),
+    ("бар", {"entity_types": ["бар"]}),
+    ("паб", {"entity_types": ["паб"]}),
+    ("кофейн", {"entity_types": ["кофейня"]}),
+    ("кофе", {"entity_types": ["кофейня"]}),
+    ("фудкорт", {"entity_types": ["фудкорт"]}),
+    ("уличн ед", {"entity_types": ["уличная еда"]}),
+    ("стритфуд", {"entity_types": ["уличная еда"]}),
+    ("шаурм", {"entity_types": ["уличная еда"]}),
+    ("пекарн", {"entity_types": ["пекарня"]}),
+    ("выпечк", {"entity_types": ["пекарня", "кондитерская"]}),
+    ("кондитерск", {"entity_types": ["кондитерская"]}),
+    ("десерт", {"entity_types": ["кондитерская"]}),
+    ("торт", {"entity_types": ["кондитерская"]}),
+    ("чайн", {"entity_types": ["чайный домик"]}),
+    ("чай", {"entity_types": ["чайный домик"]}),
+    ("клуб", {"entity_types": ["клуб"], "best_time": "ночь"}),
+    ("гостин", {"entity_types": ["гостиная"]}),
+    ("караоке", {"entity_types": ["караоке"]}),
+    ("книжн магаз", {"entity_types": ["книжный магазин"]}),
+    ("книг", {"entity_types": ["книжный магазин"]}),
+    ("арт центр", {"entity_types": ["арт-центр"]}),
+    ("артцентр", {"entity_types": ["арт-центр"]}),
+    ("галере", {"entity_types": ["галерея"]}),
+    ("выставк", {"entity_types": ["галерея", "арт-центр"]}),
+    ("кинотеатр", {"entity_types": ["кинотеатр"]}),
+    ("кино", {"entity_types": ["кинотеатр"]}),
+    ("фильм", {"entity_types": ["кинотеатр"]}),
+    ("антикафе", {"entity_types": ["антикафе"]}),
+    ("настольн", {"entity_types": ["антикафе"], "purpose_tags": ["друзья"]}),
+    ("мастерск", {"entity_types": ["мастерская"]}),
+    ("мастер класс", {"entity_types": ["мастерская", "студия"]}),
+    ("студи", {"entity_types": ["студия"]}),
+    ("парк", {"entity_types": ["парк"]}),
+    ("сквер", {"entity_types": ["парк"]}),
+    ("набережн", {"entity_types": ["набережная"]}),
+    ("площад", {"entity_types": ["площадь"]}),
+    ("смотров", {"entity_types": ["смотровая площадка"]}),
+    ("панорам", {"entity_types": ["смотровая площадка"]}),
+    ("вид на город", {"entity_types": ["смотровая площадка"]}),
+    ("музе", {"entity_types": ["музей"]}),
+    ("памятник", {"entity_types": ["памятник"]}),
+    ("скульптур", {"entity_types": ["скульптура"]}),
+    ("историческ", {"entity_types": ["историческое здание"]}),
+    ("архитектур", {"entity_types": ["историческое здание"]}),
+    ("церк", {"entity_types": ["церковь"]}),
+    ("храм", {"entity_types": ["храм"]}),
+    ("собор", {"entity_types": ["кафедральный собор"]}),
+    ("улиц", {"entity_types": ["улица"]}),
+    ("бутик", {"entity_types": ["бутик"]}),
+    ("винтажн магаз", {"entity_types": ["винтажный магазин"]}),
+    ("секонд", {"entity_types": ["секонд-хенд"]}),
+    ("сувенир", {"entity_types": ["сувенирный магазин"]}),
+    ("рын", {"entity_types": ["рынок"]}),
+    ("концептуальн", {"entity_types": ["концептуальный магазин"]}),
+    ("достопримечательн", {"entity_types": ["достопримечательность"], "purpose_tags": ["осмотр достопримечательностей"]}),
+    ("укромн", {"entity_types": ["укромное место"]}),
+    ("внутренн двор", {"entity_types": ["внутренний двор"]}),
+    ("дворик", {"entity_types": ["внутренний двор"]}),
+
+    # Атмосфера
+    ("уютн", {"atmosphere_tags": ["уютный"]}),
+    ("уют", {"atmosphere_tags": ["уютный"]}),
+    ("романтичн", {"atmosphere_tags": ["романтичный"], "purpose_tags": ["свидание"]}),
+    ("романтик", {"atmosphere_tags": ["романтичный"], "purpose_tags": ["свидание"]}),
+    ("романтическ", {"atmosphere_tags": ["романтичный"], "purpose_tags": ["свидание"]}),
+    ("тих", {"atmosphere_tags": ["тихий"]}),
+    ("тишин", {"atmosphere_tags": ["тихий", "спокойный"]}),
+    ("спокойн", {"atmosphere_tags": ["спокойный"]}),
+    ("шумн", {"atmosphere_tags": ["шумный"]}),
+    ("весел", {"atmosphere_tags": ["энергичный"]}),
+    ("энергичн", {"atmosphere_tags": ["энергичный"]}),
+    ("драйв", {"atmosphere_tags": ["энергичный"]}),
+    ("домашн", {"atmosphere_tags": ["домашний"]}),
+    ("элегантн", {"atmosphere_tags": ["элегантный"]}),
+    ("стильн", {"atmosphere_tags": ["элегантный"]}),
+    ("премиальн", {"atmosphere_tags": ["премиум"], "budget_level": "дорогой"}),
+    ("премиум", {"atmosphere_tags": ["премиум"], "budget_level": "дорогой"}),
+    ("богемн", {"atmosphere_tags": ["богемный"]}),
+    ("артхаус", {"atmosphere_tags": ["артхаусный"]}),
+    ("хипстер", {"atmosphere_tags": ["хипстерский"]}),
+    ("альтернативн", {"atmosphere_tags": ["альтернативный"]}),
+    ("андеграунд", {"atmosphere_tags": ["альтернативный"]}),
+    ("семейн", {"atmosphere_tags": ["семейный"]}),
+    ("семь", {"atmosphere_tags": ["семейный"]}),
+    ("детск", {"atmosphere_tags": ["детский"]}),
+    ("дет", {"atmosphere_tags": ["детский", "семейный"]}),
+    ("ребенк", {"atmosphere_tags": ["детский", "семейный"]}),
+    ("туристическ", {"atmosphere_tags": ["туристический"]}),
+    ("турист", {"atmosphere_tags": ["туристический"]}),
+    ("популярн", {"atmosphere_tags": ["популярный"]}),
+    ("модн", {"atmosphere_tags": ["популярный"]}),
+    ("местн", {"atmosphere_tags": ["местный"]}),
+    ("аутентичн", {"atmosphere_tags": ["аутентичный"]}),
+    ("атмосферн", {"atmosphere_tags": ["аутентичный", "уютный"]}),
+    ("ностальги", {"atmosphere_tags": ["ностальгический"]}),
+    ("винтаж", {"atmosphere_tags": ["винтажный"]}),
+    ("винтажн", {"atmosphere_tags": ["винтажный"]}),
+    ("ретро", {"atmosphere_tags": ["винтажный", "ностальгический"]}),
+
+    # Цели посещения
+    ("свидан", {"purpose_tags": ["свидание"], "atmosphere_tags": ["романтичный"]}),
+    ("девушк", {"purpose_tags": ["свидание"]}),
+    ("парн", {"purpose_tags": ["свидание"]}),
+    ("друз", {"purpose_tags": ["друзья"]}),
+    ("подруг", {"purpose_tags": ["друзья"]}),
+    ("компани", {"purpose_tags": ["друзья"]}),
+    ("встреч", {"purpose_tags": ["друзья"], "entity_types": ["кафе", "кофейня", "ресторан"]}),
+    ("посидет", {"entity_types": ["кафе", "кофейня"]}),
+    ("работ", {"purpose_tags": ["работа"]}),
+    ("поработат", {"purpose_tags": ["работа"], "entity_types": ["кофейня", "кафе", "книжный магазин"], "features": ["Wi-Fi"]}),
+    ("ноутбук", {"purpose_tags": ["работа"], "features": ["Wi-Fi"]}),
+    ("коворкинг", {"purpose_tags": ["работа"], "entity_types": ["антикафе"]}),
+    ("учеб", {"purpose_tags": ["учеба"]}),
+    ("учит", {"purpose_tags": ["учеба"]}),
+    ("позаниматьс", {"purpose_tags": ["учеба"]}),
+    ("наедин", {"purpose_tags": ["наедине"]}),
+    ("одному", {"purpose_tags": ["наедине"]}),
+    ("одиночеств", {"purpose_tags": ["наедине"]}),
+    ("бизнес", {"purpose_tags": ["бизнес"]}),
+    ("переговор", {"purpose_tags": ["бизнес"]}),
+    ("делов", {"purpose_tags": ["бизнес"]}),
+    ("праздн", {"purpose_tags": ["празднование"]}),
+    ("отпраздн", {"purpose_tags": ["празднование"]}),
+    ("день рожден", {"purpose_tags": ["празднование"]}),
+    ("юбиле", {"purpose_tags": ["празднование"]}),
+    ("быстр", {"purpose_tags": ["быстрый визит"]}),
+    ("перекус", {"purpose_tags": ["быстрый визит"], "features": ["еда на вынос"]}),
+    ("фотосъемк", {"purpose_tags": ["фотосъемка"]}),
+    ("фото", {"purpose_tags": ["фотосъемка"]}),
+    ("сфотографир", {"purpose_tags": ["фотосъемка"]}),
+    ("прогулк", {"purpose_tags": ["прогулки"]}),
+    ("погуля", {"purpose_tags": ["прогулки"], "entity_types": ["парк", "улица", "набережная"]}),
+    ("гуля", {"purpose_tags": ["прогулки"], "entity_types": ["парк", "улица", "набережная"]}),
+    ("пройти", {"purpose_tags": ["прогулки"]}),
+    ("шоппинг", {"purpose_tags": ["шоппинг"]}),
+    ("шопинг", {"purpose_tags": ["шоппинг"]}),
+    ("покупк", {"purpose_tags": ["шоппинг"]}),
+    ("магазин", {"purpose_tags": ["шоппинг"]}),
+    ("экскурси", {"purpose_tags": ["осмотр достопримечательностей"]}),
+    ("осмотр", {"purpose_tags": ["осмотр достопримечательностей"]}),
+    ("посмотрет", {"purpose_tags": ["осмотр достопримечательностей"]}),
+    ("обед", {"purpose_tags": ["обед"], "best_time": "день"}),
+    ("пообеда", {"purpose_tags": ["обед"], "entity_types": ["кафе", "ресторан"], "best_time": "день"}),
+    ("ужин", {"purpose_tags": ["ужин"], "best_time": "вечер"}),
+    ("поужина", {"purpose_tags": ["ужин"], "entity_types": ["ресторан", "кафе"], "best_time": "вечер"}),
+    ("поздн завтрак", {"purpose_tags": ["поздний завтрак"], "best_time": "утро"}),
+    ("бранч", {"purpose_tags": ["поздний завтрак"], "best_time": "утро"}),
+    ("завтрак", {"purpose_tags": ["завтрак"], "best_time": "утро"}),
+    ("позавтрака", {"purpose_tags": ["завтрак"], "entity_types": ["кафе", "кофейня"], "best_time": "утро"}),
+    ("покуша", {"entity_types": ["ресторан", "кафе", "бар"], "purpose_tags": ["ужин", "обед"]}),
+    ("поест", {"entity_types": ["ресторан", "кафе", "бар"], "purpose_tags": ["ужин", "обед"]}),
+    ("вкусн", {"entity_types": ["ресторан", "кафе"]}),
+    ("выпит", {"entity_types": ["бар", "паб"], "features": ["алкоголь"]}),
+    ("сходит", {"entity_types": ["парк", "музей", "кинотеатр", "ресторан"], "purpose_tags": ["прогулки"]}),
+    ("провест врем", {"entity_types": ["парк", "кинотеатр"]}),
+    ("отдохнут", {"entity_types": ["парк", "кафе"]}),
+
+    # Бюджет
+    ("бюджетн", {"budget_level": "бюджетный"}),
+    ("дешев", {"budget_level": "бюджетный"}),
+    ("недорог", {"budget_level": "бюджетный"}),
+    ("студенческ", {"budget_level": "бюджетный"}),
+    ("средн", {"budget_level": "средний"}),
+    ("дорог", {"budget_level": "дорогой"}),
+    ("элитн", {"budget_level": "дорогой", "atmosphere_tags": ["премиум"]}),
+    ("пафосн", {"budget_level": "дорогой", "atmosphere_tags": ["элегантный"]}),
+    ("роскошн", {"budget_level": "дорогой", "atmosphere_tags": ["премиум"]}),
+
+    # Особенности
+    ("природ", {"features": ["для отдыха на природе"]}),
+    ("пикник", {"features": ["для отдыха на природе"], "entity_types": ["парк"]}),
+    ("животн", {"features": ["для домашних животных"]}),
+    ("собак", {"features": ["для домашних животных"]}),
+    ("питом", {"features": ["для домашних животных"]}),
+    ("pet friendly", {"features": ["для домашних животных"]}),
+    ("вегетариан", {"features": ["вегетарианец"]}),
+    ("веган", {"features": ["веган"]}),
+    ("живой музык", {"features": ["живая музыка"]}),
+    ("жив музык", {"features": ["живая музыка"]}),
+    ("концерт", {"features": ["живая музыка", "мероприятия"]}),
+    ("музык", {"features": ["живая музыка"]}),
+    ("танц", {"features": ["танцы"]}),
+    ("потанцева", {"features": ["танцы"], "entity_types": ["клуб", "бар"]}),
+    ("wi fi", {"features": ["Wi-Fi"]}),
+    ("wifi", {"features": ["Wi-Fi"]}),
+    ("вайфа", {"features": ["Wi-Fi"]}),
+    ("вай фа", {"features": ["Wi-Fi"]}),
+    ("интернет", {"features": ["Wi-Fi"]}),
+    ("розетк", {"features": ["Wi-Fi"], "purpose_tags": ["работа"]}),
+    ("парковк", {"features": ["парковка"]}),
+    ("машин", {"features": ["парковка"]}),
+    ("доступн", {"features": ["доступно"]}),
+    ("инвалид", {"features": ["доступно"]}),
+    ("пандус", {"features": ["доступно"]}),
+    ("кальян", {"features": ["место для курения"]}),
+    ("курени", {"features": ["место для курения"]}),
+    ("покурит", {"features": ["место для курения"]}),
+    ("алкогол", {"features": ["алкоголь"]}),
+    ("вин", {"features": ["алкоголь"]}),
+    ("пив", {"features": ["алкоголь"], "entity_types": ["бар", "паб"]}),
+    ("коктейл", {"features": ["алкоголь"], "entity_types": ["бар"]}),
+    ("детск комнат", {"features": ["детская комната"], "atmosphere_tags": ["семейный"]}),
+    ("мероприят", {"features": ["мероприятия"]}),
+    ("событи", {"features": ["мероприятия"]}),
+    ("бесплатн", {"features": ["бесплатный вход"]}),
+    ("платн", {"features": ["платный вход"]}),
+    ("брон", {"features": ["бронирование"]}),
+    ("бронир", {"features": ["бронирование"]}),
+    ("забронир", {"features": ["бронирование"]}),
+    ("доставк", {"features": ["доставка"]}),
+    ("вынос", {"features": ["еда на вынос"]}),
+    ("навынос", {"features": ["еда на вынос"]}),
+
+    # Время посещения
+    ("утр", {"best_time": "утро"}),
+    ("утрен", {"best_time": "утро"}),
+    ("днем", {"best_time": "день"}),
+    ("дневн", {"best_time": "день", "atmosphere_tags": ["дневной"]}),
+    ("вечер", {"best_time": "вечер"}),
+    ("вечерн", {"best_time": "вечер", "atmosphere_tags": ["вечерний"]}),
+    ("ноч", {"best_time": "ночь", "atmosphere_tags": ["ночной"]}),
+    ("круглосуточн", {"best_time": "ночь"}),
+]
+
+# Время посещения по умолчанию, если из запроса его не вывести
+DEFAULT_BEST_TIME = "день"
+
+# Поля, которые делают запрос пригодным для поиска без LLM
+_ANCHOR_FIELDS = ("entity_types", "purpose_tags")
+
+
+def _build_index() -> Dict[str, List[Tuple[List[str], Dict[str, Any]]]]:
+    """
+    Индексирует словарь по первым двум буквам первой основы.
+    Более длинные основы проверяются первыми.
+    """
+    index: Dict[str, List[Tuple[List[str], Dict[str, Any]]]] = {}
+    for pattern, categories in LEXICON:
+        stems = normalize_prompt(pattern).split()
+        index.setdefault(stems[0][:2], []).append((stems, categories))
+    for entries in index.values():
+        entries.sort(key=lambda entry: (-len(entry[0]), -len(entry[0][0])))
+    return index
+
+
+_LEXICON_INDEX = _build_index()
+
+
+def _matches(word: str, stem: str) -> bool:
+    """
+    Проверяет, что слово — словоформа основы.
+    """
+    if not word.startswith(stem):
+        return False
+    endings = STEM_ENDINGS.get(stem)
+    if endings is not None:
+        return word[len(stem):] in endings
+    return len(word) - len(stem) <= MAX_SUFFIX_LEN
+
+
+def _match_at(words: List[str], position: int):
+    """
+    Ищет самую длинную запись словаря, совпадающую с позиции position.
+    Возвращает (число слов, категории) или None.
+    """
+    for stems, categories in _LEXICON_INDEX.get(words[position][:2], ()):
+        if position + len(stems) > len(words):
+            continue
+        if all(_matches(words[position + i], stem) for i, stem in enumerate(stems)):
+            return len(stems), categories
+    return None
+
+
+def is_category_word(word: str) -> bool:
+    """
+    Проверяет, что нормализованное слово — словоформа основы из словаря категорий.
+    """
+    return bool(word) and _match_at([word], 0) is not None
+
+
+def extract_preferences(user_prompt: str) -> Tuple[Dict[str, Any], float]:
+    """
+    Извлекает предпочтения из запроса по словарю основ, без обращения к LLM.
+    Возвращает (предпочтения в формате analyze_user_preferences, уверенность 0..1).
+    Уверенность — доля значимых слов запроса, покрытых словарём; без типа места
+    или цели посещения она снижается вдвое.
+    """
+    words = normalize_prompt(user_prompt).split()
+
+    preferences: Dict[str, Any] = {
+        "entity_types": [],
+        "atmosphere_tags": [],
+        "purpose_tags": [],
+        "budget_level": None,
+        "features": [],
+        "best_time": "",
+    }
+
+    meaningful = 0
+    covered = 0
+    position = 0
+    while position < len(words):
+        word = words[position]
+        if word in STOP_WORDS or word in NEGATIONS or len(word) < 2:
+            position += 1
+            continue
+
+        meaningful += 1
+        match = _match_at(words, position)
+        if match is None:
+            position += 1
+            continue
+
+        length, categories = match
+        # Отрицание ("без алкоголя", "не шумный") словарём не выражается —
+        # слова остаются непокрытыми, что снижает уверенность
+        negated = position > 0 and words[position - 1] in NEGATIONS
+        if not negated:
+            covered += length
+            for field, value in categories.items():
+                if isinstance(value, list):
+                    for item in value:
+                        if item not in preferences[field]:
+                            preferences[field].append(item)
+                elif not preferences[field]:
+                    preferences[field] = value
+        meaningful += length - 1
+        position += length
+
+    if not preferences["best_time"]:
+        preferences["best_time"] = DEFAULT_BEST_TIME
+
+    if meaningful == 0:
+        return preferences, 0.0
+
+    confidence = covered / meaningful
+    if not any(preferences[field] for field in _ANCHOR_FIELDS):
+        confidence *= 0.5
+
+    return preferences, round(confidence, 3)
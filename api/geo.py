@@ -0,0 +1,94 @@
+import math
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+# --- Координаты мест и поиск рядом с пользователем ---
+# Без PostGIS: поверхность разбита на ячейки сетки GEO_CELL_DEGREES x GEO_CELL_DEGREES
+# градусов, номер ячейки места хранится в столбце places.geo_cell (считается
+# БД из широты и долготы) с B-tree индексом. Круг радиуса r покрывается
+# несколькими строками сетки; в каждой строке ячейки идут подряд, поэтому
+# кандидаты выбираются несколькими диапазонными сканированиями индекса,
+# а точное расстояние считается только для них.
+
+# Средний радиус Земли, км
+EARTH_RADIUS_KM = 6371.0
+
+# Размер ячейки сетки в градусах (~1.1 км по широте)
+GEO_CELL_DEGREES = 0.01
+
+# Ячеек в одной строке сетки (по долготе)
+_LON_CELLS = round(360 / GEO_CELL_DEGREES)
+
+# Км в одном градусе широты
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Номер ячейки в SQL — та же формула, что и geo_cell()
+GEO_CELL_SQL = (
+    f"floor((latitude + 90) / {GEO_CELL_DEGREES})::integer * {_LON_CELLS}"
+    f" + floor((longitude + 180) / {GEO_CELL_DEGREES})::integer"
+)
+
+
+class GeoQuery(NamedTuple):
+    """
+    Точка пользователя и радиус поиска.
+    """
+    lat: float
+    lon: float
+    radius_km: float
+
+
+def geo_cell(lat: float, lon: float) -> int:
+    """
+    Номер ячейки сетки для точки.
+    """
+    row = math.floor((lat + 90) / GEO_CELL_DEGREES)
+    column = math.floor((lon + 180) / GEO_CELL_DEGREES)
+    return row * _LON_CELLS + column
+
+
+def cell_ranges(near: GeoQuery) -> List[Tuple[int, int]]:
+    """
+    Диапазоны номеров ячеек (включительно), покрывающие круг поиска:
+    по одному на строку сетки (два — если круг пересекает 180-й меридиан).
+    """
+    lat_delta = near.radius_km / _KM_PER_DEGREE
+    lat_min = max(near.lat - lat_delta, -90.0)
+    lat_max = min(near.lat + lat_delta, 90.0)
+
+    # Долготу расширяем по самой удалённой от экватора широте круга
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if cos_lat * 180 * _KM_PER_DEGREE <= near.radius_km:
+        lon_spans = [(-180.0, 180.0)]
+    else:
+        lon_delta = near.radius_km / (_KM_PER_DEGREE * cos_lat)
+        lon_min, lon_max = near.lon - lon_delta, near.lon + lon_delta
+        if lon_min < -180:
+            lon_spans = [(lon_min + 360, 180.0), (-180.0, lon_max)]
+        elif lon_max > 180:
+            lon_spans = [(lon_min, 180.0), (-180.0, lon_max - 360)]
+        else:
+            lon_spans = [(lon_min, lon_max)]
+
+    row_min = math.floor((lat_min + 90) / GEO_CELL_DEGREES)
+    row_max = math.floor((lat_max + 90) / GEO_CELL_DEGREES)
+    ranges = []
+    for row in range(row_min, row_max + 1):
+        for lon_min, lon_max in lon_spans:
+            first = math.floor((lon_min + 180) / GEO_CELL_DEGREES)
+            last = min(math.floor((lon_max + 180) / GEO_CELL_DEGREES), _LON_CELLS - 1)
+            ranges.append((row * _LON_CELLS + first, row * _LON_CELLS + last))
+    return ranges
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    Расстояние между точками по поверхности Земли (формула гаверсинусов), км.
+    Принимает как числа, так и NumPy-массивы.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from api.config import (
+    OPENROUTER_API_KEY,
+    LLM_BASE_URL,
+    LLM_MODEL,
+    LLM_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+)
+from api.singleflight import SingleFlight
+from api.usage import record_usage
+
+# --- Общий асинхронный клиент LLM ---
+# Один HTTP-пул на процесс: соединения с OpenRouter переиспользуются
+# между запросами, а не открываются заново на каждый вызов.
+_client: Optional[AsyncOpenAI] = None
+
+# Семафор ограничивает число одновременных запросов к LLM
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# Одинаковые одновременные запросы к LLM выполняются один раз
+_single_flight = SingleFlight()
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """
+    Возвращает общий асинхронный клиент OpenAI (создаётся лениво).
+    """
+    global _client
+
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        _client = AsyncOpenAI(
+            base_url=LLM_BASE_URL,
+            api_key=OPENROUTER_API_KEY,
+            http_client=http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """
+    Возвращает семафор, ограничивающий параллельные запросы к LLM.
+    """
+    global _semaphore
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _request_key(messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """
+    Ключ запроса к LLM: хэш сообщений и параметров генерации.
+    """
+    payload = json.dumps(
+        {"messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def chat_completion(
+    messages: List[Dict[str, Any]],
+    timeout: Optional[float] = None,
+    coalesce: bool = True,
+    prompt_type: str = "other",
+    **params: Any,
+):
+    """
+    Выполняет запрос chat.completions без блокировки event loop.
+    timeout — таймаут конкретного вызова (по умолчанию LLM_TIMEOUT).
+    coalesce — объединять одновременные одинаковые запросы в один вызов API;
+    ответ в этом случае общий, его нельзя изменять.
+    prompt_type — тип промпта для учёта токенов и задержек (см. api/usage.py).
+    Остальные параметры передаются в API как есть.
+    """
+    client = get_llm_client()
+    params.setdefault("model", LLM_MODEL)
+
+    async def call():
+        async with _get_semaphore():
+            started = time.perf_counter()
+            completion = await client.chat.completions.create(
+                messages=messages,
+                timeout=timeout or LLM_TIMEOUT,
+                **params,
+            )
+            record_usage(
+                prompt_type,
+                getattr(completion, "usage", None),
+                time.perf_counter() - started,
+            )
+            return completion
+
+    if not coalesce:
+        return await call()
+    return await _single_flight.do(_request_key(messages, params), call)
+
+
+def get_coalescing_stats() -> Dict[str, Any]:
+    """
+    Возвращает статистику объединения одинаковых запросов к LLM.
+    """
+    return _single_flight.stats()
+
+
+async def close_llm_client():
+    """
+    Закрывает пул соединений клиента LLM (при остановке приложения).
+    """
+    global _client
+
+    if _client is not None:
+        await _client.close()
+        _client = None
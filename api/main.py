@@ -3,32 +3,72 @@
 # ----------------------------------------
 from fastapi import (
     FastAPI, Depends, HTTPException, status, BackgroundTasks,
-    UploadFile, File, Form
+    UploadFile, File, Form, Request
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field, validator
 from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import io
+import logging
+import orjson
 import time
 import os
 import uuid
 
-from api.database import get_async_session, init_db
-from api.crud import (
-    search_places_advanced, add_place, add_places_batch,
-    create_or_update_place_from_review
+from api.database import (
+    get_read_session, get_write_session, init_db, mark_primary_reads, read_session, read_router,
+    engine
 )
-from api.agent import analyze_user_preferences, generate_explanation
+from api.crud import search_places_advanced, add_place, add_places_batch
+from api.agent import (
+    analyze_user_preferences, generate_explanation, generate_explanations_batch
+)
+from api.explanations import build_template_explanation
+from api.llm import close_llm_client, get_coalescing_stats
+from api.catalog_index import get_catalog_index
+from api.config import (
+    CATALOG_INDEX_ENABLED, GEO_DEFAULT_RADIUS_KM, GEO_MAX_RADIUS_KM, REVIEW_WORKERS,
+    TRACE_SERVER_TIMING
+)
+from api.geo import GeoQuery
+from api.opening_hours import slot_at
+from api.repair import get_repair_stats
+from api.metrics import (
+    CONTENT_TYPE_LATEST, HTTP_REQUESTS, HTTP_REQUEST_SECONDS, get_db_stats,
+    mark_process_dead, prometheus_metrics
+)
+from api.tracing import end_trace, log_trace, record_exception, stage, start_trace
+from api.usage import current_endpoint, get_usage_stats
+from api.pagination import decode_cursor, encode_cursor
+from api.bulk_import import detect_format, import_places
+from api.projection import project
+from api.review_jobs import enqueue_review, get_review_job, get_review_worker_pool
+from api.warmup import get_warmup_state, warm_up
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from contextlib import asynccontextmanager
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
 
 # ----------------------------------------
-# Жизненный цикл приложения (инициализация БД)
+# Жизненный цикл приложения (проверка схемы БД, прогрев, воркеры отзывов,
+# пул соединений LLM)
 # ----------------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # Прогрев идёт в фоне: /health отвечает сразу, /ready — после прогрева
+    warmup_task = asyncio.create_task(warm_up())
+    if REVIEW_WORKERS > 0:
+        get_review_worker_pool().start()
     yield
+    warmup_task.cancel()
+    await get_review_worker_pool().stop()
+    await close_llm_client()
+    mark_process_dead()
 
 # ----------------------------------------
 # Инициализация FastAPI приложения
@@ -54,6 +94,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ----------------------------------------
+# Эндпоинт текущего запроса — для учёта токенов LLM (api/usage.py)
+# и метрики запросов (api/metrics.py); трасса этапов запроса
+# (api/tracing.py) — в заголовках Server-Timing и X-Request-ID и в логе api.requests
+# ----------------------------------------
+@app.middleware("http")
+async def track_endpoint(request: Request, call_next):
+    # Одна метка эндпоинта для метрик запросов, этапов, учёта токенов и лога
+    endpoint = _route_template(request)
+    token = current_endpoint.set(endpoint)
+    trace, trace_token = start_trace(
+        request.method, request.url.path, request.headers.get("x-request-id")
+    )
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    except Exception as e:
+        record_exception(e)
+        log_trace(trace, endpoint, status_code)
+        raise
+    finally:
+        end_trace(trace_token)
+        current_endpoint.reset(token)
+        HTTP_REQUESTS.labels(request.method, endpoint, str(status_code)).inc()
+        HTTP_REQUEST_SECONDS.labels(request.method, endpoint).observe(time.perf_counter() - started)
+
+    # Заголовки уходят до тела: в Server-Timing — этапы, завершённые к этому
+    # моменту (для потоковых ответов — до начала потока). В лог запрос
+    # пишется после отправки тела — со всеми этапами.
+    response.headers["X-Request-ID"] = trace.request_id
+    if TRACE_SERVER_TIMING:
+        response.headers["Server-Timing"] = trace.server_timing()
+    response.body_iterator = _log_after_body(response.body_iterator, trace, endpoint, status_code)
+    return response
+
+def _route_template(request: Request) -> str:
+    """
+    Шаблон маршрута, а не путь: число рядов метрик не зависит от параметров пути.
+    Маршрут определяется до обработки запроса — так же, как его выберет роутер.
+    """
+    partial = None
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match is Match.FULL:
+            return route.path
+        if match is Match.PARTIAL and partial is None:
+            partial = route
+    return partial.path if partial is not None else "unmatched"
+
+async def _log_after_body(body, trace, endpoint: str, status_code: int):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        log_trace(trace, endpoint, status_code)
+
 # ----------------------------------------
 # Pydantic схемы для рекомендаций
 # ----------------------------------------
@@ -64,6 +162,83 @@ class RecommendationRequest(BaseModel):
     limit: int = Field(
         default=10, ge=1, le=50, description="Количество возвращаемых рекомендаций"
     )
+    conversation_id: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Идентификатор диалога для уточняющих запросов с учётом истории",
+    )
+    cursor: Optional[str] = Field(
+        default=None,
+        max_length=2048,
+        description="Курсор следующей страницы (next_cursor из предыдущего ответа); "
+        "запрос при этом повторно не анализируется",
+    )
+    lat: Optional[float] = Field(
+        default=None, ge=-90, le=90, description="Широта пользователя — искать рядом"
+    )
+    lon: Optional[float] = Field(
+        default=None, ge=-180, le=180, description="Долгота пользователя — искать рядом"
+    )
+    radius_km: Optional[float] = Field(
+        default=None,
+        gt=0,
+        le=GEO_MAX_RADIUS_KM,
+        description=f"Радиус поиска рядом, км (по умолчанию {GEO_DEFAULT_RADIUS_KM:g})",
+    )
+
+    @validator("lon", always=True)
+    def validate_coordinates(cls, v, values):
+        # Широта и долгота передаются только вместе
+        if (v is None) != (values.get("lat") is None):
+            raise ValueError("lat и lon должны быть указаны вместе")
+        return v
+
+    open_now: bool = Field(
+        default=False, description="Только места, открытые сейчас"
+    )
+    open_at: Optional[datetime] = Field(
+        default=None,
+        description="Только места, открытые в этот момент (без часового пояса — местное время)",
+    )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Поля карточек мест в ответе (по умолчанию — все); id возвращается всегда",
+    )
+
+    @validator("fields")
+    def validate_fields(cls, v):
+        # Только поля карточки места (PlaceRecommendation)
+        if v is not None:
+            unknown = [field for field in v if field not in PlaceRecommendation.model_fields]
+            if unknown:
+                raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        return v
+
+    def response_fields(self) -> List[str]:
+        """
+        Поля карточек мест в ответе.
+        """
+        if self.fields is None:
+            return list(PlaceRecommendation.model_fields)
+        return list(dict.fromkeys(["id", *self.fields]))
+
+    def search_filters(self) -> Dict[str, Any]:
+        """
+        Фильтры поиска первой страницы: текст запроса для текстового поиска,
+        точка и радиус для поиска рядом, слот недели для "открыто сейчас".
+        """
+        near = None
+        if self.lat is not None and self.lon is not None:
+            near = GeoQuery(self.lat, self.lon, self.radius_km or GEO_DEFAULT_RADIUS_KM)
+        open_slot = None
+        if self.open_at is not None or self.open_now:
+            open_slot = slot_at(self.open_at)
+        return {"text_query": self.user_prompt, "near": near, "open_slot": open_slot}
+
+class StreamRecommendationRequest(RecommendationRequest):
+    explain: bool = Field(
+        default=True, description="Генерировать объяснения для каждого места"
+    )
 
 class MatchDetails(BaseModel):
     entity_types_match: List[str]
@@ -88,14 +263,19 @@ class PlaceRecommendation(BaseModel):
     is_24_7: bool
     overall_rating: float
     review_count: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None
     relevance_score: float
     match_details: MatchDetails
+    explanation: Optional[str] = None
 
 class RecommendationResponse(BaseModel):
     success: bool
     recommendations: List[PlaceRecommendation]
     count: int
     user_preferences: Optional[Dict[str, Any]] = None
+    next_cursor: Optional[str] = None
     error_message: Optional[str] = None
 
 # ----------------------------------------
@@ -117,6 +297,8 @@ class PlaceCreate(BaseModel):
     is_24_7: bool = Field(False, description="Круглосуточно")
     overall_rating: float = Field(0.0, ge=0.0, le=5.0, description="Общий рейтинг")
     review_count: int = Field(0, ge=0, description="Количество отзывов")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, description="Широта")
+    longitude: Optional[float] = Field(None, ge=-180, le=180, description="Долгота")
 
     @validator("budget_level")
     def validate_budget_level(cls, v):
@@ -157,6 +339,8 @@ class PlaceResponse(BaseModel):
     is_24_7: bool
     overall_rating: float
     review_count: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class SinglePlaceResponse(BaseModel):
     success: bool
@@ -174,6 +358,22 @@ class BatchPlaceResponse(BaseModel):
     places: List[PlaceResponse]
     message: str
 
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResponse(BaseModel):
+    success: bool
+    read: int = Field(..., description="Прочитано записей")
+    rejected: int = Field(..., description="Отклонено некорректных записей")
+    inserted: int = Field(..., description="Добавлено мест")
+    updated: int = Field(..., description="Обновлено мест (по url)")
+    errors: List[ImportRowError] = Field(..., description="Первые ошибки разбора")
+    copy_seconds: float
+    merge_seconds: float
+    total_seconds: float
+    rows_per_second: Optional[float]
+
 # ----------------------------------------
 # Pydantic схемы для объяснения рекомендаций
 # ----------------------------------------
@@ -186,6 +386,21 @@ class ExplanationResponse(BaseModel):
     explanation: str
     error_message: Optional[str] = None
 
+class BatchExplanationRequest(BaseModel):
+    user_prompt: str = Field(..., min_length=1, description="Оригинальный запрос пользователя")
+    places: List[Dict[str, Any]] = Field(
+        ..., min_items=1, max_items=50, description="Данные мест для объяснения"
+    )
+
+class PlaceExplanation(BaseModel):
+    place_id: Optional[int]
+    explanation: str
+
+class BatchExplanationResponse(BaseModel):
+    success: bool
+    explanations: List[PlaceExplanation]
+    error_message: Optional[str] = None
+
 # ----------------------------------------
 # Pydantic схемы для отзывов
 # ----------------------------------------
@@ -196,54 +411,121 @@ class ReviewRequest(BaseModel):
 
 class ReviewResponse(BaseModel):
     success: bool
-    action: str  # "created" или "updated"
-    place_id: int
-    place: Dict[str, Any]
+    job_id: str
+    status: str  # "pending"
     message: str
 
+class ReviewJobResponse(BaseModel):
+    job_id: str
+    status: str  # "pending", "processing", "done" или "failed"
+    attempts: int
+    action: Optional[str] = None  # "created" или "updated" (когда status == "done")
+    place_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 # ----------------------------------------
-# Сервис для метрик рекомендаций
+# Постраничная выдача рекомендаций (курсор)
 # ----------------------------------------
-class RecommendationService:
-    def __init__(self):
-        self.request_count = 0
-        self.average_processing_time = 0
+async def resolve_preferences(
+    user_prompt: str,
+    conversation_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+):
+    """
+    Предпочтения, ключ продолжения выдачи и фильтры поиска: из курсора
+    (без повторного анализа) или из анализа запроса для первой страницы.
+    """
+    if cursor:
+        return decode_cursor(cursor)
+    preferences = await analyze_user_preferences(
+        user_prompt, conversation_id=conversation_id
+    )
+    return preferences, None, filters or {}
+
+async def search_page(
+    session: AsyncSession,
+    preferences: Dict[str, Any],
+    limit: int,
+    after=None,
+    filters: Optional[Dict[str, Any]] = None,
+    fields: Optional[List[str]] = None,
+):
+    """
+    Одна страница рекомендаций и курсор следующей (None, если страница последняя).
+    Запрашивается на одно место больше, чтобы знать, есть ли продолжение.
+    fields — поля карточек в ответе: тяжёлые поля вне fields не загружаются.
+    """
+    filters = filters or {}
+    recommendations = await search_places_advanced(
+        session=session,
+        preferences=preferences,
+        limit=limit + 1,
+        after=after,
+        fields=fields,
+        **filters,
+    )
+    next_cursor = None
+    if len(recommendations) > limit:
+        recommendations = recommendations[:limit]
+        next_cursor = encode_cursor(preferences, recommendations[-1], filters)
+    return recommendations, next_cursor
 
+# ----------------------------------------
+# Сервис рекомендаций (длительность этапов — в метриках, GET /metrics)
+# ----------------------------------------
+class RecommendationService:
     async def process_recommendation_request(
-        self, user_prompt: str, session: AsyncSession, limit: int = 10
+        self,
+        user_prompt: str,
+        session: AsyncSession,
+        limit: int = 10,
+        conversation_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
         """
         Обрабатывает запрос на рекомендации с метриками производительности
         """
         start_time = time.time()
-        self.request_count += 1
 
         try:
-            # Анализ предпочтений пользователя
-            preferences = await analyze_user_preferences(user_prompt)
+            # Анализ предпочтений пользователя (или продолжение по курсору)
+            preferences, after, filters = await resolve_preferences(
+                user_prompt, conversation_id, cursor, filters
+            )
 
-            # Поиск рекомендаций по предпочтениям
-            recommendations = await search_places_advanced(
-                session=session, preferences=preferences, limit=limit
+            # Поиск рекомендаций по предпочтениям и фильтрам запроса
+            recommendations, next_cursor = await search_page(
+                session, preferences, limit, after, filters, fields
             )
 
-            processing_time = time.time() - start_time
+            # Мгновенные объяснения по совпадениям, без обращения к LLM
+            if fields is None or "explanation" in fields:
+                with stage("explanation"):
+                    for place in recommendations:
+                        place["explanation"] = build_template_explanation(place)
+
+            # Карточки — только с запрошенными полями
+            if fields is not None:
+                with stage("serialization"):
+                    recommendations = [project(place, fields) for place in recommendations]
 
-            # Обновляем среднее время обработки
-            self.average_processing_time = (
-                self.average_processing_time * (self.request_count - 1)
-                + processing_time
-            ) / self.request_count
+            processing_time = time.time() - start_time
 
             return {
                 "preferences": preferences,
                 "recommendations": recommendations,
+                "next_cursor": next_cursor,
                 "processing_time": processing_time,
                 "success": True,
             }
 
         except Exception as e:
-            processing_time = time.time() - start_time
+            record_exception(e)
             raise
 
 # ----------------------------------------
@@ -263,48 +545,168 @@ recommendation_service = RecommendationService()
 )
 async def get_recommendations(
     request: RecommendationRequest,
-    background_tasks: BackgroundTasks,
-    session: AsyncSession = Depends(get_async_session),
-) -> RecommendationResponse:
+    session: AsyncSession = Depends(get_read_session),
+) -> ORJSONResponse:
     """
-    Получить рекомендации мест на основе текстового запроса пользователя
+    Получить рекомендации мест на основе текстового запроса пользователя.
+    Ответ собирается из словарей и сериализуется orjson напрямую, без повторной
+    валидации карточек; схема ответа — RecommendationResponse.
     """
     try:
         # Обрабатываем запрос через сервис
         result = await recommendation_service.process_recommendation_request(
-            user_prompt=request.user_prompt, session=session, limit=request.limit
+            user_prompt=request.user_prompt,
+            session=session,
+            limit=request.limit,
+            conversation_id=request.conversation_id,
+            cursor=request.cursor,
+            filters=request.search_filters(),
+            fields=request.response_fields(),
         )
 
-        # Если рекомендации не найдены
-        if not result["recommendations"]:
-            return RecommendationResponse(
-                success=True,
-                recommendations=[],
-                count=0,
-                user_preferences=result["preferences"],
-                error_message="К сожалению, не найдено мест, соответствующих вашему запросу.",
-            )
+        # Ответ сериализуется при создании ORJSONResponse
+        with stage("serialization"):
+            # Если рекомендации не найдены
+            if not result["recommendations"]:
+                return ORJSONResponse({
+                    "success": True,
+                    "recommendations": [],
+                    "count": 0,
+                    "user_preferences": result["preferences"],
+                    "next_cursor": None,
+                    "error_message": "К сожалению, не найдено мест, соответствующих вашему запросу.",
+                })
 
-        # Возвращаем найденные рекомендации
-        return RecommendationResponse(
-            success=True,
-            recommendations=result["recommendations"],
-            count=len(result["recommendations"]),
-            user_preferences=result["preferences"],
-        )
+            # Возвращаем найденные рекомендации
+            return ORJSONResponse({
+                "success": True,
+                "recommendations": result["recommendations"],
+                "count": len(result["recommendations"]),
+                "user_preferences": result["preferences"],
+                "next_cursor": result["next_cursor"],
+                "error_message": None,
+            })
 
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Ошибка обработки запроса: {str(e)}",
         )
-    except Exception as e:
-        print("Error: ", e)
+    except Exception:
+        # Ошибка уже записана в трассу и метрики сервисом рекомендаций
+        logger.exception("Ошибка при обработке запроса рекомендаций")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Внутренняя ошибка сервера при обработке запроса",
         )
 
+# ----------------------------------------
+# Эндпоинт: Потоковые рекомендации (Server-Sent Events)
+# ----------------------------------------
+def format_sse_event(event: str, data: Any) -> str:
+    """
+    Форматирует событие Server-Sent Events с JSON-данными.
+    """
+    payload = orjson.dumps(data).decode("utf-8")
+    return f"event: {event}\ndata: {payload}\n\n"
+
+async def _explain_place(user_prompt: str, place: Dict[str, Any]):
+    """
+    Генерирует объяснение для места и возвращает его вместе с id места.
+    """
+    explanation = await generate_explanation(user_prompt=user_prompt, place_data=place)
+    return place["id"], explanation
+
+@app.post(
+    "/recommendations/stream",
+    summary="Получить рекомендации мест потоком",
+    description=(
+        "Возвращает рекомендации как поток Server-Sent Events: сначала событие "
+        "preferences с разобранным запросом, затем places с найденными местами, "
+        "затем explanation для каждого места по мере генерации и done в конце"
+    ),
+    response_class=StreamingResponse,
+)
+async def stream_recommendations(request: StreamRecommendationRequest) -> StreamingResponse:
+    """
+    Потоковая версия /recommendations: первые карточки приходят сразу после
+    ответа БД, не дожидаясь генерации объяснений.
+    """
+    async def event_stream():
+        start_time = time.time()
+        pending = []
+        try:
+            # 1. Разобранные предпочтения пользователя
+            preferences, after, filters = await resolve_preferences(
+                request.user_prompt, request.conversation_id, request.cursor,
+                request.search_filters(),
+            )
+            yield format_sse_event("preferences", preferences)
+
+            # 2. Найденные места — сразу после ответа БД.
+            # Сессия открывается внутри потока: зависимость запроса
+            # не должна жить всё время генерации объяснений.
+            # Для объяснений LLM место нужно целиком, иначе — только запрошенные поля
+            fields = request.response_fields()
+            async with read_session() as session:
+                recommendations, next_cursor = await search_page(
+                    session, preferences, request.limit, after, filters,
+                    None if request.explain else fields,
+                )
+            with stage("explanation"):
+                for place in recommendations:
+                    place["explanation"] = build_template_explanation(place)
+            yield format_sse_event(
+                "places",
+                {
+                    "recommendations": [project(place, fields) for place in recommendations],
+                    "count": len(recommendations),
+                    "next_cursor": next_cursor,
+                },
+            )
+
+            # 3. Объяснения LLM — по мере готовности, в порядке завершения
+            if request.explain and recommendations:
+                pending = [
+                    asyncio.create_task(_explain_place(request.user_prompt, place))
+                    for place in recommendations
+                ]
+                for next_done in asyncio.as_completed(pending):
+                    place_id, explanation = await next_done
+                    yield format_sse_event(
+                        "explanation", {"place_id": place_id, "explanation": explanation}
+                    )
+
+            yield format_sse_event(
+                "done",
+                {
+                    "count": len(recommendations),
+                    "processing_time": time.time() - start_time,
+                },
+            )
+
+        except ValueError as e:
+            yield format_sse_event(
+                "error", {"error_message": f"Ошибка обработки запроса: {str(e)}"}
+            )
+        except Exception as e:
+            logger.exception("Ошибка при потоковой выдаче рекомендаций")
+            record_exception(e)
+            yield format_sse_event(
+                "error",
+                {"error_message": "Внутренняя ошибка сервера при обработке запроса"},
+            )
+        finally:
+            # Клиент мог отключиться — не генерируем объяснения впустую
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ----------------------------------------
 # Эндпоинт: Объяснить рекомендацию
 # ----------------------------------------
@@ -316,7 +718,7 @@ async def get_recommendations(
 )
 async def explain_recommendation(
     request: ExplanationRequest,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ) -> ExplanationResponse:
     """
     Генерирует объяснение, почему место подходит под запрос пользователя
@@ -332,12 +734,51 @@ async def explain_recommendation(
             explanation=explanation
         )
     except Exception as e:
+        logger.exception("Ошибка при генерации объяснения")
+        record_exception(e)
         return ExplanationResponse(
             success=False,
             explanation="",
             error_message="Не удалось сгенерировать объяснение"
         )
 
+# ----------------------------------------
+# Эндпоинт: Объяснить рекомендации пачкой
+# ----------------------------------------
+@app.post(
+    "/explain/batch",
+    response_model=BatchExplanationResponse,
+    summary="Объяснить несколько рекомендаций",
+    description="Генерирует объяснения для всей страницы рекомендаций одним запросом к LLM"
+)
+async def explain_recommendations_batch(
+    request: BatchExplanationRequest
+) -> BatchExplanationResponse:
+    """
+    Генерирует объяснения для нескольких мест за один запрос к LLM.
+    Повторные запросы для тех же мест берутся из кэша.
+    """
+    try:
+        explanations = await generate_explanations_batch(
+            user_prompt=request.user_prompt,
+            places=request.places
+        )
+        return BatchExplanationResponse(
+            success=True,
+            explanations=[
+                PlaceExplanation(place_id=place.get("id"), explanation=explanation)
+                for place, explanation in zip(request.places, explanations)
+            ]
+        )
+    except Exception as e:
+        logger.exception("Ошибка при пакетной генерации объяснений")
+        record_exception(e)
+        return BatchExplanationResponse(
+            success=False,
+            explanations=[],
+            error_message="Не удалось сгенерировать объяснения"
+        )
+
 # ----------------------------------------
 # Эндпоинт: Добавить одно место
 # ----------------------------------------
@@ -349,7 +790,7 @@ async def explain_recommendation(
     status_code=status.HTTP_201_CREATED,
 )
 async def create_place(
-    place_data: PlaceCreate, session: AsyncSession = Depends(get_async_session)
+    place_data: PlaceCreate, session: AsyncSession = Depends(get_write_session)
 ) -> SinglePlaceResponse:
     """
     Добавить одно место в базу данных
@@ -379,6 +820,8 @@ async def create_place(
             is_24_7=place.is_24_7,
             overall_rating=place.overall_rating,
             review_count=place.review_count,
+            latitude=place.latitude,
+            longitude=place.longitude,
         )
 
         return SinglePlaceResponse(
@@ -402,7 +845,7 @@ async def create_place(
     status_code=status.HTTP_201_CREATED,
 )
 async def create_places_batch(
-    batch_data: BatchPlaceCreate, session: AsyncSession = Depends(get_async_session)
+    batch_data: BatchPlaceCreate, session: AsyncSession = Depends(get_write_session)
 ) -> BatchPlaceResponse:
     """
     Добавить несколько мест в базу данных пачкой
@@ -434,6 +877,8 @@ async def create_places_batch(
                 is_24_7=place.is_24_7,
                 overall_rating=place.overall_rating,
                 review_count=place.review_count,
+                latitude=place.latitude,
+                longitude=place.longitude,
             )
             places_response.append(place_response)
 
@@ -450,6 +895,47 @@ async def create_places_batch(
             detail=f"Ошибка при пакетном добавлении мест: {str(e)}",
         )
 
+# ----------------------------------------
+# Эндпоинт: Массовый импорт мест из файла
+# ----------------------------------------
+@app.post(
+    "/places/import",
+    response_model=ImportResponse,
+    summary="Импортировать места из файла",
+    description=(
+        "Потоковый импорт мест из NDJSON или CSV через COPY: новые места "
+        "добавляются, существующие (по url) обновляются"
+    ),
+)
+async def import_places_file(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    file: UploadFile = File(..., description="Файл NDJSON или CSV с заголовком"),
+    format: Optional[str] = Form(None, description="ndjson или csv (по умолчанию — по расширению)"),
+) -> ImportResponse:
+    """
+    Импортировать места из файла одной транзакцией
+    """
+    try:
+        # Файл читается и разбирается пачками в потоке (см. api/bulk_import.py)
+        lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        report = await import_places(lines, format or detect_format(file.filename))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при импорте мест: {str(e)}",
+        )
+
+    # Импорт писал в основную БД в обход get_write_session
+    mark_primary_reads(response)
+
+    # Индекс каталога перестраивается целиком, в фоне
+    if CATALOG_INDEX_ENABLED:
+        background_tasks.add_task(get_catalog_index().load)
+    return ImportResponse(success=True, **report)
+
 # ----------------------------------------
 # Эндпоинт: Добавить отзыв о месте (с фото)
 # ----------------------------------------
@@ -457,19 +943,21 @@ async def create_places_batch(
     "/review",
     response_model=ReviewResponse,
     summary="Добавить отзыв о месте",
-    description="Обрабатывает отзыв пользователя и создает/обновляет место в базе",
-    status_code=status.HTTP_201_CREATED
+    description="Ставит отзыв в очередь: место будет создано или обновлено воркером, "
+                "статус — GET /review/jobs/{job_id}",
+    status_code=status.HTTP_202_ACCEPTED
 )
 async def submit_review(
     url: str = Form(..., description="Ссылка на место в 2GIS"),
     place_title: str = Form(..., min_length=1, description="Название места"),
     review_text: str = Form(..., min_length=10, description="Текстовый отзыв о месте"),
     photo: Optional[UploadFile] = File(None),
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_write_session)
 ) -> ReviewResponse:
     """
-    Обрабатывает отзыв пользователя о месте с возможностью прикрепления фото.
-    Ожидает данные в формате multipart/form-data.
+    Принимает отзыв пользователя о месте с возможностью прикрепления фото.
+    Ожидает данные в формате multipart/form-data. Анализ отзыва и обновление
+    места выполняются в фоне (api/review_jobs.py).
     """
     try:
         photo_path = None
@@ -478,41 +966,143 @@ async def submit_review(
             file_extension = os.path.splitext(photo.filename)[1] if photo.filename else ".jpg"
             unique_filename = f"{uuid.uuid4()}{file_extension}"
             photo_path = f"static/photos/{unique_filename}"
-            with open(photo_path, "wb") as buffer:
+            with stage("photo_write"):
                 content = await photo.read()
-                buffer.write(content)
+                await asyncio.to_thread(_write_file, photo_path, content)
 
-        # Создаем или обновляем место на основе отзыва
-        result = await create_or_update_place_from_review(
-            session=session,
+        job = await enqueue_review(
+            session,
             url=url,
             place_title=place_title,
-            user_review=review_text,
+            review_text=review_text,
             photo_path=photo_path
         )
 
-        action_text = "создано" if result["action"] == "created" else "обновлено"
-
         return ReviewResponse(
             success=True,
-            action=result["action"],
-            place_id=result["place_id"],
-            place=result["place"],
-            message=f"Место успешно {action_text} на основе вашего отзыва"
+            job_id=job.id,
+            status=job.status,
+            message="Отзыв принят и будет обработан в ближайшее время"
         )
 
-    except ValueError as e:
-        print("Error: ", e)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ошибка обработки отзыва: {str(e)}"
-        )
     except Exception as e:
-        print("Error: ", e)
+        logger.exception("Ошибка при сохранении отзыва")
+        record_exception(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Внутренняя ошибка при обработке отзыва"
+            detail="Внутренняя ошибка при сохранении отзыва"
+        )
+
+def _write_file(path: str, content: bytes):
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+
+# ----------------------------------------
+# Эндпоинт: Статус обработки отзыва
+# ----------------------------------------
+@app.get(
+    "/review/jobs/{job_id}",
+    response_model=ReviewJobResponse,
+    summary="Статус обработки отзыва",
+    description="Состояние задачи из очереди отзывов: ожидает, обрабатывается, выполнена или завершилась ошибкой"
+)
+async def get_review_job_status(
+    job_id: str,
+    session: AsyncSession = Depends(get_read_session)
+) -> ReviewJobResponse:
+    job = await get_review_job(session, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
         )
+    return ReviewJobResponse(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        action=job.action,
+        place_id=job.place_id,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+# ----------------------------------------
+# Эндпоинты: Проверки для балансировщика и оркестратора
+# ----------------------------------------
+@app.get(
+    "/health",
+    summary="Процесс жив",
+    description="Отвечает, как только процесс принимает запросы (liveness)"
+)
+async def health():
+    return {"status": "ok"}
+
+@app.get(
+    "/ready",
+    summary="Воркер готов принимать трафик",
+    description="200 — после прогрева (соединения с БД, индекс каталога, подготовленные запросы), иначе 503"
+)
+async def ready():
+    """
+    Готовность воркера (readiness) и ход прогрева по шагам.
+    """
+    state = get_warmup_state()
+    return ORJSONResponse(
+        state.snapshot(),
+        status_code=status.HTTP_200_OK if state.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+# ----------------------------------------
+# Эндпоинт: Метрики Prometheus
+# ----------------------------------------
+@app.get(
+    "/metrics",
+    summary="Метрики в формате Prometheus",
+    description="Запросы и задержки по эндпоинтам и этапам, ошибки по типам, обращения к кэшам, задержки БД — по всем воркерам",
+    response_class=Response,
+)
+async def metrics():
+    return Response(prometheus_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+# ----------------------------------------
+# Эндпоинт: Статистика запросов к LLM
+# ----------------------------------------
+@app.get(
+    "/stats/llm",
+    summary="Статистика запросов к LLM",
+    description="Токены и задержки по эндпоинтам и типам промптов, объединение запросов и исправления ответов"
+)
+async def get_llm_stats():
+    """
+    Возвращает накопленную статистику процесса: usage — токены и задержки
+    по эндпоинтам и типам промптов (для сравнения вариантов промпта анализа),
+    coalescing — объединение одинаковых запросов, repair — исправления ответов,
+    review_workers — воркеры очереди отзывов этого процесса.
+    """
+    return {
+        "usage": get_usage_stats(),
+        "coalescing": get_coalescing_stats(),
+        "repair": get_repair_stats(),
+        "review_workers": get_review_worker_pool().stats(),
+    }
+
+# ----------------------------------------
+# Эндпоинт: Статистика работы с БД
+# ----------------------------------------
+@app.get(
+    "/stats/db",
+    summary="Статистика работы с БД",
+    description="Гистограммы задержек запросов, медленные запросы, ожидание и состояние пула соединений"
+)
+async def get_database_stats():
+    """
+    Возвращает статистику процесса: queries — задержки запросов по типу
+    оператора (мс), slow_queries — число запросов дольше DB_SLOW_QUERY_MS,
+    pool_wait — ожидание свободного соединения, pool — текущее состояние пула
+    основной БД, read_routing — реплики для чтения.
+    """
+    return {**get_db_stats(engine), "read_routing": read_router.stats()}
 
 # ----------------------------------------
 # Эндпоинт: Получить фото по полному пути (устаревший)
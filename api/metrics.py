@@ -0,0 +1,281 @@
+import bisect
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import orjson
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, generate_latest,
+    Histogram as PrometheusHistogram,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from api.config import DB_SLOW_QUERY_MS
+from api.usage import current_endpoint
+
+# --- Метрики процесса: задержки запросов к БД и ожидание соединений пула ---
+# Гистограммы с фиксированными границами корзин (в миллисекундах): запись —
+# O(log n) без хранения отдельных значений, квантили оцениваются по корзинам.
+# Запросы группируются по типу оператора (SELECT, INSERT, ...), чтобы число
+# рядов не зависело от текста запросов. Запросы дольше DB_SLOW_QUERY_MS
+# пишутся в лог api.slow_queries одной JSON-строкой.
+#
+# Те же значения и метрики запросов, этапов обработки, ошибок и кэшей
+# отдаются в формате Prometheus (GET /metrics, см. раздел ниже).
+
+# Границы корзин гистограмм задержек, мс
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Сколько символов запроса попадает в лог медленных запросов
+SLOW_QUERY_MAX_CHARS = 2000
+
+slow_query_log = logging.getLogger("api.slow_queries")
+
+_STATEMENT_TYPE_RE = re.compile(r"^\s*([A-Za-z]+)")
+
+
+class Histogram:
+    """
+    Гистограмма значений с фиксированными границами корзин.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина — выше всех границ
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Оценка квантиля: верхняя граница корзины, в которую он попал.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "avg_ms": round(self.sum / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+# --- Метрики Prometheus ---
+# При нескольких воркерах uvicorn каждый процесс пишет значения в файлы
+# каталога PROMETHEUS_MULTIPROC_DIR (переменная окружения prometheus_client),
+# а /metrics любого воркера суммирует файлы всех процессов. Каталог нужно
+# очищать перед запуском сервера. Без переменной — метрики одного процесса.
+# Переменная читается при импорте prometheus_client, поэтому .env загружается
+# раньше (api.config импортируется до этого модуля).
+
+# Границы корзин гистограмм длительности, сек
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP-запросы", ["method", "endpoint", "status"]
+)
+HTTP_REQUEST_SECONDS = PrometheusHistogram(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запроса",
+    ["method", "endpoint"], buckets=DURATION_BUCKETS,
+)
+# Этапы (записываются через api/tracing.py): analysis (анализ запроса),
+# search (поиск в БД или индексе), serialization (сборка и сериализация
+# ответа), explanation (объяснения), photo_write (сохранение фото отзыва),
+# review_analysis и upsert (обработка отзыва воркером)
+STAGE_SECONDS = PrometheusHistogram(
+    "stage_duration_seconds", "Длительность этапа обработки запроса",
+    ["endpoint", "stage"], buckets=DURATION_BUCKETS,
+)
+ERRORS = Counter("errors_total", "Ошибки по типу", ["type"])
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кэшам (hit/miss)", ["cache", "result"]
+)
+DB_QUERY_SECONDS = PrometheusHistogram(
+    "db_query_duration_seconds", "Длительность запроса к БД по типу оператора",
+    ["statement"], buckets=DURATION_BUCKETS,
+)
+DB_POOL_WAIT_SECONDS = PrometheusHistogram(
+    "db_pool_wait_seconds", "Ожидание свободного соединения пула", buckets=DURATION_BUCKETS,
+)
+
+
+def observe_stage_seconds(stage: str, seconds: float, endpoint: Optional[str] = None):
+    """
+    Учитывает длительность этапа (эндпоинт по умолчанию — текущего запроса).
+    """
+    if endpoint is None:
+        endpoint = current_endpoint.get()
+    STAGE_SECONDS.labels(endpoint, stage).observe(seconds)
+
+
+def record_error(error_type: str):
+    ERRORS.labels(error_type).inc()
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def prometheus_metrics() -> bytes:
+    """
+    Метрики в текстовом формате Prometheus (суммарно по всем процессам).
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    """
+    Удаляет файлы живых значений завершившегося процесса (режим нескольких процессов).
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+# Задержки запросов по типу оператора
+_query_latency: Dict[str, Histogram] = {}
+
+# Ожидание свободного соединения пула
+_pool_wait = Histogram()
+_pool_timeouts = 0
+_slow_queries = 0
+_query_errors = 0
+
+
+def statement_type(statement: str) -> str:
+    """
+    Тип оператора SQL по первому слову: SELECT, INSERT, UPDATE, WITH, ...
+    """
+    match = _STATEMENT_TYPE_RE.match(statement)
+    return match.group(1).upper() if match else "OTHER"
+
+
+def record_query(statement: str, parameters: Any, duration_ms: float, rowcount: Optional[int] = None):
+    """
+    Учитывает выполненный запрос; медленный запрос пишет в лог.
+    """
+    global _slow_queries
+
+    kind = statement_type(statement)
+    histogram = _query_latency.get(kind)
+    if histogram is None:
+        histogram = _query_latency[kind] = Histogram()
+    histogram.observe(duration_ms)
+    DB_QUERY_SECONDS.labels(kind).observe(duration_ms / 1000)
+
+    if duration_ms >= DB_SLOW_QUERY_MS:
+        _slow_queries += 1
+        slow_query_log.warning(orjson.dumps({
+            "event": "slow_query",
+            "duration_ms": round(duration_ms, 3),
+            "statement_type": kind,
+            "statement": " ".join(statement.split())[:SLOW_QUERY_MAX_CHARS],
+            "parameters": len(parameters) if isinstance(parameters, (list, tuple, dict)) else None,
+            "rowcount": rowcount if rowcount is not None and rowcount >= 0 else None,
+        }).decode())
+
+
+def record_pool_wait(duration_ms: float, timed_out: bool = False):
+    global _pool_timeouts
+
+    _pool_wait.observe(duration_ms)
+    DB_POOL_WAIT_SECONDS.observe(duration_ms / 1000)
+    if timed_out:
+        _pool_timeouts += 1
+        ERRORS.labels("db_pool_timeout").inc()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий ожидание свободного соединения.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            record_pool_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        record_pool_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
+def instrument_engine(engine):
+    """
+    Подключает замер задержек запросов к движку (AsyncEngine или Engine).
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        record_query(
+            statement, parameters, (time.perf_counter() - started) * 1000,
+            getattr(cursor, "rowcount", None),
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(context):
+        global _query_errors
+
+        _query_errors += 1
+        ERRORS.labels(f"db_{type(context.original_exception).__name__}").inc()
+        started = context.connection.info.get("query_started_at") if context.connection else None
+        if started:
+            started.pop()
+
+
+def get_db_stats(engine=None) -> Dict[str, Any]:
+    """
+    Гистограммы задержек запросов, ожидание пула и текущее состояние пула.
+    """
+    stats: Dict[str, Any] = {
+        "queries": {kind: histogram.snapshot() for kind, histogram in sorted(_query_latency.items())},
+        "slow_queries": _slow_queries,
+        "query_errors": _query_errors,
+        "pool_wait": _pool_wait.snapshot(),
+        "pool_timeouts": _pool_timeouts,
+    }
+    pool = getattr(engine, "sync_engine", engine).pool if engine is not None else None
+    if isinstance(pool, QueuePool):
+        stats["pool"] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+    return stats
@@ -0,0 +1,277 @@
+import hashlib
+from typing import Optional
+
+from sqlalchemy import MetaData, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from api.geo import GEO_CELL_SQL
+from api.opening_hours import open_slots
+from api.tags import TAG_ID_COLUMNS
+from api.vocabulary import CATEGORY_VALUES
+
+# --- Изменения схемы, которые не делает create_all ---
+# create_all создаёт только отсутствующие таблицы; новые столбцы, индексы,
+# функции и триггеры для уже существующей БД добавляются здесь.
+# Каждая инструкция идемпотентна — её можно выполнять повторно.
+#
+# Версия схемы — хэш DDL моделей, миграций и справочника категорий —
+# хранится в таблице schema_version. При старте воркер сравнивает её одним
+# запросом; create_all и миграции выполняются, только если схема в коде
+# изменилась (или БД новая).
+
+# Ключ advisory-блокировки: воркеры, стартующие одновременно, выполняют
+# миграции по очереди
+MIGRATIONS_LOCK_KEY = 7_240_311
+
+# Выполняются до create_all: расширения, нужные индексам моделей
+PREPARE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+]
+
+# Тело триггера: пересчёт id по каждому полю с тегами
+_SYNC_TAG_IDS = "\n        ".join(
+    f"NEW.{column} := place_tag_ids('{field}', NEW.{field});"
+    for field, column in TAG_ID_COLUMNS.items()
+)
+
+# Объединение тегов всех мест с тем же url (слияние дубликатов)
+_MERGE_DUPLICATE_TAGS = ",\n        ".join(
+    f"{field} = ARRAY(SELECT DISTINCT v FROM places AS q, unnest(q.{field}) AS v WHERE q.url = p.url)"
+    for field in TAG_ID_COLUMNS
+)
+
+MIGRATIONS = [
+    # --- Целочисленные id тегов мест ---
+    *(
+        f"ALTER TABLE places ADD COLUMN IF NOT EXISTS {column} integer[] NOT NULL DEFAULT '{{}}'"
+        for column in TAG_ID_COLUMNS.values()
+    ),
+    *(
+        f"CREATE INDEX IF NOT EXISTS ix_places_{column} ON places USING gin ({column})"
+        for column in TAG_ID_COLUMNS.values()
+    ),
+    # Фильтры идут по id тегов — индексы строковых массивов больше не нужны
+    *(f"DROP INDEX IF EXISTS ix_places_{field}" for field in TAG_ID_COLUMNS),
+    # id тегов поля; отсутствующие в словаре значения добавляются
+    """
+    CREATE OR REPLACE FUNCTION place_tag_ids(p_field text, p_values text[])
+    RETURNS integer[]
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        result integer[];
+    BEGIN
+        IF p_values IS NULL OR cardinality(p_values) = 0 THEN
+            RETURN '{}';
+        END IF;
+
+        INSERT INTO tags (field, value)
+        SELECT DISTINCT p_field, v
+        FROM unnest(p_values) AS v
+        WHERE NOT EXISTS (
+            SELECT 1 FROM tags WHERE tags.field = p_field AND tags.value = v
+        )
+        ON CONFLICT (field, value) DO NOTHING;
+
+        SELECT COALESCE(array_agg(tags.id ORDER BY tags.id), '{}') INTO result
+        FROM tags
+        WHERE tags.field = p_field AND tags.value = ANY (p_values);
+        RETURN result;
+    END
+    $$
+    """,
+    # Триггер держит массивы id в соответствии со строковыми тегами
+    f"""
+    CREATE OR REPLACE FUNCTION places_sync_tag_ids()
+    RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        {_SYNC_TAG_IDS}
+        RETURN NEW;
+    END
+    $$
+    """,
+    f"""
+    CREATE OR REPLACE TRIGGER places_sync_tag_ids
+    BEFORE INSERT OR UPDATE OF {", ".join(TAG_ID_COLUMNS)} ON places
+    FOR EACH ROW EXECUTE FUNCTION places_sync_tag_ids()
+    """,
+    # --- Полнотекстовый и нечёткий поиск по названию и описанию ---
+    """
+    ALTER TABLE places ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_places_search_vector ON places USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_places_title_trgm ON places USING gin (title gin_trgm_ops)",
+    # --- Координаты и ячейка сетки для поиска рядом ---
+    "ALTER TABLE places ADD COLUMN IF NOT EXISTS latitude double precision",
+    "ALTER TABLE places ADD COLUMN IF NOT EXISTS longitude double precision",
+    f"ALTER TABLE places ADD COLUMN IF NOT EXISTS geo_cell integer GENERATED ALWAYS AS ({GEO_CELL_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_places_geo_cell ON places (geo_cell)",
+    # --- Часы работы в виде слотов недели ---
+    "ALTER TABLE places ADD COLUMN IF NOT EXISTS open_slots smallint[]",
+    "CREATE INDEX IF NOT EXISTS ix_places_open_slots ON places USING gin (open_slots)",
+    # Объединение массивов без повторов (порядок первого вхождения) —
+    # слияние тегов места с тегами из отзыва
+    """
+    CREATE OR REPLACE FUNCTION array_union(a anyarray, b anyarray)
+    RETURNS anyarray
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT ARRAY(
+            SELECT v FROM unnest(a || b) WITH ORDINALITY AS t(v, n)
+            GROUP BY v
+            ORDER BY min(n)
+        )
+    $$
+    """,
+    # --- Уникальный url (upsert по ссылке) ---
+    # Дубликаты, записанные до появления индекса, сливаются в место с меньшим id:
+    # теги объединяются, остальные поля остаются от него
+    f"""
+    UPDATE places AS p SET
+        {_MERGE_DUPLICATE_TAGS}
+    WHERE p.id IN (SELECT min(id) FROM places GROUP BY url HAVING count(*) > 1)
+    """,
+    "DELETE FROM places AS p USING places AS q WHERE p.url = q.url AND p.id > q.id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_places_url ON places (url)",
+]
+
+# Таблица версии схемы (одна строка)
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        id smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+# Заполнение id тегов у мест, записанных до появления триггера
+BACKFILL_TAG_IDS = f"""
+    UPDATE places SET entity_types = entity_types
+    WHERE {" OR ".join(
+        f"({column} = '{{}}' AND {field} <> '{{}}')"
+        for field, column in TAG_ID_COLUMNS.items()
+    )}
+"""
+
+
+def schema_version(metadata: MetaData) -> str:
+    """
+    Версия схемы в коде: хэш DDL таблиц и индексов моделей, миграций и справочника категорий.
+    """
+    dialect = postgresql.dialect()
+    parts = [*PREPARE, SCHEMA_VERSION_TABLE]
+    for table in metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts.extend(
+            str(CreateIndex(index).compile(dialect=dialect))
+            for index in sorted(table.indexes, key=lambda index: index.name)
+        )
+    parts.extend(MIGRATIONS)
+    parts.append(BACKFILL_TAG_IDS)
+    parts.extend(f"{field}={value}" for field in TAG_ID_COLUMNS for value in CATEGORY_VALUES[field])
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+async def current_schema_version(conn: AsyncConnection) -> Optional[str]:
+    """
+    Версия схемы, записанная в БД (None — БД ещё не инициализирована).
+    """
+    exists = await conn.scalar(text("SELECT to_regclass('schema_version') IS NOT NULL"))
+    if not exists:
+        return None
+    return await conn.scalar(text("SELECT version FROM schema_version WHERE id = 1"))
+
+
+async def record_schema_version(conn: AsyncConnection, version: str):
+    """
+    Записывает версию применённой схемы (в транзакции conn).
+    """
+    await conn.exec_driver_sql(SCHEMA_VERSION_TABLE)
+    await conn.execute(
+        text(
+            """
+            INSERT INTO schema_version (id, version) VALUES (1, :version)
+            ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, applied_at = now()
+            """
+        ),
+        {"version": version},
+    )
+
+
+async def prepare_database(conn: AsyncConnection):
+    """
+    Подготавливает БД к create_all (расширения для индексов моделей).
+    Блокировка держится до конца транзакции conn — create_all и миграции
+    разных воркеров тоже не пересекаются.
+    """
+    await conn.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY}
+    )
+    for statement in PREPARE:
+        await conn.exec_driver_sql(statement)
+
+
+async def run_migrations(conn: AsyncConnection):
+    """
+    Применяет изменения схемы к существующей БД (в транзакции conn).
+    """
+    await conn.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY}
+    )
+    for statement in MIGRATIONS:
+        await conn.exec_driver_sql(statement)
+
+    # Значения из справочника получают id по порядку, до тегов из данных
+    fields, values = [], []
+    for field in TAG_ID_COLUMNS:
+        for value in CATEGORY_VALUES[field]:
+            fields.append(field)
+            values.append(value)
+    await conn.execute(
+        text(
+            """
+            INSERT INTO tags (field, value)
+            SELECT f, v
+            FROM unnest(CAST(:fields AS text[]), CAST(:values AS text[])) WITH ORDINALITY AS s(f, v, n)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM tags WHERE tags.field = s.f AND tags.value = s.v
+            )
+            ORDER BY n
+            ON CONFLICT (field, value) DO NOTHING
+            """
+        ),
+        {"fields": fields, "values": values},
+    )
+
+    await conn.exec_driver_sql(BACKFILL_TAG_IDS)
+    await backfill_open_slots(conn)
+
+
+async def backfill_open_slots(conn: AsyncConnection):
+    """
+    Разбирает часы работы мест, записанных до появления open_slots
+    (строки, которые разобрать не удалось, проверяются при каждом обновлении схемы).
+    """
+    result = await conn.execute(
+        text(
+            """
+            SELECT id, opening_hours, working_days, is_24_7 FROM places
+            WHERE open_slots IS NULL AND (opening_hours IS NOT NULL OR is_24_7)
+            """
+        )
+    )
+    updates = []
+    for place_id, opening_hours, working_days, is_24_7 in result:
+        slots = open_slots(opening_hours, working_days, is_24_7)
+        if slots is not None:
+            updates.append({"id": place_id, "slots": slots})
+    if updates:
+        await conn.execute(
+            text("UPDATE places SET open_slots = CAST(:slots AS smallint[]) WHERE id = :id"),
+            updates,
+        )
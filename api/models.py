@@ -1,8 +1,13 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, Boolean, Text, Index
+    Column, Integer, SmallInteger, String, Float, Boolean, Text, Index, DateTime, func,
+    UniqueConstraint, Computed, event
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY
+from sqlalchemy.orm import deferred
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY, JSONB, TSVECTOR
+
+from api.geo import GEO_CELL_SQL
+from api.opening_hours import open_slots
 
 # Базовый класс для моделей SQLAlchemy
 Base = declarative_base()
@@ -26,19 +31,55 @@ class Place(Base):
     best_time = Column(String(20), nullable=True)  # Лучшее время для посещения
     working_days = Column(PG_ARRAY(String), nullable=False, default=[])  # Рабочие дни
 
+    # Те же теги в виде id из таблицы tags — для поиска (заполняет триггер БД)
+    entity_type_ids = Column(PG_ARRAY(Integer), nullable=False, default=[], server_default="{}")
+    atmosphere_tag_ids = Column(PG_ARRAY(Integer), nullable=False, default=[], server_default="{}")
+    purpose_tag_ids = Column(PG_ARRAY(Integer), nullable=False, default=[], server_default="{}")
+    feature_ids = Column(PG_ARRAY(Integer), nullable=False, default=[], server_default="{}")
+
     # Дополнительные параметры
     budget_level = Column(String(20), nullable=True)  # Уровень бюджета
     opening_hours = Column(String(100), nullable=True)  # Часы работы
     is_24_7 = Column(Boolean, default=False)  # Круглосуточно ли работает
+    # Слоты недели, когда место открыто (см. api/opening_hours.py); NULL — часы неизвестны
+    open_slots = deferred(Column(PG_ARRAY(SmallInteger), nullable=True))
     overall_rating = Column(Float, default=0.0)  # Общий рейтинг
     review_count = Column(Integer, default=0)  # Количество отзывов
 
+    # Координаты и ячейка сетки для поиска рядом (см. api/geo.py), ячейку считает БД
+    latitude = Column(Float, nullable=True)  # Широта
+    longitude = Column(Float, nullable=True)  # Долгота
+    geo_cell = Column(Integer, Computed(GEO_CELL_SQL, persisted=True))  # Ячейка сетки
+
+    # Полнотекстовый индекс названия (вес A) и описания (вес B), считается БД при записи
+    # (не загружается вместе с местом — нужен только в условиях запросов)
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
     # Индексы для ускорения поиска и фильтрации
     __table_args__ = (
-        Index("ix_places_entity_types", entity_types, postgresql_using="gin"),
-        Index("ix_places_atmosphere_tags", atmosphere_tags, postgresql_using="gin"),
-        Index("ix_places_purpose_tags", purpose_tags, postgresql_using="gin"),
-        Index("ix_places_features", features, postgresql_using="gin"),
+        Index("ix_places_entity_type_ids", entity_type_ids, postgresql_using="gin"),
+        Index("ix_places_atmosphere_tag_ids", atmosphere_tag_ids, postgresql_using="gin"),
+        Index("ix_places_purpose_tag_ids", purpose_tag_ids, postgresql_using="gin"),
+        Index("ix_places_feature_ids", feature_ids, postgresql_using="gin"),
+        # Полнотекстовый поиск и нечёткий поиск по названию (pg_trgm)
+        Index("ix_places_search_vector", search_vector, postgresql_using="gin"),
+        Index(
+            "ix_places_title_trgm", title,
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        # Уникальная ссылка на источник: upsert по url
+        Index("ux_places_url", url, unique=True),
+        # Фильтр "открыто сейчас"
+        Index("ix_places_open_slots", open_slots, postgresql_using="gin"),
+        # Поиск рядом: диапазоны ячеек сетки
+        Index("ix_places_geo_cell", geo_cell),
         # Индекс для budget_level (строка)
         Index("ix_places_budget_level", budget_level),
         # Индексы для сортировки по рейтингу и количеству отзывов
@@ -73,4 +114,85 @@ class Place(Base):
             "is_24_7": self.is_24_7,
             "overall_rating": self.overall_rating,
             "review_count": self.review_count,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
         }
+
+
+# Слоты часов работы пересчитываются при каждой записи места через ORM
+@event.listens_for(Place, "before_insert")
+@event.listens_for(Place, "before_update")
+def _sync_open_slots(mapper, connection, place):
+    place.open_slots = open_slots(place.opening_hours, place.working_days, place.is_24_7)
+
+
+# Модель "Тег" (Tag) — словарь значений тегов мест
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)  # Идентификатор тега
+    field = Column(String(32), nullable=False)  # Поле места: entity_types, features, ...
+    value = Column(Text, nullable=False)  # Значение тега
+
+    __table_args__ = (
+        UniqueConstraint("field", "value", name="uq_tags_field_value"),
+    )
+
+    def __repr__(self):
+        """Строковое представление объекта Tag."""
+        return f"<Tag(id={self.id}, field='{self.field}', value='{self.value}')>"
+
+
+# Модель "История диалога" (Conversation) — общая для всех воркеров
+class Conversation(Base):
+    __tablename__ = "conversations"
+
+    id = Column(String(128), primary_key=True)  # conversation_id клиента
+    messages = Column(JSONB, nullable=False, default=list)  # Последние сообщения диалога
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )  # Время последнего обращения (для вытеснения по простою)
+
+    __table_args__ = (
+        Index("ix_conversations_updated_at", updated_at),
+    )
+
+    def __repr__(self):
+        """Строковое представление объекта Conversation."""
+        return f"<Conversation(id='{self.id}', messages={len(self.messages or [])})>"
+
+
+# Модель "Задача обработки отзыва" (ReviewJob) — очередь отзывов для воркеров
+class ReviewJob(Base):
+    __tablename__ = "review_jobs"
+
+    id = Column(String(36), primary_key=True)  # Идентификатор задачи (UUID)
+    status = Column(String(16), nullable=False, default="pending")  # pending, processing, done, failed
+    url = Column(Text, nullable=False)  # Ссылка на место в 2GIS
+    place_title = Column(String(255), nullable=False)  # Название места
+    review_text = Column(Text, nullable=False)  # Текст отзыва
+    photo_path = Column(Text)  # Сохранённое фото (если прикреплено)
+    attempts = Column(Integer, nullable=False, default=0)  # Сколько раз задача бралась в работу
+    run_after = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )  # Не брать в работу раньше этого времени (отложенный повтор)
+    locked_at = Column(DateTime(timezone=True))  # Когда воркер взял задачу
+    action = Column(String(16))  # Результат: created или updated
+    place_id = Column(Integer)  # Созданное или обновлённое место
+    error = Column(Text)  # Последняя ошибка обработки
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        # Очередь: ожидающие задачи в порядке готовности
+        Index(
+            "ix_review_jobs_pending", run_after,
+            postgresql_where=status.in_(("pending", "processing")),
+        ),
+    )
+
+    def __repr__(self):
+        """Строковое представление объекта ReviewJob."""
+        return f"<ReviewJob(id='{self.id}', status='{self.status}', attempts={self.attempts})>"
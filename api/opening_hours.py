@@ -0,0 +1,115 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from api.config import OPENING_HOURS_UTC_OFFSET
+
+# --- Часы работы мест: разбор и недельная сетка ---
+# opening_hours хранится свободным текстом ("12:00-22:00", "10:00 до 24:00",
+# "12:00-05:00"), working_days — списком дней ("пн", "вт", ...; пустой — каждый
+# день), is_24_7 — отдельным флагом. При записи места всё это переводится в
+# номера открытых слотов недели (по SLOT_MINUTES минут, от понедельника 00:00):
+# места, открытые в момент t, — это места, у которых есть слот t. Столбец
+# places.open_slots индексирован GIN, поэтому фильтр "открыто сейчас"
+# выполняется в запросе, без разбора строк.
+
+# Длина слота недельной сетки, минут
+SLOT_MINUTES = 15
+
+MINUTES_PER_DAY = 24 * 60
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+
+# Интервал "ЧЧ:ММ-ЧЧ:ММ" (также "ЧЧ:ММ до ЧЧ:ММ", "ЧЧ.ММ – ЧЧ.ММ")
+_INTERVAL_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*(?:-|–|—|до)\s*(\d{1,2})[:.](\d{2})")
+_ALWAYS_OPEN_RE = re.compile(r"круглосуточно|24\s*/\s*7")
+
+# Первые буквы дня недели -> номер дня (0 — понедельник)
+_DAY_PREFIXES = {
+    "пн": 0, "пон": 0,
+    "вт": 1, "вто": 1,
+    "ср": 2, "сре": 2,
+    "чт": 3, "чет": 3,
+    "пт": 4, "пят": 4,
+    "сб": 5, "суб": 5,
+    "вс": 6, "вос": 6,
+}
+
+# Часовой пояс мест для "открыто сейчас" (каталог — одного города)
+VENUE_TIMEZONE = timezone(timedelta(hours=OPENING_HOURS_UTC_OFFSET))
+
+
+def parse_daily_intervals(opening_hours: Optional[str]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Интервалы работы в течение дня в минутах от полуночи: [(начало, конец)].
+    Конец может быть больше суток (работа после полуночи). None — если
+    строку не удалось разобрать.
+    """
+    if not opening_hours:
+        return None
+    text = opening_hours.lower()
+    if _ALWAYS_OPEN_RE.search(text):
+        return [(0, MINUTES_PER_DAY)]
+
+    intervals = []
+    for start_h, start_m, end_h, end_m in _INTERVAL_RE.findall(text):
+        start = int(start_h) * 60 + int(start_m)
+        end = int(end_h) * 60 + int(end_m)
+        if start > MINUTES_PER_DAY or end > MINUTES_PER_DAY:
+            continue
+        if end <= start:
+            # "00:00-00:00" — круглые сутки, "12:00-05:00" — до утра следующего дня
+            end += MINUTES_PER_DAY
+        intervals.append((start, min(end, start + MINUTES_PER_DAY)))
+    return intervals or None
+
+
+def parse_working_days(working_days: Optional[List[str]]) -> List[int]:
+    """
+    Номера рабочих дней (0 — понедельник). Пустой список — работает каждый день.
+    """
+    days = set()
+    for day in working_days or []:
+        day = day.strip().lower()
+        number = _DAY_PREFIXES.get(day[:3], _DAY_PREFIXES.get(day[:2]))
+        if number is not None:
+            days.add(number)
+    return sorted(days) or list(range(7))
+
+
+def open_slots(
+    opening_hours: Optional[str],
+    working_days: Optional[List[str]] = None,
+    is_24_7: Optional[bool] = False,
+) -> Optional[List[int]]:
+    """
+    Номера слотов недели, в начале которых место открыто.
+    None — часы работы неизвестны.
+    """
+    if is_24_7:
+        return list(range(SLOTS_PER_WEEK))
+    intervals = parse_daily_intervals(opening_hours)
+    if intervals is None:
+        return None
+
+    slots = set()
+    for day in parse_working_days(working_days):
+        for start, end in intervals:
+            first = -(-start // SLOT_MINUTES)  # первый слот, начинающийся не раньше открытия
+            last = -(-end // SLOT_MINUTES)     # первый слот, начинающийся не раньше закрытия
+            for slot in range(first, last):
+                slots.add((day * SLOTS_PER_DAY + slot) % SLOTS_PER_WEEK)
+    return sorted(slots)
+
+
+def slot_at(moment: Optional[datetime] = None) -> int:
+    """
+    Слот недели для момента moment (по умолчанию — сейчас). Время без
+    часового пояса считается местным временем мест.
+    """
+    if moment is None:
+        moment = datetime.now(VENUE_TIMEZONE)
+    elif moment.tzinfo is not None:
+        moment = moment.astimezone(VENUE_TIMEZONE)
+    minutes = moment.hour * 60 + moment.minute
+    return moment.weekday() * SLOTS_PER_DAY + minutes // SLOT_MINUTES
@@ -0,0 +1,110 @@
+import base64
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from api.config import GEO_MAX_RADIUS_KM
+from api.geo import GeoQuery
+from api.opening_hours import SLOTS_PER_WEEK
+from api.vocabulary import COMPACT_DECODE, COMPACT_ENCODE, COMPACT_FIELDS
+
+# --- Курсор для постраничной выдачи рекомендаций ---
+# Курсор непрозрачен для клиента: это base64 от JSON с предпочтениями
+# (в компактных кодах, см. api/vocabulary.py), текстом запроса для
+# текстового поиска, точкой поиска рядом, слотом "открыто в" и ключом
+# последнего выданного места (релевантность, рейтинг, количество отзывов, id).
+# Следующая страница продолжается по этому ключу (keyset pagination):
+# без повторного анализа запроса и без OFFSET.
+
+CURSOR_VERSION = 1
+
+# Фильтр поиска -> ключ в курсоре
+_FILTER_KEYS = {"text_query": "q", "near": "g", "open_slot": "o"}
+
+# Ключ сортировки места: (relevance_score, overall_rating, review_count, id)
+SortKey = Tuple[float, float, int, int]
+
+
+def sort_key(place: Dict[str, Any]) -> SortKey:
+    """
+    Ключ сортировки места из результата поиска.
+    """
+    return (
+        float(place["relevance_score"]),
+        float(place.get("overall_rating") or 0.0),
+        int(place.get("review_count") or 0),
+        int(place["id"]),
+    )
+
+
+def encode_cursor(
+    preferences: Dict[str, Any],
+    last_place: Dict[str, Any],
+    filters: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Курсор следующей страницы после места last_place; filters — фильтры
+    поиска (аргументы search_places_advanced), с которыми строилась выдача.
+    """
+    compact = {}
+    for field, (key, _) in COMPACT_FIELDS.items():
+        value = preferences.get(field)
+        codes = COMPACT_ENCODE[field]
+        if isinstance(value, list):
+            compact[key] = [codes[item] for item in value if item in codes]
+        else:
+            compact[key] = codes.get(value)
+
+    payload = {"v": CURSOR_VERSION, "p": compact, "k": list(sort_key(last_place))}
+    for name, key in _FILTER_KEYS.items():
+        value = (filters or {}).get(name)
+        if value is not None:
+            payload[key] = list(value) if isinstance(value, GeoQuery) else value
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Dict[str, Any], SortKey, Dict[str, Any]]:
+    """
+    Разбирает курсор: возвращает (предпочтения, ключ последнего места, фильтры поиска).
+    Бросает ValueError, если курсор повреждён или устарел.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload.get("v") != CURSOR_VERSION:
+            raise ValueError("неизвестная версия курсора")
+
+        preferences: Dict[str, Any] = {}
+        for field, (key, _) in COMPACT_FIELDS.items():
+            value = payload["p"].get(key)
+            codes = COMPACT_DECODE[field]
+            if isinstance(value, list):
+                preferences[field] = [codes[code] for code in value]
+            else:
+                preferences[field] = codes[value] if value is not None else None
+
+        relevance, rating, review_count, place_id = payload["k"]
+        after = (float(relevance), float(rating), int(review_count), int(place_id))
+
+        filters: Dict[str, Any] = {}
+        if payload.get("q") is not None:
+            if not isinstance(payload["q"], str):
+                raise ValueError("текст запроса должен быть строкой")
+            filters["text_query"] = payload["q"]
+        if payload.get("g") is not None:
+            near = GeoQuery(*map(float, payload["g"]))
+            # Те же границы, что и у фильтров запроса (NaN не проходит сравнения)
+            if not -90 <= near.lat <= 90 or not -180 <= near.lon <= 180:
+                raise ValueError("координаты вне допустимого диапазона")
+            if not 0 < near.radius_km <= GEO_MAX_RADIUS_KM:
+                raise ValueError("радиус поиска вне допустимого диапазона")
+            filters["near"] = near
+        if payload.get("o") is not None:
+            open_slot = int(payload["o"])
+            if not 0 <= open_slot < SLOTS_PER_WEEK:
+                raise ValueError("слот недели вне допустимого диапазона")
+            filters["open_slot"] = open_slot
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Некорректный курсор: {e}")
+
+    return preferences, after, filters
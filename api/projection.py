@@ -0,0 +1,75 @@
+from typing import Any, Collection, Dict, List, Mapping, Optional
+
+from sqlalchemy import Column
+
+from api.models import Place
+
+# --- Проекция результатов поиска ---
+# Поиск загружает не объекты Place, а только нужные столбцы кортежами.
+# Тяжёлые текстовые поля (фото может быть base64, описание — длинным)
+# читаются, только если клиент их запросил. Ответ собирается из словарей
+# и сериализуется напрямую, без повторной валидации Pydantic; параметр
+# fields позволяет клиенту оставить в карточках только нужные поля.
+
+# Поля места в результатах поиска (как в Place.to_dict)
+PLACE_FIELDS = (
+    "id", "title", "url", "photo", "description",
+    "entity_types", "atmosphere_tags", "purpose_tags", "features",
+    "best_time", "working_days", "budget_level", "opening_hours", "is_24_7",
+    "overall_rating", "review_count", "latitude", "longitude",
+)
+
+# Поля-списки: NULL в БД отдаётся пустым списком
+_LIST_FIELDS = ("entity_types", "atmosphere_tags", "purpose_tags", "features", "working_days")
+
+# Тяжёлые поля: загружаются, только если запрошены
+HEAVY_FIELDS = ("photo", "description")
+
+
+def place_columns(fields: Optional[Collection[str]] = None) -> List[Column]:
+    """
+    Столбцы places для загрузки: все поля места, кроме тяжёлых, не вошедших в fields
+    (fields=None — загружать всё).
+    """
+    return [
+        Place.__table__.c[field]
+        for field in PLACE_FIELDS
+        if fields is None or field not in HEAVY_FIELDS or field in fields
+    ]
+
+
+def place_from_row(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Словарь места из строки результата (те же значения по умолчанию, что в Place.to_dict).
+    """
+    place = {field: row[field] for field in PLACE_FIELDS if field in row}
+    for field in _LIST_FIELDS:
+        if field in place:
+            place[field] = place[field] or []
+    if "best_time" in place:
+        place["best_time"] = place["best_time"] or ""
+    return place
+
+
+def match_details(place: Mapping[str, Any], preferences: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Детализация совпадений места с предпочтениями по категориям.
+    """
+    def matched(field: str) -> List[str]:
+        wanted = preferences.get(field) or []
+        return [value for value in place.get(field) or [] if value in wanted]
+
+    return {
+        "entity_types_match": matched("entity_types"),
+        "atmosphere_match": matched("atmosphere_tags"),
+        "purpose_match": matched("purpose_tags"),
+        "budget_match": place.get("budget_level") == preferences.get("budget_level"),
+        "features_match": matched("features"),
+    }
+
+
+def project(place: Dict[str, Any], fields: Collection[str]) -> Dict[str, Any]:
+    """
+    Оставляет в карточке места только поля fields.
+    """
+    return {field: place.get(field) for field in fields}
@@ -0,0 +1,224 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.cache import normalize_prompt
+from api.extractor import DEFAULT_BEST_TIME, extract_preferences
+from api.vocabulary import (
+    CATEGORY_VALUES,
+    COMPACT_DECODE,
+    COMPACT_FIELDS,
+    LIST_FIELDS,
+    SCALAR_FIELDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Исправление ответов LLM вместо отказа ---
+# Недопустимое значение последовательно пробуется сопоставить:
+#   1. точное совпадение со списком допустимых значений;
+#   2. совпадение после нормализации (регистр, ё, пунктуация);
+#   3. ближайшее значение по расстоянию Левенштейна (не дальше MAX_EDIT_RATIO);
+#   4. синонимы из словаря локального извлекателя ("встреча" -> "друзья").
+# Если ничего не подошло, значение отбрасывается.
+
+# Допустимая доля правок относительно длины значения
+MAX_EDIT_RATIO = 0.34
+
+# Предвычисленные индексы по полям
+_ALLOWED = {field: frozenset(values) for field, values in CATEGORY_VALUES.items()}
+_NORMALIZED = {
+    field: {normalize_prompt(value): value for value in values}
+    for field, values in CATEGORY_VALUES.items()
+}
+_BY_LENGTH: Dict[str, Dict[int, List[Tuple[str, str]]]] = {}
+for _field, _index in _NORMALIZED.items():
+    for _normalized, _value in _index.items():
+        _BY_LENGTH.setdefault(_field, {}).setdefault(len(_normalized), []).append(
+            (_normalized, _value)
+        )
+
+# Счётчики исправлений (повторы и отказы считает вызывающий код)
+REPAIR_STATS = {
+    "responses": 0,        # Проверено ответов
+    "repaired": 0,         # Ответов, потребовавших исправлений
+    "values_mapped": 0,    # Значений, сопоставленных с допустимыми
+    "values_dropped": 0,   # Значений, отброшенных как неисправимые
+    "fields_dropped": 0,   # Лишних полей, удалённых из ответа
+    "retries": 0,          # Повторных запросов к LLM
+    "failures": 0,         # Ответов, которые не удалось исправить
+}
+
+
+def get_repair_stats() -> Dict[str, int]:
+    """
+    Возвращает счётчики исправлений ответов LLM.
+    """
+    return dict(REPAIR_STATS)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Левенштейна между строками; если оно больше limit,
+    возвращает limit + 1 (вычисление прерывается досрочно).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def _closest(field: str, normalized: str) -> Optional[str]:
+    """
+    Ищет ближайшее допустимое значение поля по расстоянию Левенштейна.
+    """
+    limit = max(1, int(len(normalized) * MAX_EDIT_RATIO))
+    best, best_distance = None, limit + 1
+    for length in range(len(normalized) - limit, len(normalized) + limit + 1):
+        for candidate, value in _BY_LENGTH[field].get(length, ()):
+            distance = edit_distance(normalized, candidate, best_distance - 1)
+            if distance < best_distance:
+                best, best_distance = value, distance
+    return best
+
+
+def map_value(field: str, value: Any) -> List[str]:
+    """
+    Сопоставляет значение с допустимыми значениями поля.
+    Возвращает список подходящих значений (пустой — если не подошло ничего).
+    """
+    if not isinstance(value, str):
+        return []
+    if value in _ALLOWED[field]:
+        return [value]
+
+    normalized = normalize_prompt(value)
+    if normalized in _NORMALIZED[field]:
+        return [_NORMALIZED[field][normalized]]
+
+    closest = _closest(field, normalized)
+    if closest is not None:
+        return [closest]
+
+    # best_time локальный извлекатель заполняет всегда, синонимы тут не помогут
+    if field != "best_time":
+        mapped = extract_preferences(value)[0].get(field)
+        if isinstance(mapped, list):
+            return mapped
+        if mapped:
+            return [mapped]
+    return []
+
+
+def decode_compact_response(response_data: Any) -> Any:
+    """
+    Расшифровывает ответ на компактный промпт ({"e": ["E2"], "t": "T3", ...})
+    в обычную структуру категорий. Нераспознанные коды передаются как есть —
+    их сопоставит repair_llm_response (модель иногда пишет значение, а не код).
+    """
+    if not isinstance(response_data, dict):
+        return response_data
+
+    decoded: Dict[str, Any] = {}
+    for field, (key, _) in COMPACT_FIELDS.items():
+        raw = response_data.get(key, response_data.get(field))
+        codes = COMPACT_DECODE[field]
+
+        if isinstance(raw, list):
+            decoded[field] = [
+                codes.get(item.strip().upper(), item) if isinstance(item, str) else item
+                for item in raw
+            ]
+        elif isinstance(raw, str):
+            decoded[field] = codes.get(raw.strip().upper(), raw)
+        else:
+            decoded[field] = raw
+    return decoded
+
+
+def repair_llm_response(response_data: Any) -> Dict[str, Any]:
+    """
+    Приводит ответ LLM к допустимой структуре: удаляет лишние поля,
+    исправляет типы и сопоставляет значения с допустимыми (см. map_value).
+    Бросает ValueError, только если ответ вообще не является JSON-объектом.
+    """
+    if not isinstance(response_data, dict):
+        raise ValueError(f"Ответ LLM не является JSON-объектом: {type(response_data)}")
+
+    REPAIR_STATS["responses"] += 1
+    changes = 0
+    repaired: Dict[str, Any] = {}
+
+    for field in LIST_FIELDS:
+        raw = response_data.get(field)
+        if raw is None:
+            raw = []
+        elif not isinstance(raw, list):
+            raw = [raw]
+            changes += 1
+
+        values: List[str] = []
+        for item in raw:
+            mapped = map_value(field, item)
+            if mapped != [item]:
+                changes += 1
+                if mapped:
+                    REPAIR_STATS["values_mapped"] += 1
+                else:
+                    REPAIR_STATS["values_dropped"] += 1
+            for value in mapped:
+                if value not in values:
+                    values.append(value)
+        repaired[field] = values
+
+    for field in SCALAR_FIELDS:
+        raw = response_data.get(field)
+        if isinstance(raw, list):
+            raw = raw[0] if raw else None
+            changes += 1
+
+        if raw in (None, "", "null"):
+            value = None
+        else:
+            mapped = map_value(field, raw)
+            value = mapped[0] if mapped else None
+            if value != raw:
+                changes += 1
+                if value is None:
+                    REPAIR_STATS["values_dropped"] += 1
+                else:
+                    REPAIR_STATS["values_mapped"] += 1
+
+        # best_time не может быть пустым
+        if field == "best_time" and value is None:
+            value = DEFAULT_BEST_TIME
+            changes += raw != DEFAULT_BEST_TIME
+        repaired[field] = value
+
+    extra_fields = set(response_data) - set(LIST_FIELDS) - set(SCALAR_FIELDS)
+    if extra_fields:
+        REPAIR_STATS["fields_dropped"] += len(extra_fields)
+        changes += len(extra_fields)
+
+    # Порядок полей — как в справочнике
+    repaired = {field: repaired[field] for field in CATEGORY_VALUES}
+
+    if changes:
+        REPAIR_STATS["repaired"] += 1
+        logger.info("Ответ LLM исправлен (%d правок)", changes)
+        logger.debug("Исправленный ответ LLM: %s -> %s", response_data, repaired)
+
+    return repaired
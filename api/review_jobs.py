@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import (
+    REVIEW_WORKERS,
+    REVIEW_MAX_ATTEMPTS,
+    REVIEW_RETRY_BASE_DELAY,
+    REVIEW_RETRY_MAX_DELAY,
+    REVIEW_POLL_INTERVAL,
+    REVIEW_JOB_LOCK_TIMEOUT,
+)
+from api.crud import create_or_update_place_from_review
+from api.models import ReviewJob
+from api.tracing import end_trace, log_trace, record_exception, start_trace
+
+logger = logging.getLogger(__name__)
+
+# --- Очередь обработки отзывов ---
+# POST /review только сохраняет отзыв в таблицу review_jobs и сразу отвечает
+# 202 с идентификатором задачи. Пул асинхронных воркеров забирает задачи
+# запросом UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED): несколько
+# воркеров (и несколько процессов) не мешают друг другу и не берут одну задачу
+# дважды. Воркер вызывает LLM, объединяет категории с местом (upsert по url)
+# и отмечает задачу выполненной; при ошибке задача откладывается с
+# экспоненциальной задержкой, после REVIEW_MAX_ATTEMPTS попыток — failed.
+# Задача, взятая воркером, который упал, возвращается в очередь через
+# REVIEW_JOB_LOCK_TIMEOUT секунд. Повторная обработка безопасна: upsert
+# объединяет теги, а не дублирует место.
+#
+# Число воркеров — одновременно и предел параллельных запросов к LLM от очереди.
+# Каждая задача трассируется как отдельный запрос (этапы review_analysis и
+# upsert, request_id — id задачи) и пишется в лог api.requests.
+
+
+async def enqueue_review(
+    session: AsyncSession,
+    url: str,
+    place_title: str,
+    review_text: str,
+    photo_path: Optional[str] = None,
+) -> ReviewJob:
+    """
+    Ставит отзыв в очередь обработки и будит воркеры этого процесса.
+    """
+    job = ReviewJob(
+        id=str(uuid.uuid4()),
+        status="pending",
+        url=url,
+        place_title=place_title,
+        review_text=review_text,
+        photo_path=photo_path,
+        attempts=0,
+    )
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+
+    if _pool is not None:
+        _pool.notify()
+    return job
+
+
+async def get_review_job(session: AsyncSession, job_id: str) -> Optional[ReviewJob]:
+    """
+    Задача обработки отзыва по идентификатору.
+    """
+    return await session.get(ReviewJob, job_id)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Задержка перед повтором после attempts неудачных попыток (секунд).
+    """
+    return min(REVIEW_RETRY_BASE_DELAY * 2 ** (attempts - 1), REVIEW_RETRY_MAX_DELAY)
+
+
+async def claim_review_job(session: AsyncSession) -> Optional[ReviewJob]:
+    """
+    Берёт в работу одну готовую задачу (или задачу упавшего воркера).
+    None — очередь пуста.
+    """
+    now = func.now()
+    candidate = (
+        select(ReviewJob.id)
+        .where(or_(
+            and_(ReviewJob.status == "pending", ReviewJob.run_after <= now),
+            and_(
+                ReviewJob.status == "processing",
+                ReviewJob.locked_at < now - literal(timedelta(seconds=REVIEW_JOB_LOCK_TIMEOUT)),
+            ),
+        ))
+        .order_by(ReviewJob.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.scalars(
+        update(ReviewJob)
+        .where(ReviewJob.id == candidate)
+        .values(status="processing", attempts=ReviewJob.attempts + 1, locked_at=now)
+        .returning(ReviewJob)
+        .execution_options(synchronize_session=False)
+    )
+    job = result.first()
+    await session.commit()
+    return job
+
+
+async def _finish_job(session: AsyncSession, job_id: str, **values: Any):
+    await session.execute(
+        update(ReviewJob)
+        .where(ReviewJob.id == job_id)
+        .values(locked_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+# --- Пул воркеров ---
+
+class ReviewWorkerPool:
+    """
+    Асинхронные воркеры очереди отзывов в процессе приложения.
+    """
+
+    def __init__(self, workers: int = REVIEW_WORKERS, session_maker=None):
+        self.workers = workers
+        self._session_maker = session_maker
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.errors = 0
+
+    def start(self):
+        if self._session_maker is None:
+            from api.database import async_session_maker
+            self._session_maker = async_session_maker
+        for number in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"review-worker-{number}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def notify(self):
+        """
+        Будит ожидающие воркеры (новая задача в очереди).
+        """
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                async with self._session_maker() as session:
+                    job = await claim_review_job(session)
+            except Exception as e:
+                logger.exception("Ошибка при получении задачи из очереди отзывов: %s", e)
+                job = None
+
+            if job is None:
+                # Ждём новую задачу этого процесса или следующий опрос таблицы
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), REVIEW_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            trace, token = start_trace("JOB", "review_jobs", request_id=job.id)
+            try:
+                status_code = await self._process(job)
+            except Exception as e:
+                # Не удалось записать результат (ошибка БД): воркер продолжает
+                # работу, задача остаётся processing и вернётся в очередь
+                # через REVIEW_JOB_LOCK_TIMEOUT секунд
+                self.errors += 1
+                logger.exception("Ошибка при завершении задачи %s: %s", job.id, e)
+                record_exception(e)
+                status_code = 500
+            finally:
+                end_trace(token)
+            log_trace(trace, "review_job", status_code)
+
+    async def _process(self, job: ReviewJob) -> int:
+        """
+        Обрабатывает задачу; возвращает код для лога: 200 — готово, 500 — ошибка.
+        """
+        async with self._session_maker() as session:
+            if job.attempts > REVIEW_MAX_ATTEMPTS:
+                # Задача упавшего воркера, попытки исчерпаны
+                self.failed += 1
+                await _finish_job(session, job.id, status="failed")
+                return 500
+
+            try:
+                result = await create_or_update_place_from_review(
+                    session=session,
+                    url=job.url,
+                    place_title=job.place_title,
+                    user_review=job.review_text,
+                    photo_path=job.photo_path,
+                )
+            except Exception as e:
+                await session.rollback()
+                logger.warning("Ошибка обработки отзыва %s (попытка %d): %r", job.id, job.attempts, e)
+                record_exception(e)
+                if job.attempts >= REVIEW_MAX_ATTEMPTS:
+                    self.failed += 1
+                    await _finish_job(session, job.id, status="failed", error=str(e))
+                else:
+                    self.retried += 1
+                    await _finish_job(
+                        session, job.id,
+                        status="pending",
+                        error=str(e),
+                        run_after=func.now() + literal(timedelta(seconds=retry_delay(job.attempts))),
+                    )
+                return 500
+
+            await _finish_job(
+                session, job.id,
+                status="done",
+                action=result["action"],
+                place_id=result["place_id"],
+                error=None,
+            )
+            self.processed += 1
+            return 200
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+_pool: Optional[ReviewWorkerPool] = None
+
+
+def get_review_worker_pool() -> ReviewWorkerPool:
+    """
+    Возвращает пул воркеров очереди отзывов этого процесса (создаётся лениво).
+    """
+    global _pool
+
+    if _pool is None:
+        _pool = ReviewWorkerPool()
+    return _pool
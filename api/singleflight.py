@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# --- Объединение одинаковых одновременных запросов (single-flight) ---
+
+
+class SingleFlight:
+    """
+    Выполняет не более одного вызова на ключ одновременно: пока вызов
+    идёт, остальные вызовы с тем же ключом ждут его результат
+    (или исключение), а не запускают свой.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0          # Всего обращений
+        self.executed = 0       # Реально выполненных вызовов
+        self.deduplicated = 0   # Обращений, получивших чужой результат
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Возвращает результат func(), разделяя его между одновременными
+        вызовами с одинаковым key.
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.deduplicated += 1
+
+        # shield: отмена одного ожидающего (например, клиент отключился)
+        # не должна отменять общий вызов для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """
+        Убирает завершённый вызов из списка выполняющихся.
+        """
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Забираем исключение, чтобы оно не попало в лог как необработанное,
+        # если все ожидающие уже отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает статистику объединения запросов.
+        """
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+            "dedup_ratio": self.deduplicated / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,105 @@
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import TAG_DICTIONARY_TTL
+from api.models import Tag
+
+# --- Словарь тегов: строковые значения <-> целочисленные id ---
+# Теги мест хранятся в places двумя способами: строками (для выдачи
+# пользователю) и массивами id из таблицы tags (для поиска). Массивы id
+# заполняет триггер БД (см. api/migrations.py), поэтому они всегда
+# соответствуют строковым тегам, как бы место ни было записано.
+
+# Поле со строковыми тегами -> поле с id тегов
+TAG_ID_COLUMNS = {
+    "entity_types": "entity_type_ids",
+    "atmosphere_tags": "atmosphere_tag_ids",
+    "purpose_tags": "purpose_tag_ids",
+    "features": "feature_ids",
+}
+
+
+def tag_idf(total: int, df: int) -> float:
+    """
+    Вес редкости тега (сглаженный IDF): чем меньше мест с тегом, тем он весомее.
+    total — всего мест, df — мест с тегом.
+    """
+    return math.log((total + 1) / (df + 1)) + 1.0
+
+
+class TagDictionary:
+    """
+    Кэш таблицы tags в памяти процесса вместе с числом мест по каждому тегу
+    (для IDF). Перечитывается не чаще раза в TAG_DICTIONARY_TTL секунд.
+    """
+
+    def __init__(self, ttl: float = TAG_DICTIONARY_TTL):
+        self.ttl = ttl
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._df: Dict[int, int] = {}
+        self.total = 0
+        self.loaded_at: Optional[float] = None
+
+    async def ensure_loaded(self, session: AsyncSession):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            await self.load(session)
+
+    async def load(self, session: AsyncSession):
+        """
+        Загружает словарь тегов и частоты тегов по местам.
+        """
+        result = await session.execute(select(Tag.id, Tag.field, Tag.value))
+        ids = {(field, value): tag_id for tag_id, field, value in result}
+
+        columns = " || ".join(TAG_ID_COLUMNS.values())
+        result = await session.execute(
+            text(
+                f"""
+                SELECT tag_id, count(*) FROM (
+                    SELECT unnest({columns}) AS tag_id FROM places
+                ) AS t
+                GROUP BY tag_id
+                """
+            )
+        )
+        df = dict(result.all())
+        total = (await session.execute(text("SELECT count(*) FROM places"))).scalar_one()
+
+        self._ids, self._df, self.total = ids, df, total
+        self.loaded_at = time.monotonic()
+
+    def weights(self, field: str, values: List[str], use_idf: bool) -> Tuple[List[int], List[float], float]:
+        """
+        Для запрошенных значений поля возвращает (id тегов, их веса, сумму весов
+        всех запрошенных значений). Сумма включает и неизвестные значения —
+        совпасть они не могут, но долю совпадений уменьшают.
+        """
+        ids, weights, total = [], [], 0.0
+        for value in dict.fromkeys(values):
+            tag_id = self._ids.get((field, value))
+            df = self._df.get(tag_id, 0) if tag_id is not None else 0
+            weight = tag_idf(self.total, df) if use_idf else 1.0
+            total += weight
+            if tag_id is not None:
+                ids.append(tag_id)
+                weights.append(weight)
+        return ids, weights, total
+
+
+# --- Словарь процесса ---
+_dictionary: Optional[TagDictionary] = None
+
+
+def get_tag_dictionary() -> TagDictionary:
+    """
+    Возвращает словарь тегов текущего процесса (создаётся лениво).
+    """
+    global _dictionary
+
+    if _dictionary is None:
+        _dictionary = TagDictionary()
+    return _dictionary
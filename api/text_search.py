@@ -0,0 +1,101 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, cast, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from api.cache import normalize_prompt
+from api.config import TEXT_SEARCH_MAX_HITS
+from api.extractor import is_category_word
+from api.models import Place
+
+# --- Полнотекстовый и нечёткий поиск по названию и описанию ---
+# Запрос пользователя сопоставляется с местами двумя способами:
+#   1. полнотекстовый поиск (русская морфология) по search_vector —
+#      заголовок с весом A, описание с весом B; GIN-индекс;
+#   2. нечёткое совпадение слов запроса с названием (pg_trgm, word_similarity) —
+#      находит заведение, названное прямо ("Латук", "Blanc"), даже с опечаткой;
+#      GIN-индекс с gin_trgm_ops.
+# Оба условия проверяются по индексам — последовательного сканирования нет.
+
+# Конфигурация полнотекстового поиска
+TEXT_SEARCH_CONFIG = "russian"
+
+# Слова короче этого в поиске не участвуют
+MIN_TOKEN_LEN = 3
+
+# Не больше стольких слов запроса
+MAX_TOKENS = 8
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# id места -> (текстовая релевантность 0..1, совпало ли название)
+TextHits = Dict[int, Tuple[float, bool]]
+
+
+def query_tokens(text: Optional[str]) -> Tuple[List[str], List[str]]:
+    """
+    Слова запроса для поиска: (все значимые слова — для полнотекстового поиска,
+    слова для поиска по названию). Слова, распознанные как категории
+    ("кафе", "тихий"), по названию не ищутся — их учитывают теги.
+    """
+    if not text:
+        return [], []
+    words = _TOKEN_RE.findall(normalize_prompt(text, strip_stopwords=True))
+    tokens = list(dict.fromkeys(word for word in words if len(word) >= MIN_TOKEN_LEN))
+    tokens = tokens[:MAX_TOKENS]
+    return tokens, [token for token in tokens if not is_category_word(token)]
+
+
+def text_hits_query(text: Optional[str], limit: int = TEXT_SEARCH_MAX_HITS) -> Optional[Select]:
+    """
+    Запрос мест, совпавших с текстом: столбцы id, text_score (0..1) и
+    title_match. None — если в тексте нет слов для поиска.
+    """
+    tokens, title_tokens = query_tokens(text)
+    if not tokens:
+        return None
+
+    # Любое из слов (OR), с морфологией; стоп-слова отбрасывает сам Postgres
+    tsquery = func.to_tsquery(
+        cast(literal(TEXT_SEARCH_CONFIG), REGCONFIG), " | ".join(tokens)
+    )
+    fts_match = Place.search_vector.bool_op("@@")(tsquery)
+    fts_rank = func.ts_rank_cd(Place.search_vector, tsquery, 32)  # 32: rank / (rank + 1)
+
+    if title_tokens:
+        title_match = or_(*(literal(token).bool_op("<%")(Place.title) for token in title_tokens))
+        title_score = func.greatest(
+            *(func.word_similarity(token, Place.title) for token in title_tokens)
+        )
+    else:
+        title_match = literal(False)
+        title_score = literal(0.0)
+
+    text_score = func.greatest(cast(fts_rank, Float), cast(title_score, Float))
+    return (
+        select(
+            Place.id.label("id"),
+            text_score.label("text_score"),
+            title_match.label("title_match"),
+        )
+        .where(or_(fts_match, title_match))
+        .order_by(text_score.desc())
+        .limit(limit)
+    )
+
+
+async def find_text_hits(session: AsyncSession, text: Optional[str]) -> TextHits:
+    """
+    Места, совпавшие с текстом запроса: id -> (текстовая релевантность, совпало ли название).
+    """
+    query = text_hits_query(text)
+    if query is None:
+        return {}
+    result = await session.execute(query)
+    return {
+        place_id: (float(text_score), bool(title_match))
+        for place_id, text_score, title_match in result
+    }
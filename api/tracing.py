@@ -0,0 +1,168 @@
+import functools
+import logging
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from api.config import LOG_LEVEL, TRACE_SAMPLE_RATE
+from api.metrics import observe_stage_seconds, record_error
+
+# --- Трассировка этапов обработки запроса ---
+# Middleware (api/main.py) открывает трассу на каждый HTTP-запрос; этапы
+# (analysis — анализ запроса LLM, search — поиск, explanation — объяснения,
+# serialization, photo_write, review_analysis и upsert — обработка отзыва)
+# записываются в неё через stage() или декоратор traced(). Трасса хранится
+# в ContextVar, поэтому задачи, запущенные из запроса (asyncio.create_task),
+# пишут в ту же трассу. По трассе формируется заголовок Server-Timing, а
+# в лог api.requests пишется одна JSON-строка на запрос — для доли
+# TRACE_SAMPLE_RATE запросов и для всех запросов с ошибкой 5xx или
+# с ошибками, записанными через record_exception (тип и текст ошибки — в строке).
+# Те же длительности этапов попадают в метрики Prometheus (stage_duration_seconds).
+
+# Сколько ошибок одного запроса попадает в строку лога
+TRACE_MAX_ERRORS = 10
+
+# Логи модулей приложения (logging.getLogger(__name__) -> "api.*") — в stdout
+app_log = logging.getLogger("api")
+if not app_log.handlers:
+    _app_handler = logging.StreamHandler(sys.stdout)
+    _app_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    app_log.addHandler(_app_handler)
+    app_log.setLevel(LOG_LEVEL)
+    app_log.propagate = False
+
+request_log = logging.getLogger("api.requests")
+if not request_log.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_log.addHandler(_handler)
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+
+class Trace:
+    """
+    Этапы одного запроса: суммарная длительность и число вызовов каждого этапа.
+    """
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # этап -> [секунд всего, вызовов]
+        self.errors: List[Dict[str, str]] = []
+        self.error_count = 0
+
+    def add(self, stage: str, seconds: float):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+    def add_error(self, error: BaseException):
+        self.error_count += 1
+        if len(self.errors) < TRACE_MAX_ERRORS:
+            self.errors.append({"type": type(error).__name__, "message": str(error)})
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Значение заголовка Server-Timing: этапы и общее время, мс.
+        """
+        parts = [
+            f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.stages.items()
+        ]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def log_record(self, endpoint: str, status_code: int) -> Dict[str, Any]:
+        record = {
+            "event": "request",
+            "request_id": self.request_id,
+            "method": self.method,
+            "endpoint": endpoint,
+            "path": self.path,
+            "status": status_code,
+            "duration_ms": round(self.elapsed() * 1000, 1),
+            "stages": {
+                name: {"ms": round(seconds * 1000, 1), "count": count}
+                for name, (seconds, count) in self.stages.items()
+            },
+        }
+        if self.error_count:
+            record["errors"] = self.errors
+            record["error_count"] = self.error_count
+        return record
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(method: str, path: str, request_id: Optional[str] = None) -> Tuple[Trace, Any]:
+    """
+    Открывает трассу запроса. Возвращает трассу и токен для end_trace.
+    """
+    trace = Trace(request_id or uuid.uuid4().hex, method, path)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: Any):
+    """
+    Убирает трассу из контекста (задачи запроса продолжают писать в свою копию).
+    """
+    _current_trace.reset(token)
+
+
+def log_trace(trace: Trace, endpoint: str, status_code: int):
+    """
+    Пишет строку лога запроса: всегда при ошибке, иначе — с учётом выборки.
+    """
+    if status_code >= 500 or trace.error_count or random.random() < TRACE_SAMPLE_RATE:
+        request_log.info(orjson.dumps(trace.log_record(endpoint, status_code)).decode())
+
+
+def record_exception(error: BaseException):
+    """
+    Учитывает ошибку в метриках (errors_total) и в трассе текущего запроса.
+    """
+    record_error(type(error).__name__)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_error(error)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Замеряет блок как этап текущего запроса (трасса и метрики).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        observe_stage_seconds(name, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, seconds)
+
+
+def traced(name: str) -> Callable:
+    """
+    Декоратор асинхронной функции: каждый вызов — этап name.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,62 @@
+from contextvars import ContextVar
+from typing import Any, Dict, Tuple
+
+# --- Учёт токенов и задержек запросов к LLM ---
+# Агрегаты ведутся по паре (эндпоинт, тип промпта). Эндпоинт берётся из
+# контекста запроса (устанавливается middleware в api/main.py), тип
+# промпта передаёт вызывающий код: "analysis", "analysis_compact",
+# "review", "explanation" и т.д.
+
+# Эндпоинт, обрабатывающий текущий запрос
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="internal")
+
+_usage: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+
+def record_usage(prompt_type: str, usage: Any, latency: float, endpoint: str = None):
+    """
+    Учитывает один вызов LLM: usage — объект usage из ответа API (может быть None),
+    latency — длительность вызова в секундах.
+    """
+    key = (endpoint or current_endpoint.get(), prompt_type)
+    stats = _usage.get(key)
+    if stats is None:
+        stats = _usage[key] = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "latency_sum": 0.0,
+            "latency_max": 0.0,
+        }
+
+    stats["calls"] += 1
+    stats["latency_sum"] += latency
+    stats["latency_max"] = max(stats["latency_max"], latency)
+    if usage is not None:
+        stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        stats["total_tokens"] += getattr(usage, "total_tokens", 0) or 0
+
+
+def get_usage_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Возвращает агрегаты по эндпоинтам и типам промптов, включая средние значения.
+    """
+    result: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for (endpoint, prompt_type), stats in sorted(_usage.items()):
+        calls = stats["calls"] or 1
+        result.setdefault(endpoint, {})[prompt_type] = {
+            **stats,
+            "avg_latency": stats["latency_sum"] / calls,
+            "avg_prompt_tokens": stats["prompt_tokens"] / calls,
+            "avg_completion_tokens": stats["completion_tokens"] / calls,
+        }
+    return result
+
+
+def reset_usage_stats():
+    """
+    Сбрасывает накопленную статистику (например, перед новым A/B-замером).
+    """
+    _usage.clear()
@@ -0,0 +1,154 @@
+# --- Справочные списки допустимых значений для категорий ---
+
+ENTITY_TYPES = [
+    "ресторан",
+    "кафе",
+    "бар",
+    "паб",
+    "кофейня",
+    "фудкорт",
+    "уличная еда",
+    "пекарня",
+    "кондитерская",
+    "чайный домик",
+    "клуб",
+    "гостиная",
+    "караоке",
+    "книжный магазин",
+    "арт-центр",
+    "галерея",
+    "кинотеатр",
+    "антикафе",
+    "мастерская",
+    "студия",
+    "парк",
+    "набережная",
+    "площадь",
+    "смотровая площадка",
+    "музей",
+    "памятник",
+    "скульптура",
+    "историческое здание",
+    "церковь",
+    "храм",
+    "кафедральный собор",
+    "улица",
+    "бутик",
+    "винтажный магазин",
+    "секонд-хенд",
+    "сувенирный магазин",
+    "рынок",
+    "концептуальный магазин",
+    "достопримечательность",
+    "укромное место",
+    "внутренний двор",
+]
+
+ATMOSPHERE_TAGS = [
+    "уютный",
+    "романтичный",
+    "тихий",
+    "спокойный",
+    "шумный",
+    "энергичный",
+    "домашний",
+    "элегантный",
+    "премиум",
+    "богемный",
+    "артхаусный",
+    "хипстерский",
+    "альтернативный",
+    "семейный",
+    "детский",
+    "туристический",
+    "популярный",
+    "местный",
+    "аутентичный",
+    "ностальгический",
+    "винтажный",
+    "дневной",
+    "вечерний",
+    "ночной",
+]
+
+PURPOSE_TAGS = [
+    "свидание",
+    "друзья",
+    "работа",
+    "учеба",
+    "наедине",
+    "бизнес",
+    "празднование",
+    "быстрый визит",
+    "фотосъемка",
+    "прогулки",
+    "шоппинг",
+    "осмотр достопримечательностей",
+    "обед",
+    "ужин",
+    "завтрак",
+    "поздний завтрак",
+]
+
+BUDGET_LEVELS = ["бюджетный", "средний", "дорогой"]
+
+FEATURES = [
+    "для отдыха на природе",
+    "для домашних животных",
+    "вегетарианец",
+    "веган",
+    "живая музыка",
+    "танцы",
+    "Wi-Fi",
+    "парковка",
+    "доступно",
+    "место для курения",
+    "алкоголь",
+    "детская комната",
+    "мероприятия",
+    "бесплатный вход",
+    "платный вход",
+    "бронирование",
+    "доставка",
+    "еда на вынос",
+]
+
+BEST_TIME = ["утро", "день", "вечер", "ночь"]
+
+WORKING_DAYS = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+
+# Допустимые значения по полям предпочтений
+CATEGORY_VALUES = {
+    "entity_types": ENTITY_TYPES,
+    "atmosphere_tags": ATMOSPHERE_TAGS,
+    "purpose_tags": PURPOSE_TAGS,
+    "budget_level": BUDGET_LEVELS,
+    "features": FEATURES,
+    "best_time": BEST_TIME,
+}
+
+# Поля-массивы и поля с одним значением
+LIST_FIELDS = ("entity_types", "atmosphere_tags", "purpose_tags", "features")
+SCALAR_FIELDS = ("budget_level", "best_time")
+
+# --- Компактные коды для сокращённого промпта анализа ---
+# Значение кодируется префиксом поля и номером в списке (с 1): "кафе" -> "E2".
+# Порядок списков менять нельзя — иначе коды разойдутся с уже выданными ответами.
+COMPACT_FIELDS = {
+    "entity_types": ("e", "E"),
+    "atmosphere_tags": ("a", "A"),
+    "purpose_tags": ("p", "P"),
+    "budget_level": ("b", "B"),
+    "features": ("f", "F"),
+    "best_time": ("t", "T"),
+}
+
+# Код -> значение и значение -> код по полям
+COMPACT_DECODE = {
+    field: {f"{prefix}{number}": value for number, value in enumerate(CATEGORY_VALUES[field], 1)}
+    for field, (_, prefix) in COMPACT_FIELDS.items()
+}
+COMPACT_ENCODE = {
+    field: {value: code for code, value in codes.items()}
+    for field, codes in COMPACT_DECODE.items()
+}
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from api.catalog_index import get_catalog_index
+from api.config import (
+    ANALYSIS_MODE,
+    CATALOG_INDEX_ENABLED,
+    DB_POOL_SIZE,
+    LLM_TIMEOUT,
+    OPENROUTER_API_KEY,
+    WARMUP_DB_CONNECTIONS,
+    WARMUP_LLM,
+    WARMUP_RETRY_INTERVAL,
+)
+from api.crud import search_places_advanced
+from api.database import async_session_maker, read_router
+from api.llm import get_llm_client
+from api.tags import get_tag_dictionary
+from api.vocabulary import CATEGORY_VALUES
+
+logger = logging.getLogger(__name__)
+
+# --- Прогрев воркера перед приёмом трафика ---
+# После старта процесса первый запрос платил бы за открытие соединений
+# пула, компиляцию и подготовку SQL-запросов, которые выполняет поиск,
+# загрузку индекса каталога и словаря тегов, TLS-рукопожатие с LLM.
+# Прогрев делает это заранее, в фоне: /health отвечает сразу (процесс
+# жив), /ready — только после прогрева, поэтому при rolling deploy
+# балансировщик не отправляет запросы на холодный воркер. Ошибка шагов БД — воркер не готов, прогрев
+# повторяется через WARMUP_RETRY_INTERVAL; ошибка LLM не мешает готовности.
+#
+# Пробный поиск идёт тем же путём, что и запросы: с индексом каталога
+# (CATALOG_INDEX_ENABLED) в БД поиск выполняет только запрос текстовых
+# совпадений — он и готовится; без индекса — полный SQL-запрос поиска.
+
+# Запрос для прогрева поиска: по одному значению каждой категории
+_SAMPLE_PREFERENCES = {
+    "entity_types": CATEGORY_VALUES["entity_types"][:1],
+    "atmosphere_tags": CATEGORY_VALUES["atmosphere_tags"][:1],
+    "purpose_tags": CATEGORY_VALUES["purpose_tags"][:1],
+    "features": CATEGORY_VALUES["features"][:1],
+    "budget_level": CATEGORY_VALUES["budget_level"][0],
+    "best_time": CATEGORY_VALUES["best_time"][0],
+}
+_SAMPLE_TEXT = " ".join(CATEGORY_VALUES["entity_types"][:2])
+
+
+class WarmupState:
+    """
+    Ход прогрева: готовность воркера и длительность (или ошибка) каждого шага.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    async def step(self, name: str, action: Callable[[], Awaitable[Any]], required: bool = True):
+        started = time.perf_counter()
+        try:
+            await action()
+        except Exception as e:
+            self.steps[name] = {"seconds": round(time.perf_counter() - started, 3), "error": str(e)}
+            if required:
+                raise
+            logger.warning("Прогрев: шаг %s не выполнен: %r", name, e)
+            return
+        self.steps[name] = {"seconds": round(time.perf_counter() - started, 3)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            status = "starting"
+        elif self.ready:
+            status = "ready"
+        else:
+            status = "warming"
+        return {
+            "status": status,
+            "attempts": self.attempts,
+            "seconds": (
+                round(self.finished_at - self.started_at, 3)
+                if self.finished_at is not None and self.started_at is not None else None
+            ),
+            "steps": self.steps,
+        }
+
+
+_state = WarmupState()
+
+
+def get_warmup_state() -> WarmupState:
+    return _state
+
+
+async def _open_pool():
+    """
+    Открывает WARMUP_DB_CONNECTIONS соединений пула одновременно и готовит
+    на каждом SQL-запросы, которые выполняет поиск в текущем режиме (кэш
+    подготовленных запросов — на соединение): с индексом каталога — запрос
+    текстовых совпадений, без индекса — полный запрос поиска.
+    """
+    async def warm_connection():
+        async with async_session_maker() as session:
+            await session.execute(text("SELECT 1"))
+            await search_places_advanced(
+                session, _SAMPLE_PREFERENCES, limit=1, text_query=_SAMPLE_TEXT
+            )
+
+    await asyncio.gather(
+        *(warm_connection() for _ in range(min(WARMUP_DB_CONNECTIONS, DB_POOL_SIZE)))
+    )
+
+
+async def _open_replicas():
+    async def warm_replica(replica):
+        async with replica.session_maker() as session:
+            await session.execute(text("SELECT 1"))
+
+    for replica in read_router.candidates():
+        try:
+            await warm_replica(replica)
+        except Exception as e:
+            read_router.mark_down(replica, e)
+
+
+async def _load_caches():
+    """
+    Индекс каталога и словарь тегов — до первого поиска.
+    """
+    if CATALOG_INDEX_ENABLED:
+        await get_catalog_index().load()
+    async with async_session_maker() as session:
+        await get_tag_dictionary().ensure_loaded(session)
+
+
+async def _open_llm_connection():
+    """
+    Открывает соединение с API LLM (TLS) запросом списка моделей — без генерации.
+    """
+    await asyncio.wait_for(get_llm_client().models.list(), LLM_TIMEOUT)
+
+
+async def warm_up():
+    """
+    Прогревает воркер; при ошибке шагов БД повторяет, пока не получится.
+    """
+    _state.started_at = time.perf_counter()
+    while True:
+        _state.attempts += 1
+        try:
+            await _state.step("caches", _load_caches)
+            await _state.step("database_pool", _open_pool)
+            await _state.step("replicas", _open_replicas, required=False)
+            if WARMUP_LLM and ANALYSIS_MODE != "local" and OPENROUTER_API_KEY:
+                await _state.step("llm_connection", _open_llm_connection, required=False)
+        except Exception as e:
+            logger.warning("Прогрев не удался (попытка %d): %r", _state.attempts, e)
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+            continue
+        break
+
+    _state.finished_at = time.perf_counter()
+    _state.ready = True
+    logger.info("Воркер прогрет за %.2f с", _state.finished_at - _state.started_at)
@@ -0,0 +1,108 @@
+import pytest
+
+from api.bulk_import import (
+    IMPORT_FIELDS,
+    insert_value,
+    merge_assignment,
+    normalize_record,
+    read_csv,
+)
+
+
+def normalize(record):
+    return dict(zip((*IMPORT_FIELDS, "open_slots"), normalize_record(record)))
+
+
+def test_absent_fields_stay_null():
+    row = normalize({"title": "Кафе", "url": "https://example.com/1", "latitude": 55.7, "longitude": "37.6"})
+
+    assert row["title"] == "Кафе"
+    assert (row["latitude"], row["longitude"]) == (55.7, 37.6)
+    for field in (
+        "photo", "description", "entity_types", "atmosphere_tags", "purpose_tags", "features",
+        "best_time", "budget_level", "overall_rating", "review_count",
+        "opening_hours", "working_days", "is_24_7", "open_slots",
+    ):
+        assert row[field] is None, field
+
+
+def test_values_are_converted():
+    row = normalize({
+        "title": "Бар",
+        "url": "https://example.com/2",
+        "entity_types": "бар; паб",
+        "features": '["Wi-Fi"]',
+        "atmosphere_tags": [],
+        "overall_rating": "4.5",
+        "review_count": "12",
+        "budget_level": "средний",
+    })
+
+    assert row["entity_types"] == ["бар", "паб"]
+    assert row["features"] == ["Wi-Fi"]
+    assert row["atmosphere_tags"] == []  # пустой список — явное значение, не отсутствие
+    assert row["overall_rating"] == 4.5
+    assert row["review_count"] == 12
+
+
+def test_schedule_is_set_as_a_whole():
+    row = normalize({"title": "Кафе", "url": "u", "opening_hours": "12:00-13:00"})
+
+    assert row["working_days"] == []
+    assert row["is_24_7"] is False
+    assert row["open_slots"][:4] == [48, 49, 50, 51]
+
+    row = normalize({"title": "Кафе", "url": "u", "working_days": "пн"})
+
+    assert row["is_24_7"] is False  # расписание задано: часы работы неизвестны
+    assert row["opening_hours"] is None
+    assert row["open_slots"] is None
+
+    row = normalize({"title": "Кафе", "url": "u", "is_24_7": "да"})
+
+    assert len(row["open_slots"]) == 7 * 96
+
+
+@pytest.mark.parametrize(
+    "record, message",
+    [
+        ({"title": "Кафе"}, "title и url"),
+        ({"title": "Кафе", "url": "u", "latitude": "nan", "longitude": 1}, "latitude"),
+        ({"title": "Кафе", "url": "u", "latitude": 1, "longitude": "181"}, "longitude"),
+        ({"title": "Кафе", "url": "u", "latitude": 1}, "вместе"),
+        ({"title": "Кафе", "url": "u", "overall_rating": 6}, "overall_rating"),
+        ({"title": "Кафе", "url": "u", "budget_level": "дёшево"}, "budget_level"),
+        ({"title": "Кафе", "url": "u", "entity_types": 5}, "entity_types"),
+        ({"title": "К" * 256, "url": "u"}, "title"),
+    ],
+)
+def test_invalid_records_are_rejected(record, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_record(record)
+
+
+def test_csv_empty_cells_are_absent():
+    (line, record), = read_csv(["title,url,photo,overall_rating\n", "Кафе,u,,4\n"])
+
+    assert line == 2
+    assert record == {"title": "Кафе", "url": "u", "overall_rating": "4"}
+    assert normalize(record)["photo"] is None
+
+
+def test_merge_keeps_existing_values_and_unions_tags():
+    assert merge_assignment("photo") == "coalesce(r.photo, p.photo)"
+    assert merge_assignment("overall_rating") == "coalesce(r.overall_rating, p.overall_rating)"
+    assert merge_assignment("entity_types") == (
+        "array_union(p.entity_types, coalesce(r.entity_types, '{}'))"
+    )
+    for column in ("opening_hours", "working_days", "is_24_7", "open_slots"):
+        assert merge_assignment(column) == (
+            f"CASE WHEN r.is_24_7 IS NULL THEN p.{column} ELSE r.{column} END"
+        )
+
+
+def test_insert_uses_defaults_for_absent_fields():
+    assert insert_value("entity_types") == "coalesce(r.entity_types, '{}')"
+    assert insert_value("is_24_7") == "coalesce(r.is_24_7, false)"
+    assert insert_value("review_count") == "coalesce(r.review_count, 0)"
+    assert insert_value("photo") == "r.photo"
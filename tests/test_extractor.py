@@ -0,0 +1,72 @@
+import pytest
+
+from api.extractor import DEFAULT_BEST_TIME, extract_preferences, is_category_word
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    ["кафе у дороги", "по дороге в парк", "бар у дорог", "дорогу к музею"],
+)
+def test_road_is_not_budget(prompt):
+    preferences, _ = extract_preferences(prompt)
+
+    assert preferences["budget_level"] is None
+
+
+def test_road_is_not_covered_so_llm_is_used():
+    _, confidence = extract_preferences("кафе у дороги")
+
+    assert confidence < 1.0
+
+
+@pytest.mark.parametrize(
+    "prompt, budget_level",
+    [
+        ("дорогой ресторан", "дорогой"),
+        ("дорогие рестораны", "дорогой"),
+        ("где поесть дорого", "дорогой"),
+        ("недорогое кафе", "бюджетный"),
+        ("дешевый бар", "бюджетный"),
+    ],
+)
+def test_budget_level(prompt, budget_level):
+    preferences, _ = extract_preferences(prompt)
+
+    assert preferences["budget_level"] == budget_level
+
+
+@pytest.mark.parametrize("prompt", ["бар с друзьями", "позвать друзей в кафе", "кафе для друзья"])
+def test_friends_word_forms(prompt):
+    preferences, _ = extract_preferences(prompt)
+
+    assert preferences["purpose_tags"] == ["друзья"]
+
+
+def test_full_match():
+    preferences, confidence = extract_preferences("уютное кафе для работы с wifi")
+
+    assert preferences["entity_types"] == ["кафе"]
+    assert preferences["atmosphere_tags"] == ["уютный"]
+    assert preferences["purpose_tags"] == ["работа"]
+    assert preferences["features"] == ["Wi-Fi"]
+    assert preferences["best_time"] == DEFAULT_BEST_TIME
+    assert confidence == 1.0
+
+
+def test_negation_is_not_counted():
+    preferences, confidence = extract_preferences("бар без алкоголя")
+
+    assert "алкоголь" not in preferences["features"]
+    assert confidence < 1.0
+
+
+def test_suffix_length_limit():
+    assert is_category_word("кафешка")
+    assert not is_category_word("кафедральными")
+
+
+def test_empty_prompt():
+    preferences, confidence = extract_preferences("а и в")
+
+    assert confidence == 0.0
+    assert preferences["best_time"] == DEFAULT_BEST_TIME
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.opening_hours import (
+    SLOTS_PER_DAY,
+    SLOTS_PER_WEEK,
+    VENUE_TIMEZONE,
+    open_slots,
+    parse_daily_intervals,
+    parse_working_days,
+    slot_at,
+)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("12:00-22:00", [(720, 1320)]),
+        ("10:00 до 24:00", [(600, 1440)]),
+        ("09.30 – 18.00", [(570, 1080)]),
+        ("10:00-14:00, 15:00-22:00", [(600, 840), (900, 1320)]),
+        # После полуночи — до утра следующего дня
+        ("12:00-05:00", [(720, 1740)]),
+        ("00:00-00:00", [(0, 1440)]),
+        ("Круглосуточно", [(0, 1440)]),
+        ("24/7", [(0, 1440)]),
+    ],
+)
+def test_parse_daily_intervals(text, expected):
+    assert parse_daily_intervals(text) == expected
+
+
+@pytest.mark.parametrize("text", [None, "", "по записи", "25:00-26:00"])
+def test_parse_daily_intervals_unparsed(text):
+    assert parse_daily_intervals(text) is None
+
+
+def test_parse_working_days():
+    assert parse_working_days(["Пн", "среда", "выходной"]) == [0, 2]
+    assert parse_working_days([]) == list(range(7))
+    assert parse_working_days(None) == list(range(7))
+
+
+def test_open_slots_rounds_to_slot_starts():
+    # Открыто в начале слотов 12:30, 12:45 и 13:00
+    assert open_slots("12:30-13:10", ["пн"]) == [50, 51, 52]
+
+
+def test_open_slots_every_day_without_working_days():
+    slots = open_slots("12:00-13:00")
+
+    assert len(slots) == 7 * 4
+    assert slots[:4] == [48, 49, 50, 51]
+    assert slots[-1] == 6 * SLOTS_PER_DAY + 51
+
+
+def test_open_slots_overnight_wraps_to_monday():
+    # Воскресенье 12:00 — понедельник 05:00
+    slots = set(open_slots("12:00-05:00", ["вс"]))
+
+    assert 6 * SLOTS_PER_DAY + 48 in slots
+    assert SLOTS_PER_WEEK - 1 in slots
+    assert 0 in slots
+    assert 19 in slots          # понедельник 04:45
+    assert 20 not in slots      # понедельник 05:00 — уже закрыто
+    assert 6 * SLOTS_PER_DAY + 47 not in slots
+
+
+def test_open_slots_always_open_and_unknown():
+    assert open_slots(None, is_24_7=True) == list(range(SLOTS_PER_WEEK))
+    assert open_slots("круглосуточно", ["сб"]) == list(
+        range(5 * SLOTS_PER_DAY, 6 * SLOTS_PER_DAY)
+    )
+    assert open_slots(None) is None
+    assert open_slots("по записи") is None
+
+
+def test_slot_at_local_time():
+    assert slot_at(datetime(2024, 1, 1, 0, 0)) == 0          # понедельник 00:00
+    assert slot_at(datetime(2024, 1, 3, 12, 14)) == 2 * SLOTS_PER_DAY + 48
+    assert slot_at(datetime(2024, 1, 7, 23, 59)) == SLOTS_PER_WEEK - 1
+
+
+def test_slot_at_converts_to_venue_timezone_across_week_boundary():
+    monday = datetime(2024, 1, 8, 0, 0, tzinfo=VENUE_TIMEZONE).astimezone(timezone.utc)
+
+    assert slot_at(monday) == 0
+    assert slot_at(monday - timedelta(minutes=1)) == SLOTS_PER_WEEK - 1
+
+
+def test_slot_at_now_is_in_range():
+    assert 0 <= slot_at() < SLOTS_PER_WEEK
@@ -0,0 +1,111 @@
+import base64
+import json
+
+import pytest
+
+from api.config import GEO_MAX_RADIUS_KM
+from api.geo import GeoQuery
+from api.opening_hours import SLOTS_PER_WEEK
+from api.pagination import CURSOR_VERSION, decode_cursor, encode_cursor
+
+PREFERENCES = {
+    "entity_types": ["кафе", "бар"],
+    "atmosphere_tags": [],
+    "purpose_tags": [],
+    "budget_level": "средний",
+    "features": ["Wi-Fi"],
+    "best_time": "вечер",
+}
+LAST_PLACE = {"id": 42, "relevance_score": 0.75, "overall_rating": 4.5, "review_count": 12}
+
+
+def make_cursor(**fields) -> str:
+    """
+    Курсор, собранный вручную (как мог бы прислать клиент).
+    """
+    payload = {"v": CURSOR_VERSION, "p": {}, "k": [0.5, 4.0, 3, 7], **fields}
+    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def test_round_trip():
+    filters = {
+        "text_query": "кофе с собой",
+        "near": GeoQuery(55.75, 37.62, 2.0),
+        "open_slot": 100,
+    }
+    cursor = encode_cursor(PREFERENCES, LAST_PLACE, filters)
+    preferences, after, decoded_filters = decode_cursor(cursor)
+
+    assert after == (0.75, 4.5, 12, 42)
+    assert decoded_filters == filters
+    assert preferences["entity_types"] == ["кафе", "бар"]
+    assert preferences["features"] == ["Wi-Fi"]
+    assert preferences["budget_level"] == "средний"
+    assert preferences["best_time"] == "вечер"
+    assert preferences["atmosphere_tags"] == []
+
+
+def test_round_trip_without_filters():
+    _, after, filters = decode_cursor(encode_cursor({}, LAST_PLACE))
+
+    assert after == (0.75, 4.5, 12, 42)
+    assert filters == {}
+
+
+def test_unknown_values_are_dropped():
+    preferences, _, _ = decode_cursor(
+        encode_cursor({"entity_types": ["кафе", "не категория"]}, LAST_PLACE)
+    )
+
+    assert preferences["entity_types"] == ["кафе"]
+
+
+def test_edge_values_are_accepted():
+    _, _, filters = decode_cursor(
+        make_cursor(g=[-90, 180, GEO_MAX_RADIUS_KM], o=SLOTS_PER_WEEK - 1)
+    )
+
+    assert filters["near"] == GeoQuery(-90.0, 180.0, GEO_MAX_RADIUS_KM)
+    assert filters["open_slot"] == SLOTS_PER_WEEK - 1
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"o": SLOTS_PER_WEEK},
+        {"o": -1},
+        {"o": "понедельник"},
+        {"g": [55.75, 37.62, 0]},
+        {"g": [55.75, 37.62, -1]},
+        {"g": [55.75, 37.62, GEO_MAX_RADIUS_KM + 1]},
+        {"g": [91, 37.62, 1]},
+        {"g": [-91, 37.62, 1]},
+        {"g": [55.75, 181, 1]},
+        {"g": [55.75, -181, 1]},
+        {"g": [55.75, 37.62]},
+        {"q": 123},
+        {"v": CURSOR_VERSION + 1},
+        {"k": [0.5, 4.0, 3]},
+        {"p": {"e": ["E999"]}},
+    ],
+)
+def test_tampered_cursor_is_rejected(fields):
+    with pytest.raises(ValueError):
+        decode_cursor(make_cursor(**fields))
+
+
+@pytest.mark.parametrize("value", ["nan", "inf"])
+def test_non_finite_geo_is_rejected(value):
+    cursor = make_cursor(g=[55.75, 37.62, 1])
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    raw = raw.replace("[55.75, 37.62, 1]", f'[55.75, 37.62, "{value}"]')
+    tampered = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    with pytest.raises(ValueError):
+        decode_cursor(tampered)
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("не курсор")
@@ -0,0 +1,115 @@
+import pytest
+
+from api.extractor import DEFAULT_BEST_TIME
+from api.repair import (
+    REPAIR_STATS,
+    decode_compact_response,
+    edit_distance,
+    map_value,
+    repair_llm_response,
+)
+from api.vocabulary import CATEGORY_VALUES
+
+VALID = {
+    "entity_types": ["кафе"],
+    "atmosphere_tags": ["уютный"],
+    "purpose_tags": [],
+    "budget_level": "средний",
+    "features": [],
+    "best_time": "вечер",
+}
+
+
+def test_valid_response_is_unchanged():
+    repaired_before = REPAIR_STATS["repaired"]
+
+    assert repair_llm_response(dict(VALID)) == VALID
+    assert REPAIR_STATS["repaired"] == repaired_before
+
+
+def test_fields_follow_vocabulary_order():
+    shuffled = dict(reversed(list(VALID.items())))
+
+    assert list(repair_llm_response(shuffled)) == list(CATEGORY_VALUES)
+
+
+@pytest.mark.parametrize("response", [None, "кафе", ["кафе"], 42])
+def test_non_object_is_rejected(response):
+    with pytest.raises(ValueError):
+        repair_llm_response(response)
+
+
+def test_types_are_fixed():
+    repaired = repair_llm_response({
+        "entity_types": "кафе",         # строка вместо списка
+        "features": None,
+        "budget_level": ["дорогой"],    # список вместо строки
+        "best_time": "вечер",
+    })
+
+    assert repaired["entity_types"] == ["кафе"]
+    assert repaired["atmosphere_tags"] == []
+    assert repaired["features"] == []
+    assert repaired["budget_level"] == "дорогой"
+
+
+def test_values_are_mapped_deduplicated_or_dropped():
+    dropped_before = REPAIR_STATS["values_dropped"]
+
+    repaired = repair_llm_response({
+        **VALID,
+        "entity_types": ["КАФЕ!", "кофеиня"],            # регистр и опечатка
+        "atmosphere_tags": ["уютныи", "уютный", "xyzqw"],  # дубликат после исправления
+        "purpose_tags": ["встреча"],                      # синоним
+    })
+
+    assert repaired["entity_types"] == ["кафе", "кофейня"]
+    assert repaired["atmosphere_tags"] == ["уютный"]
+    assert repaired["purpose_tags"] == ["друзья"]
+    assert REPAIR_STATS["values_dropped"] == dropped_before + 1
+
+
+@pytest.mark.parametrize("best_time", [None, "", "null", "полдень", []])
+def test_best_time_falls_back_to_default(best_time):
+    repaired = repair_llm_response({**VALID, "best_time": best_time})
+
+    assert repaired["best_time"] == DEFAULT_BEST_TIME
+
+
+def test_unknown_budget_level_becomes_none():
+    assert repair_llm_response({**VALID, "budget_level": "бесплатно!!!"})["budget_level"] is None
+
+
+def test_extra_fields_are_dropped():
+    dropped_before = REPAIR_STATS["fields_dropped"]
+
+    repaired = repair_llm_response({**VALID, "comment": "ok", "confidence": 0.9})
+
+    assert repaired == VALID
+    assert REPAIR_STATS["fields_dropped"] == dropped_before + 2
+
+
+def test_map_value():
+    assert map_value("entity_types", "кафе") == ["кафе"]
+    assert map_value("entity_types", "Кафе.") == ["кафе"]
+    assert map_value("entity_types", "кофеиня") == ["кофейня"]
+    assert map_value("entity_types", 5) == []
+    assert map_value("best_time", "полдень") == []
+
+
+def test_edit_distance_stops_at_limit():
+    assert edit_distance("кафе", "кофе", 3) == 1
+    assert edit_distance("кафе", "кафе", 0) == 0
+    assert edit_distance("abc", "abcdef", 1) == 2
+    assert edit_distance("abcd", "wxyz", 2) == 3
+
+
+def test_decode_compact_response():
+    decoded = decode_compact_response({"e": ["E2", "бар", "e3"], "t": "T3", "b": None})
+
+    assert decoded["entity_types"] == ["кафе", "бар", "бар"]
+    assert decoded["best_time"] == CATEGORY_VALUES["best_time"][2]
+    assert decoded["budget_level"] is None
+    assert decoded["features"] is None
+    assert repair_llm_response(decoded)["entity_types"] == ["кафе", "бар"]
+    assert decode_compact_response("не объект") == "не объект"
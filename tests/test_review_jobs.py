@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api import review_jobs
+from api.config import REVIEW_MAX_ATTEMPTS, REVIEW_RETRY_BASE_DELAY, REVIEW_RETRY_MAX_DELAY
+from api.review_jobs import ReviewWorkerPool, retry_delay
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def rollback(self):
+        pass
+
+
+def make_job(job_id: str, attempts: int = 1):
+    return SimpleNamespace(
+        id=job_id, attempts=attempts, url=f"https://example.com/{job_id}",
+        place_title="Место", review_text="Уютное кафе", photo_path=None,
+    )
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """
+    Очередь в памяти: claim_review_job выдаёт задачи по порядку,
+    _finish_job записывает итог, а для задач из failing_finish — падает.
+    """
+    state = SimpleNamespace(jobs=[], finished={}, failing_finish=set(), upsert_error=None)
+
+    async def claim(session):
+        return state.jobs.pop(0) if state.jobs else None
+
+    async def finish(session, job_id, **values):
+        if job_id in state.failing_finish:
+            state.failing_finish.discard(job_id)
+            raise ConnectionError("соединение с БД потеряно")
+        state.finished[job_id] = values
+
+    async def upsert(**kwargs):
+        if state.upsert_error is not None:
+            raise state.upsert_error
+        return {"action": "created", "place_id": 1, "place": {}}
+
+    monkeypatch.setattr(review_jobs, "claim_review_job", claim)
+    monkeypatch.setattr(review_jobs, "_finish_job", finish)
+    monkeypatch.setattr(review_jobs, "create_or_update_place_from_review", upsert)
+    monkeypatch.setattr(review_jobs, "REVIEW_POLL_INTERVAL", 0.01)
+    return state
+
+
+def run_pool(state, expected: int, workers: int = 1) -> ReviewWorkerPool:
+    async def run():
+        pool = ReviewWorkerPool(workers=workers, session_maker=FakeSession)
+        pool.start()
+        try:
+            for _ in range(200):
+                if len(state.finished) >= expected:
+                    break
+                await asyncio.sleep(0.01)
+            assert all(not task.done() for task in pool._tasks), "воркер завершился"
+        finally:
+            await pool.stop()
+        return pool
+
+    return asyncio.run(run())
+
+
+def test_retry_delay_grows_and_is_capped():
+    assert retry_delay(1) == REVIEW_RETRY_BASE_DELAY
+    assert retry_delay(2) == REVIEW_RETRY_BASE_DELAY * 2
+    assert retry_delay(3) == REVIEW_RETRY_BASE_DELAY * 4
+    assert retry_delay(100) == REVIEW_RETRY_MAX_DELAY
+
+
+def test_worker_survives_db_error_while_finishing_job(queue):
+    queue.jobs = [make_job("a"), make_job("b")]
+    queue.failing_finish = {"a"}
+
+    pool = run_pool(queue, expected=1)
+
+    # Итог задачи "a" не записан (её вернёт в очередь таймаут блокировки),
+    # а воркер продолжил работу и обработал "b"
+    assert "a" not in queue.finished
+    assert queue.finished["b"]["status"] == "done"
+    assert pool.errors == 1
+    assert pool.processed == 1
+
+
+def test_failed_attempt_is_retried_later(queue):
+    queue.jobs = [make_job("a", attempts=1)]
+    queue.upsert_error = RuntimeError("LLM недоступна")
+
+    pool = run_pool(queue, expected=1)
+
+    assert queue.finished["a"]["status"] == "pending"
+    assert queue.finished["a"]["error"] == "LLM недоступна"
+    assert "run_after" in queue.finished["a"]
+    assert pool.retried == 1
+
+
+def test_last_attempt_fails_job(queue):
+    queue.jobs = [make_job("a", attempts=REVIEW_MAX_ATTEMPTS)]
+    queue.upsert_error = RuntimeError("LLM недоступна")
+
+    pool = run_pool(queue, expected=1)
+
+    assert queue.finished["a"] == {"status": "failed", "error": "LLM недоступна"}
+    assert pool.failed == 1
+
+
+def test_reclaimed_job_over_attempt_limit_fails_without_processing(queue):
+    queue.jobs = [make_job("a", attempts=REVIEW_MAX_ATTEMPTS + 1)]
+    queue.upsert_error = AssertionError("отзыв не должен обрабатываться")
+
+    pool = run_pool(queue, expected=1)
+
+    assert queue.finished["a"] == {"status": "failed"}
+    assert pool.failed == 1